@@ -0,0 +1,69 @@
+# app/api/responses.py
+import json
+from typing import Any, Dict, List, Optional
+
+from fastapi.responses import JSONResponse
+
+from ..models.comprobante import Comprobante
+
+try:
+    import orjson
+except ImportError:  # orjson es opcional: sin él se serializa con el json de la biblioteca estándar
+    orjson = None
+
+
+def dumps(content: Any) -> bytes:
+    """Serializa a JSON UTF-8 con orjson si está instalado (varias veces más rápido que json)."""
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    Respuesta para contenido que ya es JSON nativo (dicts de model_dump): devolverla directamente desde el
+    endpoint evita que FastAPI recorra el resultado con jsonable_encoder antes de serializarlo.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def parse_fields(spec: Optional[str]) -> Optional[List[str]]:
+    """Interpreta fields="cuit_emisor,importe_total"; None (o vacío) devuelve todos los campos."""
+    if spec is None or not spec.strip():
+        return None
+    fields = [field.strip() for field in spec.split(",") if field.strip()]
+    unknown = [field for field in fields if field not in Comprobante.model_fields]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def project_comprobante(
+    comprobante: Dict[str, Any], fields: Optional[List[str]], include_text: bool = True
+) -> Dict[str, Any]:
+    if fields is not None:
+        comprobante = {field: comprobante[field] for field in fields if field in comprobante}
+    if not include_text and "text_content" in comprobante:
+        comprobante = {key: value for key, value in comprobante.items() if key != "text_content"}
+    return comprobante
+
+
+def project_result(result: Dict[str, Any], fields: Optional[List[str]], include_text: bool = True) -> Dict[str, Any]:
+    """
+    Deja en cada comprobante del resultado solo los campos pedidos y, con include_text=False, quita el texto
+    extraído. Devuelve un dict nuevo: el resultado puede ser el mismo que guarda la cache.
+    """
+    if fields is None and include_text:
+        return result
+    projected = dict(result)
+    for key in ("comprobante", "comprobantes"):
+        if key not in result:
+            continue
+        value = result[key]
+        if isinstance(value, list):
+            projected[key] = [project_comprobante(item, fields, include_text) for item in value]
+        else:
+            projected[key] = project_comprobante(value, fields, include_text)
+    return projected
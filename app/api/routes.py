@@ -1,9 +1,18 @@
 
 # app/api/routes.py
-from fastapi import APIRouter, Depends, File, UploadFile, HTTPException
+from typing import List, Optional
+from fastapi import APIRouter, Depends, File, Form, Request, UploadFile, HTTPException
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from ..core.security import create_access_token, get_current_user
+from ..core.dependencies import get_file_processor
+from ..core.metrics import JOBS_QUEUE_DEPTH, OLLAMA_QUEUE_DEPTH, POOL_IN_FLIGHT, POOL_QUEUE_DEPTH, REGISTRY
+from ..core.registry import get_registry
+from .responses import FastJSONResponse, dumps, parse_fields, project_result
 from ..services.file_processor import FileProcessor
+from ..services.job_manager import get_job_manager
+from ..utils.upload_source import UploadSource, close_sources
 from ..core.config import get_settings
 
 settings = get_settings()
@@ -18,11 +27,126 @@ async def login(form_data: OAuth2PasswordRequestForm = Depends()):
 
 @router.post("/upload/")
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...), #analizar si enviamos el archivo como parámetro (base64)
     current_user: str = Depends(get_current_user),
     extract_qr: bool = True,  # Parámetro opcional para extraer QR
-    ollama_response: bool = False  # Parámetro opcional para procesar texto con Ollama
+    ollama_response: bool = False,  # Parámetro opcional para procesar texto con Ollama
+    pages: Optional[str] = None,  # Páginas del PDF a procesar: "1", "1-3,5", "all"
+    early_exit: bool = True,  # Dejar de leer páginas cuando ya se tienen los datos requeridos
+    fields: Optional[str] = None,  # Campos del comprobante a devolver: "cuit_emisor,importe_total"
+    include_text: bool = True,  # Incluir text_content (el texto extraído completo)
+    engine: Optional[str] = None,  # Motor de la capa de texto de los PDFs: pdfium, pdfplumber, markitdown o auto
+    processor: FileProcessor = Depends(get_file_processor),
 ):
     #return {"filename": file.filename, "current_user": current_user, "extract_qr": extract_qr, "ollama_response": ollama_response}
-    processor = FileProcessor()
-    return await processor.process_file(file, extract_qr, ollama_response)
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    result = await processor.process_file(
+        file, extract_qr, ollama_response, pages, early_exit, is_disconnected=request.is_disconnected, engine=engine,
+        include_text=include_text,
+    )
+    # El resultado ya es JSON nativo: se serializa directo, sin pasar por jsonable_encoder
+    return FastJSONResponse(project_result(result, selected_fields, include_text))
+
+@router.post("/upload/batch")
+async def upload_batch(
+    files: List[UploadFile] = File(...),  # PDFs, imágenes o archivos ZIP con comprobantes
+    current_user: str = Depends(get_current_user),
+    extract_qr: bool = True,
+    ollama_response: bool = False,
+    pages: Optional[str] = None,
+    early_exit: bool = True,
+    fields: Optional[str] = None,
+    include_text: bool = True,
+    engine: Optional[str] = None,
+    processor: FileProcessor = Depends(get_file_processor),
+):
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # Como en /upload/, cada archivo se lee vía mmap del temporal de Starlette. Los UploadFile se cierran
+    # cuando empieza el streaming, pero el mmap sigue siendo válido hasta que se cierra el UploadSource.
+    max_bytes = get_settings().MAX_BATCH_UPLOAD_BYTES
+    sources = [await UploadSource.from_upload(file, max_bytes) for file in files]
+    try:
+        contents = [(file.filename, file.content_type, source) for file, source in zip(files, sources)]
+        # Descomprimir es CPU-bound: fuera del event loop
+        items = await run_in_threadpool(processor.expand_archives, contents)
+    except BaseException:
+        close_sources(sources)
+        raise
+
+    async def ndjson():
+        try:
+            results = processor.process_batch(
+                items, extract_qr, ollama_response, pages, early_exit, engine, include_text
+            )
+            async for result in results:
+                yield dumps(project_result(result, selected_fields, include_text)) + b"\n"
+        finally:
+            close_sources(sources)
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+@router.post("/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    current_user: str = Depends(get_current_user),
+    extract_qr: bool = True,
+    ollama_response: bool = False,
+    pages: Optional[str] = None,
+    early_exit: bool = True,
+    fields: Optional[str] = None,
+    include_text: bool = True,
+    engine: Optional[str] = None,
+    callback_url: Optional[str] = Form(None),  # URL a la que se envía el job terminado (POST JSON)
+    processor: FileProcessor = Depends(get_file_processor),
+):
+    try:
+        selected_fields = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # El job se queda con el UploadSource (mmap del temporal) y lo cierra al terminar
+    source = await UploadSource.from_upload(file, get_settings().MAX_UPLOAD_BYTES)
+    try:
+        job = await get_job_manager().submit(
+            processor, source, file.filename, file.content_type, callback_url, selected_fields, include_text,
+            extract_qr=extract_qr, ollama_response=ollama_response, pages=pages, early_exit=early_exit,
+            engine=engine,
+        )
+    except BaseException:
+        source.close()
+        raise
+    return {"job_id": job["id"], "status": job["status"]}
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, current_user: str = Depends(get_current_user)):
+    job = await get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@router.get("/ready")
+async def ready():
+    # El balanceador solo debe enviar tráfico cuando los modelos terminaron de cargar
+    registry = get_registry()
+    status = registry.get_status()
+    if not registry.is_ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+@router.get("/metrics")
+async def metrics():
+    # Formato de texto de Prometheus; los gauges se leen en el momento del scrape
+    registry = get_registry()
+    if registry.executor is not None:
+        POOL_IN_FLIGHT.set(registry.executor.in_flight)
+        POOL_QUEUE_DEPTH.set(registry.executor.queue_depth)
+    if registry.ollama_service is not None:
+        OLLAMA_QUEUE_DEPTH.set(registry.ollama_service.queue_depth)
+    JOBS_QUEUE_DEPTH.set(get_job_manager().queue_depth)
+    return PlainTextResponse(REGISTRY.render(), media_type="text/plain; version=0.0.4")
@@ -1,6 +1,7 @@
 # app/core/config.py
 from pydantic_settings import BaseSettings
 from functools import lru_cache
+from typing import Optional
 
 class Settings(BaseSettings):
     USER: str
@@ -8,7 +9,50 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_TOKEN_CACHE_SIZE: int = 1024  # Tokens verificados en memoria; 0 verifica la firma en cada request
+    JWT_BACKEND: str = "auto"  # "auto", "pyjwt" o "jose"
     TESSERACT_CMD: str = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
+    OCR_BACKEND: str = "auto"  # "auto", "tesserocr" o "pytesseract"
+    TESSDATA_PATH: Optional[str] = None  # Carpeta tessdata para tesserocr, si no es la del sistema
+    OCR_TARGET_DPI: int = 300  # Las fotos más grandes que un A4 a esta resolución se reducen antes del OCR
+    OCR_LADDER: bool = True  # Escalar a OCR más caro solo si la pasada barata no da un comprobante válido
+    LAYOUT_TEMPLATES: bool = True  # OCR solo de las franjas aprendidas para el diseño de cada emisor (PDFs escaneados)
+    LAYOUT_TEMPLATE_MAX: int = 1000
+    LAYOUT_TEMPLATE_MIN_SIMILARITY: float = 0.9  # Similitud mínima entre la página y la plantilla para aplicarla
+    PDF_TEXT_BACKEND: str = "auto"  # Motor de la capa de texto: "auto", "pdfium", "pdfplumber" o "markitdown"
+    OLLAMA_HOST: str = "http://localhost:11434"
+    OLLAMA_MODEL: str = "llama3.2:1b"
+    OLLAMA_MAX_CONCURRENCY: int = 2  # Generaciones simultáneas; las demás esperan en la app, no en el servidor
+    OLLAMA_TIMEOUT_SECONDS: float = 60.0
+    OLLAMA_MODE: str = "gaps"  # "gaps": solo los campos que faltan; "full": texto completo, todos los datos
+    MAX_UPLOAD_BYTES: int = 20 * 1024 * 1024  # Tamaño máximo del cuerpo de un request (413 si se supera)
+    MAX_BATCH_UPLOAD_BYTES: int = 500 * 1024 * 1024  # Límite para /upload/batch
+    ZIP_MAX_MEMBERS: int = 1000  # Archivos por lote, sumando los de todos los ZIP
+    ZIP_MAX_UNCOMPRESSED_BYTES: int = 500 * 1024 * 1024  # Tamaño descomprimido del lote (413 si se supera)
+    GZIP_MIN_SIZE: int = 1024  # Respuestas de al menos estos bytes se comprimen con gzip (0 lo desactiva)
+    LOG_LEVEL: str = "INFO"
+    LOG_FORMAT: str = "json"  # "json" (un objeto por línea) o "text"
+    # Nivel por librería: pdfminer loguea cada operador del PDF en DEBUG
+    LOG_LIBRARY_LEVELS: str = "pdfminer=WARNING,pdfplumber=WARNING,PIL=WARNING,multipart=WARNING,httpx=WARNING"
+    LOG_SUCCESS_SAMPLE_RATE: float = 0.1  # Fracción de requests exitosos que se loguean; los fallidos, siempre
+    SERVER_HOST: str = "0.0.0.0"
+    SERVER_PORT: int = 8000
+    SERVER_WORKERS: int = 1  # Procesos uvicorn al ejecutar main.py
+    SERVER_PRELOAD: bool = True  # Cargar los modelos en el maestro antes del fork (compartidos entre workers)
+    EXTRACTION_EXECUTOR: str = "thread"  # "thread" o "process"
+    EXTRACTION_WORKERS: int = 4
+    EXTRACTION_MAX_QUEUE: int = 16
+    PDF_PAGES: str = "1"  # Páginas a procesar por defecto: "1", "1-3,5", "all"
+    PDF_PAGE_WORKERS: int = 4
+    PDF_DEDUPE_COPIES: bool = True  # Procesar una sola vez las páginas ORIGINAL/DUPLICADO/TRIPLICADO iguales
+    RESULT_CACHE_SIZE: int = 256
+    RESULT_CACHE_TTL_SECONDS: int = 3600
+    RESULT_CACHE_DB_PATH: Optional[str] = None  # p. ej. "cache.sqlite3" para compartir entre workers
+    JOBS_WORKERS: int = 2
+    JOBS_MAX_QUEUE: int = 1000
+    JOBS_TTL_SECONDS: int = 86400
+    JOBS_DB_PATH: Optional[str] = None  # p. ej. "jobs.sqlite3"; sin valor los jobs viven en memoria
+    JOBS_CALLBACK_ALLOWED_HOSTS: str = ""  # Hosts permitidos para callback_url, separados por comas
 
     class Config:
         env_file = ".env"
@@ -1,4 +1,13 @@
 # app/core/dependencies.py
+from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from .registry import get_registry
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
+
+
+def get_file_processor():
+    registry = get_registry()
+    if not registry.is_ready:
+        raise HTTPException(status_code=503, detail="Models are still loading")
+    return registry.file_processor
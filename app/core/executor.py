@@ -0,0 +1,124 @@
+# app/core/executor.py
+import asyncio
+import contextvars
+import functools
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+
+from .config import get_settings
+from .metrics import REGISTRY, end_trace, start_trace
+
+
+class ExtractionExecutor:
+    """
+    Pool acotado para el trabajo CPU-bound de extracción (pdfplumber, PDFium, QReader, Tesseract).
+
+    Las consultas a Ollama no pasan por acá: corren en el cliente asíncrono de OllamaService, en el event loop.
+
+    Con kind="thread" se aprovechan las librerías que liberan el GIL; con kind="process" cada proceso
+    hijo carga sus propios modelos. Cuando hay más de max_workers + max_queue trabajos pendientes se
+    responde 503 en lugar de encolar sin límite.
+    """
+
+    def __init__(self, kind: str = "thread", max_workers: int = 4, max_queue: int = 16):
+        if kind not in ("thread", "process"):
+            raise ValueError(f"Unsupported executor kind: {kind}")
+        self.kind = kind
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._executor: Executor
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="extraction")
+
+    @classmethod
+    def from_settings(cls) -> "ExtractionExecutor":
+        settings = get_settings()
+        return cls(
+            kind=settings.EXTRACTION_EXECUTOR,
+            max_workers=settings.EXTRACTION_WORKERS,
+            max_queue=settings.EXTRACTION_MAX_QUEUE,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Trabajos esperando un worker libre (sin contar los que ya se están ejecutando)."""
+        return max(self._pending - self.max_workers, 0)
+
+    @property
+    def in_flight(self) -> int:
+        return self._pending
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                raise HTTPException(
+                    status_code=503,
+                    detail="Extraction workers are saturated, retry later",
+                    headers={"Retry-After": "1"},
+                )
+            self._pending += 1
+        try:
+            loop = asyncio.get_running_loop()
+            call = functools.partial(fn, *args, **kwargs)
+            if self.kind == "thread":
+                # El worker hereda el contexto del request (la traza del Server-Timing)
+                call = functools.partial(contextvars.copy_context().run, call)
+            return await loop.run_in_executor(self._executor, call)
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_page_executor: Optional[ThreadPoolExecutor] = None
+_page_executor_lock = threading.Lock()
+
+
+def get_page_executor() -> ThreadPoolExecutor:
+    """
+    Pool de threads para procesar páginas de un mismo PDF en paralelo. Es distinto del pool de extracción:
+    un trabajo que ya ocupa un worker del pool principal no puede esperar a otros trabajos encolados en él.
+    """
+    global _page_executor
+    with _page_executor_lock:
+        if _page_executor is None:
+            _page_executor = ThreadPoolExecutor(
+                max_workers=get_settings().PDF_PAGE_WORKERS, thread_name_prefix="pdf-page"
+            )
+        return _page_executor
+
+
+def _init_worker() -> None:
+    # Cada proceso hijo construye su propio registro de modelos una única vez
+    from .registry import get_registry
+    from ..utils.logging import setup_logging
+
+    # Con fork el listener ya se reinició; con spawn el hijo no importó main.py y hay que configurarlo
+    setup_logging()
+    get_registry().warm_up(with_executor=False)
+
+
+def process_content_in_worker(*args, **kwargs) -> Tuple[dict, List[Tuple[str, float]], Dict[str, Any]]:
+    """
+    Punto de entrada picklable para el modo proceso: usa el FileProcessor del registro del proceso hijo.
+    Devuelve también las etapas medidas y las métricas acumuladas, que el proceso principal incorpora.
+    """
+    from .registry import get_registry
+
+    registry = get_registry()
+    registry.warm_up(with_executor=False)
+    trace, token = start_trace()
+    try:
+        result = registry.file_processor.process_content(*args, **kwargs)
+    finally:
+        end_trace(token)
+    return result, trace.spans, REGISTRY.drain()
@@ -0,0 +1,270 @@
+# app/core/metrics.py
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# Segundos: desde una regla regex (ms) hasta una generación de Ollama o un OCR de varias pasadas
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], Any] = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{value}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def drain(self) -> Dict[Tuple[str, ...], Any]:
+        with self._lock:
+            values, self._values = self._values, {}
+        return values
+
+    def merge(self, values: Dict[Tuple[str, ...], Any]) -> None:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{self._labels(key)} {value}"
+
+    def merge(self, values: Dict[Tuple[str, ...], float]) -> None:
+        with self._lock:
+            for key, value in values.items():
+                self._values[key] = self._values.get(key, 0.0) + value
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{self._labels(key)} {value}"
+
+    def drain(self) -> Dict[Tuple[str, ...], Any]:
+        # Un gauge refleja el estado del proceso que lo expone: no se transfiere entre procesos
+        return {}
+
+    def merge(self, values: Dict[Tuple[str, ...], float]) -> None:
+        pass
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            # [conteo por bucket (no acumulado), suma, cantidad]
+            state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[0][index] += 1
+                    break
+            state[1] += value
+            state[2] += 1
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = {key: (list(counts), total, count) for key, (counts, total, count) in self._values.items()}
+        for key, (counts, total, count) in sorted(values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                labels = self._labels(key, f'le="{bound}"')
+                yield f"{self.name}_bucket{labels} {cumulative}"
+            labels = self._labels(key, 'le="+Inf"')
+            yield f"{self.name}_bucket{labels} {count}"
+            yield f"{self.name}_sum{self._labels(key)} {total}"
+            yield f"{self.name}_count{self._labels(key)} {count}"
+
+    def merge(self, values: Dict[Tuple[str, ...], list]) -> None:
+        with self._lock:
+            for key, (counts, total, count) in values.items():
+                state = self._values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+                state[0] = [current + added for current, added in zip(state[0], counts)]
+                state[1] += total
+                state[2] += count
+
+
+class MetricsRegistry:
+    """Métricas del proceso en formato de exposición de texto de Prometheus (sin dependencias externas)."""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+    def drain(self) -> Dict[str, Dict[Tuple[str, ...], Any]]:
+        """Devuelve y reinicia los valores acumulados; lo usan los procesos hijos del pool."""
+        return {name: metric.drain() for name, metric in self._metrics.items()}
+
+    def merge(self, snapshot: Dict[str, Dict[Tuple[str, ...], Any]]) -> None:
+        for name, values in snapshot.items():
+            metric = self._metrics.get(name)
+            if metric is not None and values:
+                metric.merge(values)
+
+
+REGISTRY = MetricsRegistry()
+
+STAGE_SECONDS = REGISTRY.register(Histogram(
+    "extraction_stage_seconds", "Duración de cada etapa del pipeline de extracción", ["stage"]
+))
+TEXT_SOURCE_TOTAL = REGISTRY.register(Counter(
+    "extraction_text_source_total", "Páginas o imágenes según de dónde salió el texto", ["source"]
+))
+LAYOUT_TEMPLATE_TOTAL = REGISTRY.register(Counter(
+    "layout_template_total", "Páginas escaneadas según el uso de plantillas de diseño por emisor", ["result"]
+))
+PDF_TEXT_BACKEND_TOTAL = REGISTRY.register(Counter(
+    "pdf_text_backend_total", "Páginas cuya capa de texto se leyó con cada backend", ["backend"]
+))
+PDF_COPY_PAGES_SKIPPED_TOTAL = REGISTRY.register(Counter(
+    "pdf_copy_pages_skipped_total", "Páginas no procesadas por ser copia de otra página del mismo PDF"
+))
+QR_DETECTION_TOTAL = REGISTRY.register(Counter(
+    "qr_detection_total", "Intentos de lectura de QR por nivel y resultado", ["tier", "result"]
+))
+RESULT_CACHE_TOTAL = REGISTRY.register(Counter(
+    "result_cache_requests_total", "Consultas a la cache de resultados", ["result"]
+))
+OLLAMA_REQUESTS_TOTAL = REGISTRY.register(Counter(
+    "ollama_requests_total", "Consultas a Ollama por resultado", ["result"]
+))
+POOL_IN_FLIGHT = REGISTRY.register(Gauge(
+    "extraction_pool_in_flight", "Trabajos en el pool de extracción (ejecutando o en espera)"
+))
+POOL_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "extraction_pool_queue_depth", "Trabajos esperando un worker libre en el pool de extracción"
+))
+JOBS_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "jobs_queue_depth", "Jobs en segundo plano esperando ser procesados"
+))
+OLLAMA_QUEUE_DEPTH = REGISTRY.register(Gauge(
+    "ollama_queue_depth", "Generaciones esperando lugar en el semáforo de Ollama"
+))
+
+
+class Trace:
+    """Etapas medidas durante un request, para el header Server-Timing y el log del request."""
+
+    def __init__(self):
+        self.spans: List[Tuple[str, float]] = []
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self.spans.append((stage, seconds))
+
+    def extend(self, spans: List[Tuple[str, float]]) -> None:
+        with self._lock:
+            self.spans.extend(spans)
+
+    def totals(self) -> Dict[str, List[float]]:
+        """Suma de las duraciones y cantidad de repeticiones de cada etapa (varias páginas, varios intentos)."""
+        totals: Dict[str, List[float]] = {}
+        with self._lock:
+            for stage, seconds in self.spans:
+                totals.setdefault(stage, [0.0, 0])
+                totals[stage][0] += seconds
+                totals[stage][1] += 1
+        return totals
+
+    def stages_ms(self) -> Dict[str, float]:
+        return {stage: round(seconds * 1000, 1) for stage, (seconds, _) in self.totals().items()}
+
+    def server_timing(self) -> str:
+        # Una entrada por etapa con la suma de sus duraciones; si se repitió se indica cuántas veces
+        entries = []
+        for stage, (seconds, count) in self.totals().items():
+            description = f';desc="x{count}"' if count > 1 else ""
+            entries.append(f"{stage}{description};dur={seconds * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current_trace: contextvars.ContextVar[Optional[Trace]] = contextvars.ContextVar("current_trace", default=None)
+
+
+def start_trace() -> Tuple[Trace, contextvars.Token]:
+    trace = Trace()
+    return trace, _current_trace.set(trace)
+
+
+def end_trace(token: contextvars.Token) -> None:
+    _current_trace.reset(token)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def record_stage(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(stage, seconds)
+
+
+@contextmanager
+def span(stage: str) -> Iterator[None]:
+    """Mide el bloque como una etapa: alimenta el histograma y, si hay un request en curso, su Server-Timing."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def absorb_worker_metrics(spans: List[Tuple[str, float]], snapshot: Dict[str, Dict[Tuple[str, ...], Any]]) -> None:
+    """Incorpora lo medido en un proceso hijo del pool: las métricas al registro y las etapas al request actual."""
+    REGISTRY.merge(snapshot)
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.extend(spans)
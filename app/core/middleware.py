@@ -0,0 +1,214 @@
+# app/core/middleware.py
+import gzip
+import logging
+import random
+import time
+import uuid
+from typing import Dict, Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import current_trace, end_trace, start_trace
+from ..utils.logging import logger, reset_request_id, set_request_id
+
+
+class _BodyTooLarge(Exception):
+    pass
+
+
+class MaxBodySizeMiddleware:
+    """
+    Corta con 413 los requests cuyo cuerpo supera max_bytes. Se controla tanto el Content-Length declarado
+    como los bytes que realmente llegan, para que un upload chunked no pueda evadir el límite.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int, path_limits: Optional[Dict[str, int]] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+        # Límites específicos por ruta (p. ej. el endpoint batch admite cuerpos más grandes)
+        self.path_limits = path_limits or {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.path_limits.get(scope.get("path", ""), self.max_bytes)
+        headers = dict(scope.get("headers") or [])
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_bytes:
+            await self._reject(scope, receive, send, max_bytes)
+            return
+
+        received = 0
+        exceeded = False
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            if exceeded:
+                return {"type": "http.disconnect"}
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_bytes:
+                    # Se corta la lectura con _BodyTooLarge. FastAPI convierte cualquier error al parsear el form
+                    # en un 400: limited_send descarta esa respuesta y al terminar se envía el 413. Las lecturas
+                    # siguientes devuelven http.disconnect.
+                    exceeded = True
+                    raise _BodyTooLarge()
+            return message
+
+        async def limited_send(message: Message) -> None:
+            nonlocal response_started
+            if exceeded:
+                return
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, limited_send)
+        except _BodyTooLarge:
+            pass
+        if exceeded and not response_started:
+            await self._reject(scope, receive, send, max_bytes)
+
+    @staticmethod
+    async def _reject(scope: Scope, receive: Receive, send: Send, max_bytes: int) -> None:
+        response = JSONResponse(
+            status_code=413, content={"detail": f"Request body exceeds the maximum size of {max_bytes} bytes"}
+        )
+        await response(scope, receive, send)
+
+
+class ServerTimingMiddleware:
+    """
+    Abre una traza por request y devuelve las etapas medidas (ver metrics.span) en el header Server-Timing,
+    visible en las herramientas de desarrollo del navegador o con curl -v.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace, token = start_trace()
+        start = time.perf_counter()
+
+        async def send_with_timing(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                total = f"total;dur={(time.perf_counter() - start) * 1000:.1f}"
+                stages = trace.server_timing()
+                headers = MutableHeaders(scope=message)
+                headers.append("Server-Timing", f"{stages}, {total}" if stages else total)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            end_trace(token)
+
+
+class RequestLogMiddleware:
+    """
+    Asigna un id a cada request (el X-Request-ID del cliente, o uno nuevo) que acompaña a todos los logs
+    emitidos mientras se atiende y se devuelve en la respuesta. Al terminar escribe un registro con el
+    estado, la duración y las etapas medidas: siempre si el request falló (status >= 400 o excepción) y
+    solo una fracción sample_rate de los exitosos. Debe quedar dentro de ServerTimingMiddleware para ver
+    su traza.
+    """
+
+    def __init__(self, app: ASGIApp, sample_rate: float = 0.1):
+        self.app = app
+        self.sample_rate = sample_rate
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        token = set_request_id(request_id)
+        start = time.perf_counter()
+        status = 500
+
+        async def send_with_id(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message).append("X-Request-ID", request_id)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        except BaseException:
+            status = 500
+            raise
+        finally:
+            if status >= 400 or random.random() < self.sample_rate:
+                trace = current_trace()
+                logger.log(
+                    logging.WARNING if status >= 500 else logging.INFO,
+                    f"{scope.get('method')} {scope.get('path')} {status}",
+                    extra={
+                        "status": status,
+                        "duration_ms": round((time.perf_counter() - start) * 1000, 1),
+                        "stages": trace.stages_ms() if trace is not None else None,
+                    },
+                )
+            reset_request_id(token)
+
+
+class GZipMiddleware:
+    """
+    Comprime con gzip las respuestas de un solo cuerpo de al menos minimum_size bytes si el cliente envía
+    Accept-Encoding: gzip. A diferencia del de Starlette, las respuestas en streaming (el NDJSON de
+    /upload/batch) pasan sin comprimir para que cada resultado llegue apenas está listo.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, compresslevel: int = 6):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or "gzip" not in Headers(scope=scope).get("accept-encoding", ""):
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                start_message = message
+                passthrough = "content-encoding" in Headers(raw=message["headers"])
+                if passthrough:
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            if start_message is not None:
+                body = message.get("body", b"")
+                if not message.get("more_body", False) and len(body) >= self.minimum_size:
+                    body = gzip.compress(body, compresslevel=self.compresslevel)
+                    headers = MutableHeaders(scope=start_message)
+                    headers["Content-Encoding"] = "gzip"
+                    headers["Content-Length"] = str(len(body))
+                    headers.add_vary_header("Accept-Encoding")
+                    message = {**message, "body": body}
+                else:
+                    passthrough = True
+                await send(start_message)
+                start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
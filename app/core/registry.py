@@ -0,0 +1,138 @@
+# app/core/registry.py
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, Optional
+
+import numpy as np
+
+from .executor import ExtractionExecutor
+from ..services.comprobante_data_extractor import ComprobanteDataExtractor
+from ..services.file_processor import FileProcessor
+from ..services.ollama_service import OllamaService
+from ..services.qr_extractor import QRExtractor
+from ..services.result_cache import ResultCache
+from ..services.text_extractor import TextExtractor
+from ..utils.logging import logger
+
+if TYPE_CHECKING:
+    from qreader import QReader
+
+
+def _create_qreader() -> "QReader":
+    # qreader arrastra torch y ultralytics: se importa al cargar los modelos, no al importar la app
+    from qreader import QReader
+
+    return QReader()
+
+
+class ModelRegistry:
+    """Mantiene los modelos y extractores del proceso, construidos una sola vez al iniciar la app."""
+
+    def __init__(self):
+        self.qreader: Optional["QReader"] = None
+        self.text_extractor: Optional[TextExtractor] = None
+        self.comprobante_data_extractor: Optional[ComprobanteDataExtractor] = None
+        self.ollama_service: Optional[OllamaService] = None
+        self.file_processor: Optional[FileProcessor] = None
+        self.executor: Optional[ExtractionExecutor] = None
+        self.result_cache: Optional[ResultCache] = None
+        self._lock = threading.Lock()
+        self._status: Dict[str, Any] = {
+            "state": "pending",
+            "components": {},
+            "error": None,
+            "warmup_time": None,
+        }
+
+    @property
+    def is_ready(self) -> bool:
+        return self._status["state"] == "ready"
+
+    def get_status(self) -> Dict[str, Any]:
+        return {**self._status, "components": dict(self._status["components"])}
+
+    def warm_up(self, with_executor: bool = True) -> None:
+        """
+        Carga QReader, los extractores y el cliente de Ollama. Es seguro llamarlo más de una vez.
+        Los procesos hijos del pool llaman con with_executor=False para no crear pools anidados.
+        """
+        with self._lock:
+            if self.is_ready:
+                return
+
+            start_time = time.time()
+            self._status["state"] = "loading"
+            try:
+                self._load_models()
+                if with_executor:
+                    # Ollama solo se consulta desde el event loop del proceso principal
+                    self.ollama_service = self._load("ollama_service", OllamaService.from_settings)
+                    self.executor = self._load("executor", ExtractionExecutor.from_settings)
+                    self.result_cache = self._load("result_cache", ResultCache.from_settings)
+
+                self.file_processor = FileProcessor(
+                    text_extractor=self.text_extractor,
+                    qr_extractor=QRExtractor(qreader=self.qreader),
+                    comprobante_data_extractor=self.comprobante_data_extractor,
+                    ollama_service=self.ollama_service,
+                    executor=self.executor,
+                    result_cache=self.result_cache,
+                )
+                self._status["state"] = "ready"
+            except Exception as e:
+                logger.error(f"Error inicializando modelos: {str(e)}")
+                self._status["state"] = "failed"
+                self._status["error"] = str(e)
+            finally:
+                self._status["warmup_time"] = round(time.time() - start_time, 2)
+
+    def preload(self) -> None:
+        """
+        Carga solo los modelos, sin crear threads, pools ni conexiones. Lo usa el proceso maestro antes de
+        hacer fork: los workers heredan los pesos ya cargados y los comparten por copy-on-write.
+        """
+        with self._lock:
+            start_time = time.time()
+            try:
+                self._load_models()
+            except Exception as e:
+                # Cada worker vuelve a intentarlo en su warm_up e informa el error en /ready
+                logger.error(f"Error precargando modelos: {str(e)}")
+            self._status["preload_time"] = round(time.time() - start_time, 2)
+
+    def _load_models(self) -> None:
+        if self.qreader is None:
+            self.qreader = self._load("qreader", _create_qreader)
+            # Una inferencia en vacío fuerza la carga perezosa de los pesos del detector
+            self._load("qreader_inference", lambda: self.qreader.detect_and_decode(
+                image=np.zeros((64, 64, 3), dtype=np.uint8)
+            ))
+        if self.text_extractor is None:
+            self.text_extractor = self._load("text_extractor", TextExtractor)
+            if self.text_extractor.text_layer.engine == "markitdown":
+                # Con MarkItDown como motor por defecto el conversor se crea acá (antes del fork si hay preload)
+                self._load("markitdown", self.text_extractor.text_layer.preload)
+        if self.comprobante_data_extractor is None:
+            self.comprobante_data_extractor = self._load("comprobante_data_extractor", ComprobanteDataExtractor)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+
+    async def aclose(self) -> None:
+        """Cierra las conexiones asíncronas; se llama desde el lifespan, dentro del event loop."""
+        if self.ollama_service is not None:
+            await self.ollama_service.close()
+
+    def _load(self, name: str, factory):
+        start_time = time.time()
+        component = factory()
+        self._status["components"][name] = round(time.time() - start_time, 2)
+        return component
+
+
+_registry = ModelRegistry()
+
+
+def get_registry() -> ModelRegistry:
+    return _registry
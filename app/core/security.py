@@ -1,25 +1,155 @@
 # app/core/security.py
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+import hashlib
+import threading
+import time
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException
 from .dependencies import oauth2_scheme
 from .config import get_settings
+from ..utils.logging import logger
+
+try:
+    import jwt as pyjwt
+    if not hasattr(pyjwt, "PyJWTError"):  # otro paquete que también se instala como "jwt"
+        pyjwt = None
+except ImportError:  # PyJWT es opcional: sin él se verifica con python-jose
+    pyjwt = None
 
 settings = get_settings()
 
+# Tokens sin claim "exp": cuánto tiempo se confía en la verificación guardada
+NO_EXP_TTL_SECONDS = 300
+
+
+class JoseBackend:
+    """Verificación con python-jose (la misma librería que firma los tokens)."""
+
+    name = "jose"
+
+    def decode(self, token: str, key: str, algorithm: str) -> Dict:
+        return jwt.decode(token, key, algorithms=[algorithm])
+
+
+class PyJWTBackend:
+    """Verificación con PyJWT: menos capas de validación por llamada que python-jose, mismo resultado."""
+
+    name = "pyjwt"
+
+    def __init__(self):
+        if pyjwt is None:
+            raise RuntimeError("PyJWT is not installed")
+
+    def decode(self, token: str, key: str, algorithm: str) -> Dict:
+        try:
+            return pyjwt.decode(token, key, algorithms=[algorithm])
+        except pyjwt.PyJWTError as e:
+            # Se traduce al error de jose para que el resto del módulo maneje un único tipo
+            raise JWTError(str(e)) from e
+
+
+def create_jwt_backend(name: str = "auto"):
+    """Crea el backend pedido; con "auto" usa PyJWT si está instalado y si no python-jose."""
+    if name in ("auto", "pyjwt"):
+        try:
+            return PyJWTBackend()
+        except Exception as e:
+            if name == "pyjwt":
+                raise
+            logger.info(f"PyJWT no disponible, se usa python-jose: {str(e)}")
+    if name not in ("auto", "jose"):
+        raise ValueError(f"Unsupported JWT backend: {name}")
+    return JoseBackend()
+
+
+class VerifiedTokenCache:
+    """
+    Tokens ya verificados, indexados por el SHA-256 del token: un request repetido con el mismo token se
+    resuelve con una búsqueda en un dict en lugar de decodificar y verificar la firma. Cada entrada vence
+    con el claim "exp" del token; un token alterado tiene otro digest y pasa por la verificación completa.
+    """
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[bytes, Tuple[str, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[str]:
+        if self.max_entries <= 0:
+            return None
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            username, expires_at = entry
+            if expires_at <= time.time():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return username
+
+    def put(self, token: str, username: str, exp: Optional[float]) -> None:
+        if self.max_entries <= 0:
+            return
+        expires_at = float(exp) if exp is not None else time.time() + NO_EXP_TTL_SECONDS
+        key = self._key(token)
+        with self._lock:
+            self._entries[key] = (username, expires_at)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+_jwt_backend = None
+_token_cache: Optional[VerifiedTokenCache] = None
+
+
+def get_jwt_backend():
+    global _jwt_backend
+    if _jwt_backend is None:
+        _jwt_backend = create_jwt_backend(settings.JWT_BACKEND)
+    return _jwt_backend
+
+
+def get_token_cache() -> VerifiedTokenCache:
+    global _token_cache
+    if _token_cache is None:
+        _token_cache = VerifiedTokenCache(settings.AUTH_TOKEN_CACHE_SIZE)
+    return _token_cache
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
 
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
+    cache = get_token_cache()
+    username = cache.get(token)
+    if username is not None:
+        return username
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
+        payload = get_jwt_backend().decode(token, settings.SECRET_KEY, settings.ALGORITHM)
         username: str = payload.get("sub")
         if username is None:
             raise HTTPException(status_code=401, detail="Invalid authentication credentials")
+        cache.put(token, username, payload.get("exp"))
         return username
     except JWTError:
-        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
\ No newline at end of file
+        raise HTTPException(status_code=401, detail="Invalid authentication credentials")
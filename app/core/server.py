@@ -0,0 +1,119 @@
+# app/core/server.py
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Optional, Set
+
+import uvicorn
+
+from .registry import get_registry
+from ..utils.logging import logger, stop_logging
+
+
+def _set_torch_threads(threads: int) -> None:
+    # Solo si algún modelo ya importó torch: no se importa acá para no cargarlo sin necesidad
+    torch = sys.modules.get("torch")
+    if torch is not None:
+        torch.set_num_threads(max(threads, 1))
+
+
+class PreforkServer:
+    """
+    Sirve la app con varios procesos uvicorn que comparten un mismo socket. Con preload=True el maestro
+    carga los modelos una única vez antes de hacer fork y los workers heredan los pesos por copy-on-write,
+    en lugar de que cada uno importe torch y cargue su propia copia (lo que hace `uvicorn --workers`).
+
+    Si un worker termina de forma inesperada se inicia otro; SIGINT o SIGTERM al maestro detienen a todos.
+    """
+
+    # Espera antes de reemplazar un worker caído, para no entrar en un ciclo de fork si falla al iniciar
+    RESPAWN_DELAY_SECONDS = 1.0
+
+    def __init__(self, config: uvicorn.Config, workers: int, preload: bool = True):
+        self.config = config
+        self.workers = workers
+        self.preload = preload
+        self.children: Set[int] = set()
+        self._socket: Optional[socket.socket] = None
+        self._stopping = False
+
+    def run(self) -> None:
+        self._socket = self.config.bind_socket()
+        if self.preload:
+            # torch no es fork-safe si ya creó su pool de OpenMP: el maestro carga e infiere con un solo thread
+            # y cada worker configura el suyo después del fork
+            _set_torch_threads(1)
+            get_registry().preload()
+            # Los objetos ya creados no vuelven a recorrerse en el GC de los workers, que si no escribiría
+            # en sus páginas y rompería el copy-on-write
+            gc.collect()
+            gc.freeze()
+        logger.info(
+            f"Iniciando {self.workers} workers en {self.config.host}:{self.config.port} "
+            f"(modelos precargados: {self.preload}, pid maestro {os.getpid()})"
+        )
+
+        signal.signal(signal.SIGINT, self._handle_stop)
+        signal.signal(signal.SIGTERM, self._handle_stop)
+        for _ in range(self.workers):
+            self._spawn()
+
+        while self.children:
+            try:
+                pid, status = os.wait()
+            except ChildProcessError:
+                break
+            self.children.discard(pid)
+            if not self._stopping:
+                logger.warning(f"El worker {pid} terminó inesperadamente (estado {status}), se inicia otro")
+                time.sleep(self.RESPAWN_DELAY_SECONDS)
+                if not self._stopping:
+                    self._spawn()
+        self._socket.close()
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid:
+            self.children.add(pid)
+            return
+
+        exit_code = 0
+        try:
+            # Grupo de procesos propio: un Ctrl+C en la terminal llega solo al maestro, que lo reenvía una vez
+            os.setpgid(0, 0)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            if self.preload:
+                _set_torch_threads((os.cpu_count() or 1) // self.workers)
+            uvicorn.Server(self.config).run(sockets=[self._socket])
+        except BaseException as e:
+            logger.error(f"Error en el worker {os.getpid()}: {str(e)}")
+            exit_code = 1
+        finally:
+            stop_logging()
+            os._exit(exit_code)
+
+    def _handle_stop(self, signum, frame) -> None:
+        self._stopping = True
+        for pid in list(self.children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+
+def serve(app, host: str, port: int, workers: int = 1, preload: bool = True, log_level: str = "info") -> None:
+    """
+    Con un solo worker (o sin fork, como en Windows) se usa uvicorn.run tal cual. Los loggers de uvicorn
+    quedan sin handlers propios (log_config=None) y escriben en la cola de setup_logging; el access log de
+    uvicorn se reemplaza por el de RequestLogMiddleware, que tiene request_id, etapas y muestreo.
+    """
+    options = dict(host=host, port=port, log_level=log_level, log_config=None, access_log=False)
+    if workers <= 1 or not hasattr(os, "fork"):
+        uvicorn.run(app, **options)
+        return
+    config = uvicorn.Config(app, **options)
+    PreforkServer(config, workers, preload).run()
@@ -1,8 +1,18 @@
 # app/models/comprobante.py
 from pydantic import BaseModel
-from typing import Optional, Dict
+from typing import Any, ClassVar, Optional, Dict, List
 
 class Comprobante(BaseModel):
+    # Campos mínimos para considerar válido el comprobante
+    CAMPOS_REQUERIDOS: ClassVar[List[str]] = [
+        "punto_venta",
+        "numero_comprobante",
+        "fecha_emision",
+        "importe_total",
+        "cuit_emisor",
+        "razon_social_emisor",
+    ]
+
     # Información general del archivo
     filename: str
     size: int
@@ -11,6 +21,8 @@ class Comprobante(BaseModel):
     qr_content: Optional[str]
     diagnostic_messages: list[str]
     es_comprobante_valido: bool
+    # El QR de AFIP trajo todos los datos fiscales (no incluye la razón social: puede seguir faltando)
+    qr_afip_completo: bool = False
 
     # Campos comunes
     punto_venta: Optional[str]
@@ -42,16 +54,12 @@ class Comprobante(BaseModel):
     cantidad_copias: Optional[int]
 
     # Campos no definidos en el VO
-    otros_datos_no_formateados: Optional[Dict[str, str]]
+    otros_datos_no_formateados: Optional[Dict[str, Any]]
+
+    def campos_faltantes(self) -> List[str]:
+        """Devuelve los campos requeridos que todavía no tienen valor."""
+        return [campo for campo in self.CAMPOS_REQUERIDOS if not getattr(self, campo)]
 
     def es_valido(self) -> bool:
         """Valida si el comprobante tiene los campos mínimos requeridos."""
-        campos_requeridos = [
-            self.punto_venta,
-            self.numero_comprobante,
-            self.fecha_emision,
-            self.importe_total,
-            self.cuit_emisor,
-            self.razon_social_emisor,
-        ]
-        return all(campos_requeridos)
\ No newline at end of file
+        return not self.campos_faltantes()
\ No newline at end of file
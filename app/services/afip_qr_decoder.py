@@ -0,0 +1,125 @@
+# app/services/afip_qr_decoder.py
+import base64
+import binascii
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qs, urlparse
+from app.models.comprobante import Comprobante
+
+class AfipQRDecoder:
+    """
+    Decodifica el QR de las facturas electrónicas de AFIP.
+
+    El QR contiene una URL del tipo https://www.afip.gob.ar/fe/qr/?p=<base64> cuyo parámetro "p" es un
+    JSON con los datos fiscales del comprobante (RG 4892).
+    """
+
+    # Claves del JSON que deben estar presentes para considerar el QR completo
+    REQUIRED_KEYS = ("cuit", "ptoVta", "tipoCmp", "nroCmp", "fecha", "importe", "codAut")
+
+    # Tipo de documento 80 = CUIT
+    TIPO_DOC_CUIT = 80
+
+    @staticmethod
+    def decode(qr_content: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Devuelve el JSON del QR de AFIP, o None si el contenido no es un QR de AFIP válido."""
+        if not qr_content:
+            return None
+
+        # Puede haber más de un QR decodificado (uno por línea); se usa el primero que sea de AFIP
+        for line in qr_content.splitlines():
+            payload = AfipQRDecoder._decode_line(line.strip())
+            if payload is not None:
+                return payload
+        return None
+
+    @staticmethod
+    def _decode_line(line: str) -> Optional[Dict[str, Any]]:
+        parsed = urlparse(line)
+        if "afip.gob.ar" not in parsed.netloc:
+            return None
+
+        encoded = parse_qs(parsed.query).get("p")
+        if not encoded:
+            return None
+
+        # Algunos emisores usan el alfabeto url-safe o recortan el padding
+        data = encoded[0].strip().replace("-", "+").replace("_", "/")
+        data += "=" * (-len(data) % 4)
+        try:
+            raw = base64.b64decode(data)
+            payload = json.loads(raw.decode("utf-8"))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            return None
+
+        return payload if isinstance(payload, dict) else None
+
+    @staticmethod
+    def is_complete(payload: Optional[Dict[str, Any]]) -> bool:
+        if not payload:
+            return False
+        return all(payload.get(key) not in (None, "") for key in AfipQRDecoder.REQUIRED_KEYS)
+
+    @staticmethod
+    def to_fields(payload: Dict[str, Any]) -> Dict[str, Optional[str]]:
+        """Traduce el JSON del QR a los campos de Comprobante, con el mismo formato que imprime la factura."""
+        fields: Dict[str, Optional[str]] = {
+            "cuit_emisor": AfipQRDecoder._as_str(payload.get("cuit")),
+            "punto_venta": AfipQRDecoder._zero_pad(payload.get("ptoVta"), 5),
+            "numero_comprobante": AfipQRDecoder._zero_pad(payload.get("nroCmp"), 8),
+            "fecha_emision": AfipQRDecoder._format_fecha(payload.get("fecha")),
+            "importe_total": AfipQRDecoder._format_importe(payload.get("importe")),
+            "cuit_receptor": None,
+            "cae_numero": None,
+        }
+
+        if payload.get("tipoDocRec") == AfipQRDecoder.TIPO_DOC_CUIT:
+            fields["cuit_receptor"] = AfipQRDecoder._as_str(payload.get("nroDocRec"))
+
+        # tipoCodAut "E" = CAE, "A" = CAEA
+        if payload.get("tipoCodAut", "E") == "E":
+            fields["cae_numero"] = AfipQRDecoder._as_str(payload.get("codAut"))
+
+        return fields
+
+    @staticmethod
+    def apply_to(comprobante: Comprobante, payload: Dict[str, Any]) -> None:
+        """Completa el comprobante con los datos del QR. El QR tiene prioridad sobre lo leído por OCR."""
+        for field, value in AfipQRDecoder.to_fields(payload).items():
+            if value is not None:
+                setattr(comprobante, field, value)
+
+        otros = comprobante.otros_datos_no_formateados
+        for key, target in (("tipoCmp", "qr_tipo_comprobante"), ("moneda", "qr_moneda"), ("ctz", "qr_cotizacion"),
+                            ("tipoCodAut", "qr_tipo_codigo_autorizacion")):
+            if payload.get(key) is not None:
+                otros[target] = str(payload[key])
+
+    @staticmethod
+    def _as_str(value: Any) -> Optional[str]:
+        return str(value) if value not in (None, "") else None
+
+    @staticmethod
+    def _zero_pad(value: Any, width: int) -> Optional[str]:
+        if value in (None, ""):
+            return None
+        return str(value).zfill(width)
+
+    @staticmethod
+    def _format_fecha(value: Any) -> Optional[str]:
+        if not value:
+            return None
+        try:
+            return datetime.strptime(str(value), "%Y-%m-%d").strftime("%d/%m/%Y")
+        except ValueError:
+            return str(value)
+
+    @staticmethod
+    def _format_importe(value: Any) -> Optional[str]:
+        if value in (None, ""):
+            return None
+        try:
+            return f"{float(value):.2f}".replace(".", ",")
+        except (TypeError, ValueError):
+            return str(value)
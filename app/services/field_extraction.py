@@ -0,0 +1,134 @@
+# app/services/field_extraction.py
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class FieldRule:
+    """
+    Regla declarativa para uno o más campos del Comprobante.
+
+    `label` es la etiqueta literal con la que empieza el patrón; el completado con Ollama la usa para recortar
+    el texto alrededor de los campos que faltan.
+    """
+    name: str
+    fields: Tuple[str, ...]
+    label: str
+    pattern: str
+    flags: int = 0
+    strip: bool = False
+
+
+class FieldMatch(NamedTuple):
+    rule: str
+    value: str
+    start: int
+    end: int
+
+
+# Tabla de reglas: el orden define la prioridad cuando hay más de una regla para el mismo campo
+FIELD_RULES: List[FieldRule] = [
+    FieldRule("punto_venta", ("punto_venta",), "Punto de Venta:", r"Punto de Venta:\s*(\d+)"),
+    FieldRule("numero_comprobante", ("numero_comprobante",), "Comp", r"Comp\.? Nro:\s*(\d+)"),
+    FieldRule("fecha_emision", ("fecha_emision",), "Fecha de Emisión:", r"Fecha de Emisión:\s*(\d{2}/\d{2}/\d{4})"),
+    FieldRule("importe_total", ("importe_total",), "Importe Total:", r"Importe Total:\s*\$?\s*([\d.,]+)"),
+    FieldRule(
+        "periodo_facturado",
+        ("periodo_facturado_desde", "periodo_facturado_hasta"),
+        "Período Facturado Desde:",
+        r"Período Facturado Desde:\s*(\d{2}/\d{2}/\d{4})\s*Hasta:\s*(\d{2}/\d{2}/\d{4})",
+    ),
+    FieldRule("cuit_emisor", ("cuit_emisor",), "CUIT:", r"CUIT:\s*(\d{11})"),
+
+    # Emisor
+    FieldRule(
+        "razon_social_emisor", ("razon_social_emisor",), "Razón Social:",
+        r"Razón Social:\s*(.+?)(?=\n|Fecha de Emisión)", re.DOTALL, strip=True,
+    ),
+    FieldRule(
+        "domicilio_comercial_emisor", ("domicilio_comercial_emisor",), "Domicilio Comercial:",
+        r"Domicilio Comercial:\s*(.+?)(?=\n|CUIT)", re.DOTALL, strip=True,
+    ),
+    FieldRule(
+        "condicion_iva_emisor", ("condicion_iva_emisor",), "Condición frente al IVA:",
+        r"Condición frente al IVA:\s*(.+?)(?=\n|Fecha de Inicio de Actividades)", re.DOTALL, strip=True,
+    ),
+
+    # Receptor
+    FieldRule(
+        "cuit_receptor", ("cuit_receptor",), "CUIT:",
+        r"CUIT:\s*(\d{11})\s*Apellido y Nombre / Razón Social:",
+    ),
+    FieldRule(
+        "razon_social_receptor", ("razon_social_receptor",), "Apellido y Nombre / Razón Social:",
+        r"Apellido y Nombre / Razón Social:\s*(.+?)(?=\n|Condición frente al IVA)", re.DOTALL, strip=True,
+    ),
+    FieldRule(
+        "domicilio_comercial_receptor", ("domicilio_comercial_receptor",), "Apellido y Nombre / Razón Social:",
+        r"Apellido y Nombre / Razón Social:.+?Domicilio:\s*(.+?)(?=\n|$)", re.DOTALL, strip=True,
+    ),
+    FieldRule(
+        "condicion_iva_receptor", ("condicion_iva_receptor",), "Apellido y Nombre / Razón Social:",
+        r"Apellido y Nombre / Razón Social:.+?Condición frente al IVA:\s*(.+?)(?=\n|Domicilio)", re.DOTALL, strip=True,
+    ),
+
+    # Campos adicionales
+    FieldRule("subtotal", ("subtotal",), "Subtotal:", r"Subtotal:\s*\$?\s*([\d.,]+)"),
+    FieldRule("bonificacion_porcentaje", ("bonificacion_porcentaje",), "Bonif:", r"Bonif:\s*%(\d+)"),
+    FieldRule("bonificacion_importe", ("bonificacion_importe",), "Importe Bonif:", r"Importe Bonif:\s*\$?\s*([\d.,]+)"),
+    FieldRule(
+        "subtotal_con_bonificacion", ("subtotal_con_bonificacion",), "Subtotal c/Bonif",
+        r"Subtotal c/Bonif\.?:\s*\$?\s*([\d.,]+)",
+    ),
+    FieldRule(
+        "importe_otros_tributos", ("importe_otros_tributos",), "Importe Otros Tributos:",
+        r"Importe Otros Tributos:\s*\$?\s*([\d.,]+)",
+    ),
+    FieldRule("profesion_oficio", ("profesion_oficio",), '"', r"\"(.+? - MP \d+)\""),
+    FieldRule("cae_numero", ("cae_numero",), "CAE N°:", r"CAE N°:\s*(\d+)"),
+    FieldRule(
+        "cae_fecha_vencimiento", ("cae_fecha_vencimiento",), "Fecha de Vto. de CAE:",
+        r"Fecha de Vto\. de CAE:\s*(\d{2}/\d{2}/\d{4})",
+    ),
+]
+
+
+class FieldExtractionEngine:
+    """Compila la tabla de reglas una sola vez y la aplica sobre el texto del comprobante."""
+
+    def __init__(self, rules: List[FieldRule]):
+        self.rules = rules
+        self._compiled = [(rule, re.compile(rule.pattern, rule.flags)) for rule in rules]
+        self.fields = [field for rule in rules for field in rule.fields]
+
+    def match_fields(self, text: str) -> Dict[str, FieldMatch]:
+        """Devuelve, para cada campo encontrado, el valor y la regla que lo produjo."""
+        matches: Dict[str, FieldMatch] = {}
+        for rule, match in self._scan(text):
+            for group, field in enumerate(rule.fields, start=1):
+                if field not in matches:
+                    value = match.group(group)
+                    matches[field] = FieldMatch(
+                        rule.name, value.strip() if rule.strip else value, match.start(group), match.end(group)
+                    )
+        return matches
+
+    def extract(self, text: str) -> Dict[str, Optional[str]]:
+        """Igual que match_fields pero devuelve solo los valores (None si el campo no se encontró)."""
+        values: Dict[str, Optional[str]] = dict.fromkeys(self.fields)
+        for rule, match in self._scan(text):
+            for group, field in enumerate(rule.fields, start=1):
+                if values[field] is None:
+                    value = match.group(group)
+                    values[field] = value.strip() if rule.strip else value
+        return values
+
+    def _scan(self, text: str) -> Iterator[Tuple[FieldRule, "re.Match[str]"]]:
+        for rule, compiled in self._compiled:
+            match = compiled.search(text)
+            if match is not None:
+                yield rule, match
+
+
+FIELD_ENGINE = FieldExtractionEngine(FIELD_RULES)
@@ -1,29 +1,62 @@
-from ollama import chat, generate, ChatResponse
 from app.models.comprobante import Comprobante
+from app.services.afip_qr_decoder import AfipQRDecoder
 from app.services.comprobante_data_extractor import ComprobanteDataExtractor
 from app.services.text_extractor import TextExtractor
 from app.services.qr_extractor import QRExtractor
+from app.services.result_cache import ResultCache
+from app.services.ollama_service import DisconnectCheck, OllamaService
+from app.services.ollama_gap_filler import GAP_FILLER, GapFillRequest
+from app.services.field_extraction import FIELD_ENGINE
+from app.utils.pdf_copies import CopyGroup, group_copies
+from app.utils.pdf_render import InvalidPdfError, PageRenderCache, parse_page_ranges, resolve_pages
+from app.utils.upload_source import Content, UploadSource, content_head, open_content, sniff_content_type
+from app.core.config import get_settings
+from app.core.executor import ExtractionExecutor, get_page_executor, process_content_in_worker
+from app.core.metrics import (
+    OLLAMA_REQUESTS_TOTAL, PDF_COPY_PAGES_SKIPPED_TOTAL, RESULT_CACHE_TOTAL, absorb_worker_metrics, span,
+)
 from app.utils.logging import logger
 from fastapi import UploadFile, HTTPException
+import asyncio
+import contextvars
+import functools
+import mimetypes
 import time
-from typing import Dict, Any, Optional
+import zipfile
+from typing import AsyncIterator, Awaitable, Callable, Dict, Any, List, Optional, Tuple
+
+# Incrementar cuando un cambio en el pipeline altere los resultados: invalida la cache de resultados
+PIPELINE_VERSION = "8"
 
 class FileProcessor:
-    def __init__(self):
-        self.text_extractor = TextExtractor()
-        self.qr_extractor = QRExtractor()
-        self.comprobante_data_extractor = ComprobanteDataExtractor()
-        # Configuración por defecto para Ollama
-        self.ollama_config = {
-            "model": "llama3.2:1b",
-            "options": {
-                "num_predict": 600,     # Número máximo de tokens a generar
-                "temperature": 0.5,     # Controla la aleatoriedad de las respuestas
-                "top_p": 0.3           # Controla la diversidad del muestreo
-            }
-        }
+    def __init__(
+        self,
+        text_extractor: Optional[TextExtractor] = None,
+        qr_extractor: Optional[QRExtractor] = None,
+        comprobante_data_extractor: Optional[ComprobanteDataExtractor] = None,
+        ollama_service: Optional[OllamaService] = None,
+        executor: Optional[ExtractionExecutor] = None,
+        result_cache: Optional[ResultCache] = None,
+    ):
+        # Los componentes se inyectan desde el registro del proceso; si faltan se construyen aquí
+        self.text_extractor = text_extractor or TextExtractor()
+        self.qr_extractor = qr_extractor or QRExtractor()
+        self.comprobante_data_extractor = comprobante_data_extractor or ComprobanteDataExtractor()
+        self.ollama_service = ollama_service
+        self.executor = executor
+        self.result_cache = result_cache
 
-    async def process_file(self, file: UploadFile, extract_qr: bool = True, ollama_response: bool = False) -> dict:
+    async def process_file(
+        self,
+        file: UploadFile,
+        extract_qr: bool = True,
+        ollama_response: bool = False,
+        pages: Optional[str] = None,
+        early_exit: bool = True,
+        is_disconnected: Optional[DisconnectCheck] = None,
+        engine: Optional[str] = None,
+        include_text: bool = True,
+    ) -> dict:
         """
         Procesa un archivo y extrae la información del comprobante.
         
@@ -31,109 +64,604 @@ class FileProcessor:
             file: Archivo a procesar
             extract_qr: Si se debe extraer información del código QR
             ollama_response: Si se debe consultar a Ollama para información adicional
+            pages: Páginas del PDF a procesar ("1", "1-3,5", "all"); por defecto PDF_PAGES
+            early_exit: Si se deja de leer páginas una vez encontrados los datos requeridos
+            is_disconnected: Request.is_disconnected, para cancelar la consulta a Ollama si el cliente se va
+            engine: Motor de la capa de texto de los PDFs (pdfium, pdfplumber, markitdown o auto)
+            include_text: Si se necesita el texto completo; con False las páginas escaneadas pueden leerse solo
+                en las franjas de una plantilla de diseño
         
         Returns:
             dict: Información procesada del comprobante
         """
+        start_time = time.time()
+        # El upload ya está en el archivo temporal de Starlette: se lee vía mmap en lugar de copiarlo a bytes
+        source = await UploadSource.from_upload(file, get_settings().MAX_UPLOAD_BYTES)
         try:
-            start_time = time.time()
-            content = await file.read()
-            file_text = ""
-            qr_content = None
-            diagnostic_messages = []
-
-            # Procesamiento de PDF o imagen
-            if file.content_type == 'application/pdf' or file.filename.endswith('.pdf'):
-                file_text, pdf_diagnostics = self.text_extractor.process_pdf(content)
-                if extract_qr:
-                    qr_content, qr_diagnostics = self.qr_extractor.extract_from_pdf(content)
-                    diagnostic_messages.extend(qr_diagnostics)
-                diagnostic_messages.extend(pdf_diagnostics)
-            
-            elif file.content_type.startswith('image/'):
-                if extract_qr:
-                    qr_content, qr_diagnostics = self.qr_extractor.extract_from_image(content)
-                    diagnostic_messages.extend(qr_diagnostics)
-                    
-                if not qr_content or not extract_qr:
-                    file_text, text_diagnostics = self.text_extractor.process_image(content)
-                    diagnostic_messages.extend(text_diagnostics)
-            else:
+            return await self.process_bytes(
+                source, file.filename, file.content_type, extract_qr, ollama_response, pages, early_exit,
+                start_time=start_time, is_disconnected=is_disconnected, engine=engine, include_text=include_text,
+            )
+        finally:
+            source.close()
+
+    async def process_bytes(
+        self,
+        content: Content,
+        filename: str,
+        content_type: str,
+        extract_qr: bool = True,
+        ollama_response: bool = False,
+        pages: Optional[str] = None,
+        early_exit: bool = True,
+        start_time: Optional[float] = None,
+        is_disconnected: Optional[DisconnectCheck] = None,
+        engine: Optional[str] = None,
+        on_extracted: Optional[Callable[[dict], Awaitable[None]]] = None,
+        include_text: bool = True,
+    ) -> dict:
+        """
+        Igual que process_file pero sobre el contenido ya leído (lo usan el endpoint batch, los ZIP y los jobs).
+        Con ollama_response, on_extracted recibe el resultado de la extracción antes de consultar a Ollama.
+        """
+        try:
+            start_time = start_time or time.time()
+            # El tipo se decide por los magic bytes, no por el content_type ni la extensión que envía el cliente
+            content_type = sniff_content_type(content_head(content))
+            file_kind = self._detect_kind(content_type)
+            if file_kind is None:
                 raise HTTPException(status_code=400, detail="Unsupported file type")
+            pages = pages or get_settings().PDF_PAGES
+            try:
+                parse_page_ranges(pages)
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=str(e))
+            if engine is not None:
+                try:
+                    self.text_extractor.text_layer.ensure_available(engine)
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=str(e))
+
+            cache_key = None
+            if self.result_cache is not None:
+                with span("cache_lookup"):
+                    cache_key = ResultCache.make_key(
+                        content, PIPELINE_VERSION, extract_qr=extract_qr, ollama_response=ollama_response,
+                        pages=pages, early_exit=early_exit, engine=engine, include_text=include_text,
+                    )
+                    cached = self.result_cache.get(cache_key)
+                RESULT_CACHE_TOTAL.inc(result="miss" if cached is None else "hit")
+                if cached is not None:
+                    # El nombre puede cambiar entre reenvíos del mismo archivo
+                    for comprobante in [cached["comprobante"], *cached.get("comprobantes", [])]:
+                        comprobante["filename"] = filename
+                    cached["processing_time"] = round(time.time() - start_time, 2)
+                    cached["cache"] = "hit"
+                    return cached
 
-            # Extraer datos del comprobante
-            comprobante = self.comprobante_data_extractor.extract_comprobante_data(file_text)
-
-            # Actualizar campos generales del comprobante
-            comprobante.filename = file.filename
-            comprobante.size = len(content)
-            comprobante.content_type = file.content_type
-            comprobante.qr_content = qr_content.strip() if qr_content else None
-            comprobante.diagnostic_messages = diagnostic_messages
-
-            # Consultar a Ollama si es requerido
-            if ollama_response and file_text:
-                ollama_result = self._query_ollama(file_text)
-                if "error" not in ollama_result:
-                    comprobante.otros_datos_no_formateados["ollama_response"] = ollama_result
-
-            # Agregar tiempo total de procesamiento
-            total_time = round(time.time() - start_time, 2)
-            
-            return {
-                "status": "success",
-                "message": "File processed successfully",
-                "processing_time": total_time,
-                "comprobante": comprobante.dict()
-            }
-            
+            # El trabajo CPU-bound corre en el pool de extracción para no bloquear el event loop
+            args = (content, filename, content_type, extract_qr, pages, early_exit, engine, include_text)
+            with span("extraction"):
+                if self.executor is None:
+                    result = self.process_content(*args)
+                elif self.executor.kind == "process":
+                    # El mmap no se puede enviar a otro proceso: ahí sí se materializa el contenido
+                    if isinstance(content, UploadSource):
+                        args = (content.to_bytes(), *args[1:])
+                    result, spans, worker_metrics = await self.executor.run(process_content_in_worker, *args)
+                    absorb_worker_metrics(spans, worker_metrics)
+                else:
+                    result = await self.executor.run(self.process_content, *args)
+
+            # Ollama corre en el event loop con su propio límite de concurrencia, no ocupa un worker del pool
+            if ollama_response:
+                if on_extracted is not None:
+                    await on_extracted(result)
+                ollama_ok = await self._enrich_with_ollama(result, is_disconnected)
+                result["processing_time"] = round(time.time() - start_time, 2)
+            else:
+                ollama_ok = True
+
+            # Una respuesta de Ollama fallida no se cachea para poder reintentarla
+            if cache_key is not None and ollama_ok:
+                self.result_cache.set(cache_key, result)
+            result["cache"] = "miss"
+            return result
+
+        except HTTPException:
+            raise
+        except InvalidPdfError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         except Exception as e:
             logger.error(f"Error processing file: {str(e)}")
             raise HTTPException(status_code=500, detail=str(e))
 
-    def _query_ollama(self, text: str) -> Dict[str, Any]:
+    async def process_batch(
+        self,
+        files: List[Tuple[str, str, Content]],
+        extract_qr: bool = True,
+        ollama_response: bool = False,
+        pages: Optional[str] = None,
+        early_exit: bool = True,
+        engine: Optional[str] = None,
+        include_text: bool = True,
+    ) -> AsyncIterator[dict]:
+        """
+        Procesa varios archivos (filename, content_type, contenido) en paralelo sobre el pool de extracción
+        y entrega cada resultado apenas termina, sin esperar al más lento. Los parámetros son los de
+        process_bytes, para que cada archivo dé el mismo resultado que en /upload/.
+        """
+        # No superar la capacidad del pool: el resto del lote espera aquí en lugar de recibir 503
+        limit = self.executor.max_workers + self.executor.max_queue if self.executor else 1
+        semaphore = asyncio.Semaphore(max(limit // 2, 1))
+
+        async def run_one(index: int, filename: str, content_type: str, content: Content) -> dict:
+            async with semaphore:
+                try:
+                    result = await self.process_bytes(
+                        content, filename, content_type, extract_qr, ollama_response, pages, early_exit,
+                        engine=engine, include_text=include_text,
+                    )
+                except HTTPException as e:
+                    result = {"status": "error", "status_code": e.status_code, "message": e.detail}
+            return {"index": index, "filename": filename, **result}
+
+        tasks = [asyncio.create_task(run_one(i, *item)) for i, item in enumerate(files)]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                yield await finished
+        finally:
+            # Si el cliente se desconecta se cancelan los pendientes
+            for task in tasks:
+                task.cancel()
+
+    @classmethod
+    def expand_archives(
+        cls,
+        files: List[Tuple[str, str, Content]],
+        max_members: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+    ) -> List[Tuple[str, str, Content]]:
+        """
+        Reemplaza cada ZIP del lote por los archivos que contiene. La cantidad de archivos y el tamaño
+        descomprimido de todo el lote se controlan antes de descomprimir cada miembro, para que un ZIP chico
+        no pueda agotar la memoria del worker. Es CPU-bound: llamarla fuera del event loop.
+        """
+        settings = get_settings()
+        max_members = settings.ZIP_MAX_MEMBERS if max_members is None else max_members
+        max_bytes = settings.ZIP_MAX_UNCOMPRESSED_BYTES if max_bytes is None else max_bytes
+        items: List[Tuple[str, str, Content]] = []
+        total = 0
+        for filename, content_type, content in files:
+            if cls._is_zip(filename, content_type):
+                total = cls._expand_zip(filename, content, items, total, max_members, max_bytes)
+            else:
+                cls._check_batch_limits(len(items) + 1, total, max_members, max_bytes)
+                items.append((filename, content_type, content))
+        return items
+
+    @staticmethod
+    def _check_batch_limits(members: int, total: int, max_members: int, max_bytes: int) -> None:
+        if members > max_members:
+            raise HTTPException(status_code=400, detail=f"Batch exceeds the maximum of {max_members} files")
+        if total > max_bytes:
+            raise HTTPException(
+                status_code=413, detail=f"Batch exceeds the maximum uncompressed size of {max_bytes} bytes"
+            )
+
+    @staticmethod
+    def _is_zip(filename: str, content_type: Optional[str]) -> bool:
+        return content_type in ("application/zip", "application/x-zip-compressed") or filename.lower().endswith(".zip")
+
+    @classmethod
+    def _expand_zip(
+        cls,
+        filename: str,
+        content: Content,
+        items: List[Tuple[str, str, Content]],
+        total: int,
+        max_members: int,
+        max_bytes: int,
+    ) -> int:
+        """Agrega a items los archivos del ZIP y devuelve el tamaño descomprimido acumulado del lote."""
+        try:
+            with zipfile.ZipFile(open_content(content)) as archive:
+                for info in archive.infolist():
+                    if info.is_dir():
+                        continue
+                    # zipfile no descomprime más allá del file_size declarado, así que alcanza con controlarlo
+                    total += info.file_size
+                    cls._check_batch_limits(len(items) + 1, total, max_members, max_bytes)
+                    items.append((
+                        f"{filename}/{info.filename}",
+                        mimetypes.guess_type(info.filename)[0] or "application/octet-stream",
+                        archive.read(info),
+                    ))
+                return total
+        except zipfile.BadZipFile as e:
+            raise HTTPException(status_code=400, detail=f"Invalid ZIP archive {filename}: {str(e)}")
+
+    @staticmethod
+    def _detect_kind(content_type: Optional[str]) -> Optional[str]:
+        content_type = content_type or ""
+        if content_type == 'application/pdf':
+            return "pdf"
+        if content_type.startswith('image/'):
+            return "image"
+        return None
+
+    def process_content(
+        self,
+        content: Content,
+        filename: str,
+        content_type: str,
+        extract_qr: bool = True,
+        pages: Optional[str] = None,
+        early_exit: bool = True,
+        engine: Optional[str] = None,
+        include_text: bool = True,
+    ) -> dict:
+        """
+        Versión sincrónica de process_file sobre el contenido ya leído, sin la consulta a Ollama.
+        Se ejecuta en el pool de extracción.
+        """
+        start_time = time.time()
+        diagnostic_messages = []
+
+        # Procesamiento de PDF o imagen. En cada página el QR se lee primero: si trae el payload completo de
+        # AFIP, el OCR (la etapa más cara) se omite y solo se aprovecha la capa de texto si existe.
+        if self._detect_kind(content_type) == "pdf":
+            # Un único render por página compartido entre OCR y QR
+            renderer = PageRenderCache(content)
+            try:
+                page_indexes = resolve_pages(parse_page_ranges(pages or get_settings().PDF_PAGES), renderer.page_count)
+                diagnostic_messages.append(f"Páginas a procesar: {', '.join(str(index + 1) for index in page_indexes)}")
+                # Las copias ORIGINAL/DUPLICADO/TRIPLICADO se detectan antes del QR y el OCR: se procesa una por grupo
+                copy_groups = self._group_copies(renderer, page_indexes, diagnostic_messages)
+                page_results = self._process_pdf_pages(
+                    content, renderer, [group.page for group in copy_groups], extract_qr, early_exit,
+                    diagnostic_messages, engine, include_text,
+                )
+                copies_by_page = {group.page: group for group in copy_groups}
+                for page in page_results:
+                    page["copies"] = len(copies_by_page[page["page"]].pages)
+            finally:
+                renderer.close()
+        else:
+            page_results = [self._process_image_content(content, extract_qr)]
+
+        # Un PDF puede traer varios comprobantes: se arma uno por cada factura detectada
+        groups = self._split_invoices(page_results)
+        if len(groups) > 1:
+            diagnostic_messages.append(f"Se detectaron {len(groups)} comprobantes distintos en el documento")
+
+        comprobantes = [
+            self._build_comprobante(group, filename, content_type, len(content), diagnostic_messages)
+            for group in groups
+        ]
+
+        # Agregar tiempo total de procesamiento
+        total_time = round(time.time() - start_time, 2)
+
+        result = {
+            "status": "success",
+            "message": "File processed successfully",
+            "processing_time": total_time,
+            "comprobante": comprobantes[0].model_dump()
+        }
+        if len(comprobantes) > 1:
+            result["comprobantes"] = [comprobante.model_dump() for comprobante in comprobantes]
+        return result
+
+    def _process_image_content(self, content: Content, extract_qr: bool) -> Dict[str, Any]:
+        page = {"page": 0, "text": "", "qr_content": None, "qr_payload": None, "diagnostics": []}
+        if extract_qr:
+            page["qr_content"], qr_diagnostics = self.qr_extractor.extract_from_image(content)
+            page["diagnostics"].extend(qr_diagnostics)
+            page["qr_payload"] = self._decode_afip_qr(page["qr_content"], page["diagnostics"])
+
+        if page["qr_payload"] is None:
+            page["text"], text_diagnostics = self.text_extractor.process_image(content)
+            page["diagnostics"].extend(text_diagnostics)
+        return page
+
+    @staticmethod
+    def _group_copies(
+        renderer: PageRenderCache, page_indexes: List[int], diagnostic_messages: List[str]
+    ) -> List[CopyGroup]:
+        if len(page_indexes) <= 1 or not get_settings().PDF_DEDUPE_COPIES:
+            return [CopyGroup(index, [index], []) for index in page_indexes]
+        with span("page_fingerprint"):
+            groups = group_copies(renderer, page_indexes)
+        for group in groups:
+            if len(group.pages) > 1:
+                copies = ", ".join(str(index + 1) for index in group.pages[1:])
+                labels = f" ({', '.join(group.labels)})" if group.labels else ""
+                diagnostic_messages.append(
+                    f"Página(s) {copies} iguales a la página {group.page + 1}{labels}; se procesa una sola vez"
+                )
+                PDF_COPY_PAGES_SKIPPED_TOTAL.inc(len(group.pages) - 1)
+        return groups
+
+    def _process_pdf_page(
+        self,
+        content: Content,
+        renderer: PageRenderCache,
+        page_index: int,
+        extract_qr: bool,
+        engine: Optional[str] = None,
+        include_text: bool = True,
+    ) -> Dict[str, Any]:
+        page = {"page": page_index, "text": "", "qr_content": None, "qr_payload": None, "diagnostics": []}
+        if extract_qr:
+            page["qr_content"], qr_diagnostics = self.qr_extractor.extract_from_pdf(content, renderer, page_index)
+            page["diagnostics"].extend(qr_diagnostics)
+            page["qr_payload"] = self._decode_afip_qr(page["qr_content"], page["diagnostics"])
+
+        page["text"], pdf_diagnostics = self.text_extractor.process_pdf(
+            content, renderer, allow_ocr=page["qr_payload"] is None, page_index=page_index, engine=engine,
+            use_templates=not include_text,
+        )
+        page["diagnostics"].extend(pdf_diagnostics)
+        return page
+
+    def _skim_pdf_page(
+        self,
+        content: Content,
+        renderer: PageRenderCache,
+        page_index: int,
+        extract_qr: bool,
+        engine: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Lectura barata de una página posterior al early exit, sin OCR: la capa de texto y, si no tiene, el QR.
+        Alcanza para reconocer si la página es de otra factura.
+        """
+        page = {
+            "page": page_index, "text": "", "qr_content": None, "qr_payload": None, "diagnostics": [], "skimmed": True,
+        }
+        page["text"], pdf_diagnostics = self.text_extractor.process_pdf(
+            content, renderer, allow_ocr=False, page_index=page_index, engine=engine
+        )
+        page["diagnostics"].extend(pdf_diagnostics)
+        if extract_qr and not page["text"]:
+            page["qr_content"], qr_diagnostics = self.qr_extractor.extract_from_pdf(content, renderer, page_index)
+            page["diagnostics"].extend(qr_diagnostics)
+            page["qr_payload"] = self._decode_afip_qr(page["qr_content"], page["diagnostics"])
+        return page
+
+    def _process_pdf_pages(
+        self,
+        content: bytes,
+        renderer: PageRenderCache,
+        page_indexes: List[int],
+        extract_qr: bool,
+        early_exit: bool,
+        diagnostic_messages: List[str],
+        engine: Optional[str] = None,
+        include_text: bool = True,
+    ) -> List[Dict[str, Any]]:
+        """
+        Procesa las páginas en tandas paralelas del tamaño del pool de páginas.
+
+        El early exit termina solo la factura actual: cuando ya tiene los campos requeridos (y el QR, si se
+        pidió), las páginas siguientes se hojean sin OCR (_skim_pdf_page). Si aparece una segunda factura, el
+        early exit se desactiva y desde esa página todo se procesa completo, para devolver un comprobante por
+        factura.
+        """
+        process_page = functools.partial(self._process_pdf_page, include_text=include_text)
+        if len(page_indexes) <= 1:
+            return [process_page(content, renderer, index, extract_qr, engine) for index in page_indexes]
+
+        page_executor = get_page_executor()
+        wave_size = max(get_settings().PDF_PAGE_WORKERS, 1)
+
+        def run_wave(process, wave: List[int]) -> List[Dict[str, Any]]:
+            # Cada página corre en su propia copia del contexto para conservar la traza del request
+            futures = [
+                page_executor.submit(
+                    contextvars.copy_context().run, process, content, renderer, index, extract_qr, engine
+                )
+                for index in wave
+            ]
+            return [future.result() for future in futures]
+
+        results: List[Dict[str, Any]] = []
+        invoice_keys = set()
+        skimming = False
+        for offset in range(0, len(page_indexes), wave_size):
+            wave = page_indexes[offset:offset + wave_size]
+            results.extend(run_wave(self._skim_pdf_page if skimming else process_page, wave))
+            if not early_exit:
+                continue
+            invoice_keys.update(key for key in map(self._invoice_key, results[-len(wave):]) if key is not None)
+            if len(invoice_keys) > 1:
+                early_exit = False
+                if skimming:
+                    redo = self._skimmed_from_second_invoice(results)
+                    pages = run_wave(process_page, [results[position]["page"] for position in redo])
+                    for position, page in zip(redo, pages):
+                        results[position] = page
+                    skimming = False
+                diagnostic_messages.append(
+                    f"Más de un comprobante hasta la página {wave[-1] + 1}; se procesan todas las páginas"
+                )
+                continue
+            remaining = len(page_indexes) - offset - len(wave)
+            if not skimming and remaining and self._has_required_data(self._split_invoices(results)[-1], extract_qr):
+                skimming = True
+                diagnostic_messages.append(
+                    f"Datos requeridos completos en la página {wave[-1] + 1}; las {remaining} página(s) siguientes "
+                    f"se leen sin OCR, solo para detectar otros comprobantes"
+                )
+        return results
+
+    @classmethod
+    def _skimmed_from_second_invoice(cls, page_results: List[Dict[str, Any]]) -> List[int]:
+        """Posiciones de las páginas hojeadas desde la primera página de otra factura: se procesan completas."""
+        keys = [cls._invoice_key(page) for page in page_results]
+        first_key = next(key for key in keys if key is not None)
+        start = next(position for position, key in enumerate(keys) if key not in (None, first_key))
+        return [position for position in range(start, len(page_results)) if page_results[position].get("skimmed")]
+
+    def _has_required_data(self, page_results: List[Dict[str, Any]], extract_qr: bool) -> bool:
+        qr_found = any(page["qr_content"] for page in page_results)
+        if extract_qr and not qr_found:
+            return False
+        if any(page["qr_payload"] for page in page_results):
+            return True
+        text = "\n".join(page["text"] for page in page_results if page["text"])
+        return self.comprobante_data_extractor.extract_comprobante_data(text).es_valido()
+
+    @staticmethod
+    def _invoice_key(page: Dict[str, Any]) -> Optional[Tuple[Optional[str], str, str]]:
+        """Identifica la factura de una página: las copias ORIGINAL/DUPLICADO/TRIPLICADO comparten la clave."""
+        if page["qr_payload"]:
+            fields = AfipQRDecoder.to_fields(page["qr_payload"])
+        else:
+            fields = FIELD_ENGINE.extract(page["text"]) if page["text"] else {}
+        if not fields.get("punto_venta") or not fields.get("numero_comprobante"):
+            return None
+        return fields.get("cuit_emisor"), fields["punto_venta"], fields["numero_comprobante"]
+
+    @classmethod
+    def _split_invoices(cls, page_results: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Agrupa páginas consecutivas de la misma factura; las páginas sin datos se suman al grupo actual."""
+        groups: List[List[Dict[str, Any]]] = []
+        current_key = None
+        for page in page_results:
+            key = cls._invoice_key(page)
+            if groups and (key is None or current_key is None or key == current_key):
+                groups[-1].append(page)
+                current_key = current_key or key
+            else:
+                groups.append([page])
+                current_key = key
+        return groups or [[]]
+
+    def _build_comprobante(
+        self,
+        group: List[Dict[str, Any]],
+        filename: str,
+        content_type: str,
+        size: int,
+        diagnostic_messages: List[str],
+    ) -> Comprobante:
+        file_text = "\n".join(page["text"] for page in group if page["text"])
+        qr_content = next((page["qr_content"] for page in group if page["qr_content"]), None)
+        qr_payload = next((page["qr_payload"] for page in group if page["qr_payload"]), None)
+
+        # Extraer datos del comprobante
+        comprobante = self.comprobante_data_extractor.extract_comprobante_data(file_text)
+        if qr_payload is not None:
+            AfipQRDecoder.apply_to(comprobante, qr_payload)
+            comprobante.qr_afip_completo = True
+            # Sin OCR puede seguir faltando la razón social: en ese caso el comprobante no es válido y Ollama
+            # (modo gaps) puede completarla
+            comprobante.es_comprobante_valido = comprobante.es_valido()
+        # Las copias que se omitieron por huella no están en el texto: se cuentan por página
+        copies = max((page.get("copies", 1) for page in group), default=1)
+        if copies > 1:
+            comprobante.cantidad_copias = max(comprobante.cantidad_copias or 0, copies)
+
+        # Actualizar campos generales del comprobante
+        comprobante.filename = filename
+        comprobante.size = size
+        comprobante.content_type = content_type
+        comprobante.qr_content = qr_content.strip() if qr_content else None
+        comprobante.diagnostic_messages = [
+            message for page in group for message in page["diagnostics"]
+        ] + diagnostic_messages
+
+        return comprobante
+
+    @staticmethod
+    def _decode_afip_qr(qr_content: Optional[str], diagnostic_messages: list) -> Optional[Dict[str, Any]]:
+        """Devuelve el payload del QR de AFIP solo si está completo."""
+        payload = AfipQRDecoder.decode(qr_content)
+        if payload is None:
+            return None
+        if not AfipQRDecoder.is_complete(payload):
+            diagnostic_messages.append("QR de AFIP incompleto, se extrae el texto del comprobante")
+            return None
+        diagnostic_messages.append("QR de AFIP decodificado, se omite el OCR")
+        return payload
+
+    async def _enrich_with_ollama(self, result: Dict[str, Any], is_disconnected: Optional[DisconnectCheck]) -> bool:
+        """
+        Consulta a Ollama por cada comprobante del resultado. En modo "gaps" (OLLAMA_MODE) solo se piden los
+        campos requeridos que faltan y la consulta se omite si el comprobante ya es válido; en modo "full" se
+        envía el texto completo. Devuelve False si alguna consulta falló.
+        """
+        comprobantes = result.get("comprobantes") or [result["comprobante"]]
+        full = get_settings().OLLAMA_MODE == "full"
+        if full:
+            responses = await asyncio.gather(*(
+                self._query_ollama(comprobante["text_content"], is_disconnected)
+                if comprobante["text_content"] else asyncio.sleep(0)
+                for comprobante in comprobantes
+            ))
+            requests = [None] * len(comprobantes)
+        else:
+            requests = [GAP_FILLER.build_request(comprobante) for comprobante in comprobantes]
+            responses = await asyncio.gather(*(
+                self._query_ollama_gaps(request, is_disconnected) if request else asyncio.sleep(0)
+                for request in requests
+            ))
+
+        ok = True
+        for comprobante, request, ollama_result in zip(comprobantes, requests, responses):
+            if ollama_result is None:
+                OLLAMA_REQUESTS_TOTAL.inc(result="skipped")
+                if comprobante["es_comprobante_valido"] and not full:
+                    comprobante["diagnostic_messages"].append("Comprobante válido, se omite la consulta a Ollama")
+                else:
+                    comprobante["diagnostic_messages"].append("El comprobante no tiene texto para consultar a Ollama")
+                continue
+            if "error" in ollama_result:
+                ok = False
+                comprobante["diagnostic_messages"].append(f"Error consultando a Ollama: {ollama_result['error']}")
+                continue
+            if request is not None:
+                ollama_result["campos"] = GAP_FILLER.apply(comprobante, ollama_result["content"], request.campos)
+                comprobante["diagnostic_messages"].append(
+                    f"Ollama completó {len(ollama_result['campos'])} de {len(request.campos)} campos faltantes"
+                )
+            comprobante["otros_datos_no_formateados"]["ollama_response"] = ollama_result
+        if "comprobantes" in result:
+            result["comprobante"] = result["comprobantes"][0]
+        return ok
+
+    async def _query_ollama_gaps(
+        self, request: GapFillRequest, is_disconnected: Optional[DisconnectCheck] = None
+    ) -> Dict[str, Any]:
+        """Pide a Ollama solo los campos faltantes, con el schema y el fragmento de texto del GapFillRequest."""
+        if self.ollama_service is None:
+            return {"error": "Ollama no está configurado"}
+        return await self.ollama_service.generate_json(
+            request.prompt, schema=request.schema, options=request.options, is_disconnected=is_disconnected
+        )
+
+    async def _query_ollama(self, text: str, is_disconnected: Optional[DisconnectCheck] = None) -> Dict[str, Any]:
         """
         Realiza una consulta a Ollama para extraer información adicional.
         
         Args:
             text: Texto del comprobante
+            is_disconnected: Si se indica, la generación se cancela cuando el cliente se desconecta
         
         Returns:
-            Dict con la respuesta de Ollama y metadatos
+            Dict con la respuesta de Ollama (JSON ya parseado) y metadatos
         """
-        start_time = time.time()
-        
-        try:
-           # Crear un prompt directo para generate
-            prompt = f"""
-            Analiza el siguiente texto de comprobante y extrae TODOS los datos.
-            
-            Responde en formato JSON.
-            
-            Texto del comprobante:
-            {text}
-            """
-            
-            response = generate(
-                model=self.ollama_config["model"],
-                prompt=prompt,
-                options=self.ollama_config["options"]
-            )
+        if self.ollama_service is None:
+            return {"error": "Ollama no está configurado"}
 
-            #logger.error(f"response ollama.generate: {str(response)}")
-            
-            processing_time = time.time() - start_time
-            
-            return {
-                'content': response['response'],
-                'model': self.ollama_config["model"],
-                'time': round(processing_time, 2)
-            }
-            
-        except Exception as e:
-            logger.error(f"Error querying Ollama: {str(e)}")
-            return {
-                'error': str(e),
-                'model': self.ollama_config["model"],
-                'time': round(time.time() - start_time, 2)
-            }
\ No newline at end of file
+        prompt = f"""
+        Analiza el siguiente texto de comprobante y extrae TODOS los datos.
+        
+        Responde en formato JSON.
+        
+        Texto del comprobante:
+        {text}
+        """
+        return await self.ollama_service.generate_json(prompt, is_disconnected=is_disconnected)
@@ -0,0 +1,377 @@
+# app/services/job_manager.py
+import asyncio
+import copy
+import ipaddress
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Sequence
+from urllib.parse import urlsplit
+
+import httpx
+from fastapi import HTTPException
+
+from app.api.responses import project_result
+from app.core.config import get_settings
+from app.utils.logging import logger
+from app.utils.upload_source import Content, UploadSource
+
+# Estados posibles de un job
+JOB_QUEUED = "queued"
+JOB_PROCESSING = "processing"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def validate_callback_url(url: str, allowed_hosts: Sequence[str] = ()) -> None:
+    """
+    El callback se envía desde el servidor: solo http/https y, si hay lista de hosts permitidos, solo esos.
+    Sin lista se rechazan localhost y las IPs que no son públicas (red interna, loopback, metadata de la nube).
+    """
+    parts = urlsplit(url)
+    host = (parts.hostname or "").lower()
+    if parts.scheme not in ("http", "https") or not host:
+        raise HTTPException(status_code=400, detail="callback_url must be an absolute http or https URL")
+    if allowed_hosts:
+        if host not in allowed_hosts:
+            raise HTTPException(status_code=400, detail=f"callback_url host {host} is not allowed")
+        return
+    if host == "localhost" or host.endswith((".localhost", ".internal")):
+        raise HTTPException(status_code=400, detail=f"callback_url host {host} is not allowed")
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return
+    if not address.is_global:
+        raise HTTPException(status_code=400, detail=f"callback_url host {host} is not allowed")
+
+
+class MemoryJobStore:
+    """Persistencia en memoria: los jobs se pierden al reiniciar el proceso."""
+
+    def __init__(self):
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def heartbeat(self, owner: str) -> None:
+        pass
+
+    def fail_stale(self, older_than: float) -> None:
+        # Los jobs en memoria mueren con su proceso: nunca quedan huérfanos
+        pass
+
+    def create(self, job: Dict[str, Any]) -> None:
+        with self._lock:
+            self._jobs[job["id"]] = dict(job)
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def purge(self, older_than: float) -> None:
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job["status"] in (JOB_DONE, JOB_FAILED) and job["updated_at"] < older_than
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+
+
+class SqliteJobStore:
+    """
+    Persistencia en SQLite: el estado y los resultados sobreviven a reinicios y se comparten entre workers.
+    Cada job pendiente guarda qué proceso lo tiene (owner) y cuándo confirmó por última vez que sigue vivo.
+    Las llamadas son bloqueantes: JobManager las hace fuera del event loop.
+    """
+
+    COLUMNS = (
+        "id", "status", "filename", "callback_url", "created_at", "updated_at", "result", "error",
+        "owner", "heartbeat_at", "partial",
+    )
+
+    def __init__(self, db_path: str):
+        self._db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, filename TEXT, callback_url TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL, result TEXT, error TEXT, "
+            "owner TEXT, heartbeat_at REAL, partial INTEGER NOT NULL DEFAULT 0)"
+        )
+        # Bases creadas antes de que existieran estas columnas
+        existing = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        for column, kind in (("owner", "TEXT"), ("heartbeat_at", "REAL"), ("partial", "INTEGER NOT NULL DEFAULT 0")):
+            if column not in existing:
+                self._db.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+
+    def heartbeat(self, owner: str) -> None:
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE owner = ? AND status IN (?, ?)",
+                (time.time(), owner, JOB_QUEUED, JOB_PROCESSING),
+            )
+
+    def fail_stale(self, older_than: float) -> None:
+        # El contenido de los archivos vive solo en la cola en memoria del proceso dueño: si ese proceso ya no
+        # renueva el heartbeat (se reinició o murió), sus jobs pendientes no pueden retomarse. Los de los otros
+        # workers que comparten la base siguen vivos y no se tocan.
+        with self._lock:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+                "WHERE status IN (?, ?) AND COALESCE(heartbeat_at, updated_at) < ?",
+                (JOB_FAILED, "Job interrupted by a server restart", time.time(), JOB_QUEUED, JOB_PROCESSING,
+                 older_than),
+            )
+
+    def create(self, job: Dict[str, Any]) -> None:
+        row = self._to_row(job)
+        with self._lock:
+            self._db.execute(
+                f"INSERT INTO jobs ({', '.join(row)}) VALUES ({', '.join('?' for _ in row)})",
+                tuple(row.values()),
+            )
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        row = self._to_row(fields)
+        if not row:
+            return
+        with self._lock:
+            self._db.execute(
+                f"UPDATE jobs SET {', '.join(f'{column} = ?' for column in row)} WHERE id = ?",
+                (*row.values(), job_id),
+            )
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        job["partial"] = bool(job["partial"])
+        return job
+
+    def purge(self, older_than: float) -> None:
+        with self._lock:
+            self._db.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (JOB_DONE, JOB_FAILED, older_than)
+            )
+
+    def _to_row(self, fields: Dict[str, Any]) -> Dict[str, Any]:
+        row = {column: fields[column] for column in self.COLUMNS if column in fields}
+        if row.get("result") is not None:
+            row["result"] = json.dumps(row["result"])
+        return row
+
+
+class JobManager:
+    """
+    Jobs asincrónicos: POST /jobs encola el archivo y responde de inmediato, GET /jobs/{id} consulta el estado
+    y, si se indicó callback_url, se notifica el resultado al terminar.
+    """
+
+    # Cada cuánto un proceso renueva el heartbeat de sus jobs pendientes; pasados STALE_HEARTBEATS sin
+    # renovarlo, otro proceso los da por perdidos
+    HEARTBEAT_SECONDS = 10.0
+    STALE_HEARTBEATS = 3
+
+    def __init__(
+        self,
+        store,
+        workers: int = 2,
+        max_queue: int = 1000,
+        ttl_seconds: int = 86400,
+        callback_allowed_hosts: Sequence[str] = (),
+    ):
+        self.store = store
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self.callback_allowed_hosts = tuple(callback_allowed_hosts)
+        # Identifica a este proceso (y a este arranque) como dueño de los jobs que encola
+        self.owner = uuid.uuid4().hex
+        self._queue: "asyncio.Queue" = asyncio.Queue(maxsize=max_queue)
+        self._tasks: List[asyncio.Task] = []
+        self._http: Optional[httpx.AsyncClient] = None
+
+    @classmethod
+    def from_settings(cls) -> "JobManager":
+        settings = get_settings()
+        store = SqliteJobStore(settings.JOBS_DB_PATH) if settings.JOBS_DB_PATH else MemoryJobStore()
+        allowed_hosts = [host.strip().lower() for host in settings.JOBS_CALLBACK_ALLOWED_HOSTS.split(",")]
+        return cls(
+            store,
+            workers=settings.JOBS_WORKERS,
+            max_queue=settings.JOBS_MAX_QUEUE,
+            ttl_seconds=settings.JOBS_TTL_SECONDS,
+            callback_allowed_hosts=[host for host in allowed_hosts if host],
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        self._http = httpx.AsyncClient(timeout=10)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        self._tasks.append(asyncio.create_task(self._heartbeat()))
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        if self._http is not None:
+            await self._http.aclose()
+
+    async def submit(
+        self,
+        processor,
+        content: Content,
+        filename: str,
+        content_type: str,
+        callback_url: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        include_text: bool = True,
+        **options: Any,
+    ) -> Dict[str, Any]:
+        """
+        Encola el archivo. options son los parámetros de FileProcessor.process_bytes (extract_qr, pages,
+        early_exit, engine, ...), como en /upload/; fields e include_text se aplican al resultado guardado.
+        """
+        if callback_url:
+            validate_callback_url(callback_url, self.callback_allowed_hosts)
+        if self._queue.full():
+            raise HTTPException(status_code=503, detail="Job queue is full, retry later", headers={"Retry-After": "5"})
+        now = time.time()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": JOB_QUEUED,
+            "filename": filename,
+            "callback_url": callback_url,
+            "created_at": now,
+            "updated_at": now,
+            "result": None,
+            "error": None,
+            "owner": self.owner,
+            "heartbeat_at": now,
+            "partial": False,
+        }
+        await asyncio.to_thread(self.store.purge, now - self.ttl_seconds)
+        # El job se guarda antes de encolarlo para que el worker no lo actualice antes de que exista
+        await asyncio.to_thread(self.store.create, job)
+        try:
+            self._queue.put_nowait(
+                (job["id"], processor, content, filename, content_type, fields, include_text, options)
+            )
+        except asyncio.QueueFull:
+            await asyncio.to_thread(
+                self.store.update, job["id"], status=JOB_FAILED, error="Job queue is full", updated_at=time.time()
+            )
+            raise HTTPException(status_code=503, detail="Job queue is full, retry later", headers={"Retry-After": "5"})
+        return job
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        job = await asyncio.to_thread(self.store.get, job_id)
+        if job is not None:
+            job.pop("owner", None)
+            job.pop("heartbeat_at", None)
+        return job
+
+    async def _update(self, job_id: str, **fields: Any) -> None:
+        await asyncio.to_thread(self.store.update, job_id, updated_at=time.time(), **fields)
+
+    async def _heartbeat(self) -> None:
+        # Renueva los jobs propios y da por interrumpidos los de procesos que dejaron de renovarlos
+        # (el primer ciclo corre al iniciar y limpia lo pendiente de un arranque anterior)
+        while True:
+            try:
+                await asyncio.to_thread(self.store.heartbeat, self.owner)
+                stale_before = time.time() - self.HEARTBEAT_SECONDS * self.STALE_HEARTBEATS
+                await asyncio.to_thread(self.store.fail_stale, stale_before)
+            except sqlite3.Error as e:
+                logger.error(f"Error renewing job heartbeats: {str(e)}")
+            await asyncio.sleep(self.HEARTBEAT_SECONDS)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id, processor, content, filename, content_type, fields, include_text, options = await self._queue.get()
+            try:
+                await self._run(job_id, processor, content, filename, content_type, fields, include_text, options)
+            finally:
+                if isinstance(content, UploadSource):
+                    content.close()
+                self._queue.task_done()
+
+    async def _run(
+        self,
+        job_id: str,
+        processor,
+        content: Content,
+        filename: str,
+        content_type: str,
+        fields: Optional[List[str]],
+        include_text: bool,
+        options: Dict[str, Any],
+    ) -> None:
+        await self._update(job_id, status=JOB_PROCESSING)
+
+        async def on_extracted(partial: Dict[str, Any]) -> None:
+            # Con Ollama el resultado de la extracción se publica mientras se espera al modelo; se copia porque
+            # la consulta completa ese mismo dict
+            partial = project_result(copy.deepcopy(partial), fields, include_text)
+            await self._update(job_id, result=partial, partial=True)
+
+        try:
+            # Los 503 del pool de extracción se reintentan: el job ya fue aceptado
+            while True:
+                try:
+                    result = await processor.process_bytes(
+                        content, filename, content_type, on_extracted=on_extracted, include_text=include_text,
+                        **options
+                    )
+                    break
+                except HTTPException as e:
+                    if e.status_code != 503:
+                        raise
+                    await asyncio.sleep(1)
+            result = project_result(result, fields, include_text)
+            await self._update(job_id, status=JOB_DONE, result=result, partial=False)
+        except HTTPException as e:
+            await self._update(job_id, status=JOB_FAILED, error=str(e.detail))
+        except Exception as e:
+            logger.error(f"Error processing job {job_id}: {str(e)}")
+            await self._update(job_id, status=JOB_FAILED, error=str(e))
+
+        await self._notify(job_id)
+
+    async def _notify(self, job_id: str) -> None:
+        job = await self.get(job_id)
+        if not job or not job.get("callback_url"):
+            return
+        try:
+            response = await self._http.post(job["callback_url"], json=job)
+            response.raise_for_status()
+        except httpx.HTTPError as e:
+            logger.error(f"Error notifying callback for job {job_id}: {str(e)}")
+
+
+_job_manager: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    if _job_manager is None:
+        _job_manager = JobManager.from_settings()
+    return _job_manager
@@ -0,0 +1,180 @@
+# app/services/layout_templates.py
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import get_settings
+from app.services.field_extraction import FIELD_ENGINE
+from app.utils.ocr_backend import OcrLine
+
+# Tamaño (ancho x alto) de la miniatura que resume el diseño de la página
+SIGNATURE_SIZE = (24, 32)
+# Margen vertical de cada franja, en alturas de línea: absorbe corrimientos del escaneo
+BAND_PADDING_LINES = 0.6
+# Separación en píxeles entre franjas al armar la imagen recortada para el OCR
+MONTAGE_GAP_PX = 16
+
+# Franja horizontal de la página (fracciones del alto): desde, hasta
+Band = Tuple[float, float]
+
+
+def layout_signature(gray: np.ndarray) -> np.ndarray:
+    """
+    Resumen del diseño de la página: la tinta de una miniatura de SIGNATURE_SIZE, centrada y normalizada,
+    para comparar páginas con el producto punto (similitud coseno). Dos comprobantes del mismo diseño
+    difieren solo en los valores impresos y quedan muy cerca; un diseño distinto mueve los bloques de texto.
+    """
+    import cv2
+
+    thumbnail = cv2.resize(gray, SIGNATURE_SIZE, interpolation=cv2.INTER_AREA).astype(np.float32)
+    ink = 255.0 - thumbnail.ravel()
+    ink -= ink.mean()
+    norm = float(np.linalg.norm(ink))
+    return ink / norm if norm else ink
+
+
+def layout_digest(signature: np.ndarray) -> str:
+    return hashlib.sha1(np.round(signature * 20).astype(np.int8).tobytes()).hexdigest()[:16]
+
+
+def learn_bands(lines: Sequence[OcrLine], height: int) -> Tuple[List[Band], List[str]]:
+    """
+    A partir de las líneas reconocidas (con su caja) de una página ya validada, devuelve las franjas que
+    contienen los campos encontrados por las reglas y los nombres de esos campos. Cada franja es la línea
+    completa a lo ancho de la página, con margen, así que un valor más largo en otro comprobante no queda
+    cortado.
+    """
+    lines = sorted((line for line in lines if line.text.strip()), key=lambda line: line.top)
+    offsets = []
+    position = 0
+    for line in lines:
+        offsets.append((position, position + len(line.text)))
+        position += len(line.text) + 1
+    matches = FIELD_ENGINE.match_fields("\n".join(line.text for line in lines))
+
+    bands: List[Band] = []
+    for match in matches.values():
+        for line, (start, end) in zip(lines, offsets):
+            if start <= match.end and match.start <= end:
+                padding = (line.bottom - line.top) * BAND_PADDING_LINES
+                bands.append((max(line.top - padding, 0) / height, min(line.bottom + padding, height) / height))
+    return merge_bands(bands), sorted(matches)
+
+
+def merge_bands(bands: List[Band]) -> List[Band]:
+    merged: List[Band] = []
+    for top, bottom in sorted(bands):
+        if merged and top <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], bottom))
+        else:
+            merged.append((top, bottom))
+    return merged
+
+
+def crop_bands(gray: np.ndarray, bands: Sequence[Band]) -> np.ndarray:
+    """Apila las franjas de la página en una sola imagen, para leerlas con una única llamada al OCR."""
+    height, width = gray.shape[:2]
+    gap = np.full((MONTAGE_GAP_PX, width), 255, dtype=gray.dtype)
+    parts = []
+    for top, bottom in bands:
+        parts.append(gray[int(top * height):int(np.ceil(bottom * height))])
+        parts.append(gap)
+    return np.vstack(parts[:-1]) if parts else gray
+
+
+@dataclass
+class LayoutTemplate:
+    cuit_emisor: str
+    layout: str
+    signature: np.ndarray
+    bands: List[Band]
+    fields: List[str]
+    created_at: float = field(default_factory=time.time)
+    hits: int = 0
+    # Fallas de validación seguidas; un acierto las vuelve a cero
+    failures: int = 0
+
+    @property
+    def key(self) -> Tuple[str, str]:
+        return self.cuit_emisor, self.layout
+
+
+class LayoutTemplateStore:
+    """
+    Plantillas de diseño por emisor: para cada (CUIT del emisor, huella del diseño) guarda las franjas de la
+    página donde aparecieron los campos en una extracción válida. Una página nueva se compara por su huella
+    con las plantillas conocidas (no hace falta leerla antes) y, si alguna es lo bastante parecida, el OCR se
+    hace solo sobre esas franjas. LRU en memoria, por proceso.
+    """
+
+    # Fallas seguidas (páginas en las que ni el OCR completo dio un comprobante válido) antes de descartarla
+    MAX_FAILURES = 3
+
+    def __init__(self, max_templates: int = 1000, min_similarity: float = 0.9):
+        self.max_templates = max_templates
+        self.min_similarity = min_similarity
+        self._templates: "OrderedDict[Tuple[str, str], LayoutTemplate]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls) -> "LayoutTemplateStore":
+        settings = get_settings()
+        return cls(
+            max_templates=settings.LAYOUT_TEMPLATE_MAX,
+            min_similarity=settings.LAYOUT_TEMPLATE_MIN_SIMILARITY,
+        )
+
+    def find(self, signature: np.ndarray, cuit_emisor: Optional[str] = None) -> Optional[LayoutTemplate]:
+        """La plantilla más parecida a la página, solo si supera min_similarity (y es del emisor, si se indica)."""
+        with self._lock:
+            candidates = [
+                template for template in self._templates.values()
+                if cuit_emisor is None or template.cuit_emisor == cuit_emisor
+            ]
+            if not candidates:
+                return None
+            similarities = np.stack([template.signature for template in candidates]) @ signature
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.min_similarity:
+                return None
+            template = candidates[best]
+            self._templates.move_to_end(template.key)
+            return template
+
+    def learn(self, cuit_emisor: str, signature: np.ndarray, bands: List[Band], fields: List[str]) -> LayoutTemplate:
+        """Guarda la plantilla; reemplaza la del mismo emisor con un diseño equivalente, si existía."""
+        template = LayoutTemplate(cuit_emisor, layout_digest(signature), signature, bands, fields)
+        previous = self.find(signature, cuit_emisor)
+        with self._lock:
+            if previous is not None:
+                self._templates.pop(previous.key, None)
+            self._templates[template.key] = template
+            while len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        return template
+
+    def record_hit(self, template: LayoutTemplate) -> None:
+        with self._lock:
+            template.hits += 1
+            template.failures = 0
+
+    def record_failure(self, template: LayoutTemplate) -> bool:
+        """Cuenta una falla sin culpable claro; devuelve True si la plantilla se descartó."""
+        with self._lock:
+            template.failures += 1
+            if template.failures < self.MAX_FAILURES:
+                return False
+            self._templates.pop(template.key, None)
+            return True
+
+    def invalidate(self, template: LayoutTemplate) -> None:
+        with self._lock:
+            self._templates.pop(template.key, None)
+
+    def __len__(self) -> int:
+        return len(self._templates)
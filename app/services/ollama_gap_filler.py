@@ -0,0 +1,121 @@
+# app/services/ollama_gap_filler.py
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+from app.models.comprobante import Comprobante
+from app.services.field_extraction import FIELD_RULES, FieldRule
+
+# Descripción que recibe el modelo para cada campo que tiene que completar
+FIELD_DESCRIPTIONS: Dict[str, str] = {
+    "punto_venta": "punto de venta, solo dígitos",
+    "numero_comprobante": "número del comprobante (Comp. Nro), solo dígitos",
+    "fecha_emision": "fecha de emisión en formato dd/mm/aaaa",
+    "importe_total": "importe total, tal como figura en el comprobante",
+    "cuit_emisor": "CUIT del emisor, 11 dígitos sin guiones",
+    "razon_social_emisor": "razón social del emisor",
+}
+
+
+class GapFillRequest(NamedTuple):
+    campos: List[str]
+    prompt: str
+    schema: Dict[str, Any]
+    options: Dict[str, Any]
+
+
+class OllamaGapFiller:
+    """
+    Arma consultas a Ollama que piden solo los campos requeridos que el extractor por reglas no encontró,
+    con la porción del texto donde deberían estar, en lugar del texto completo y un pedido genérico.
+    """
+
+    # Caracteres alrededor de cada etiqueta que se envían al modelo
+    WINDOW_BEFORE = 80
+    WINDOW_AFTER = 240
+    # Sin etiquetas reconocibles (OCR ruidoso) se envía el encabezado, donde AFIP ubica los datos requeridos
+    FALLBACK_CHARS = 1500
+    MAX_CHARS = 3000
+    TOKENS_PER_FIELD = 40
+
+    def __init__(self, rules: List[FieldRule] = FIELD_RULES):
+        self._labels: Dict[str, List[str]] = {}
+        for rule in rules:
+            for field in rule.fields:
+                # Sin los dos puntos: el OCR suele separarlos o perderlos
+                self._labels.setdefault(field, []).append(rule.label.lower().rstrip(": "))
+
+    @staticmethod
+    def missing_fields(comprobante: Dict[str, Any]) -> List[str]:
+        """Igual que Comprobante.campos_faltantes, sobre el comprobante ya serializado."""
+        return [campo for campo in Comprobante.CAMPOS_REQUERIDOS if not comprobante.get(campo)]
+
+    def build_request(self, comprobante: Dict[str, Any]) -> Optional[GapFillRequest]:
+        """Devuelve None si el comprobante ya es válido o no tiene texto: no hace falta consultar al modelo."""
+        campos = self.missing_fields(comprobante)
+        text = comprobante.get("text_content") or ""
+        if comprobante.get("es_comprobante_valido") or not campos or not text.strip():
+            return None
+
+        schema = {
+            "type": "object",
+            "properties": {
+                campo: {"type": ["string", "null"], "description": FIELD_DESCRIPTIONS.get(campo, campo)}
+                for campo in campos
+            },
+            "required": campos,
+        }
+        listado = "\n".join(f"- {campo}: {FIELD_DESCRIPTIONS.get(campo, campo)}" for campo in campos)
+        prompt = (
+            "Del siguiente fragmento de un comprobante fiscal argentino extrae únicamente estos campos "
+            "(null si no aparecen):\n"
+            f"{listado}\n\n"
+            "Responde en formato JSON.\n\n"
+            f"Fragmento:\n{self.text_window(text, campos)}"
+        )
+        options = {
+            # La respuesta es un objeto chico: el límite de tokens se ajusta a la cantidad de campos
+            "num_predict": self.TOKENS_PER_FIELD * len(campos) + 16,
+            "temperature": 0,
+        }
+        return GapFillRequest(campos, prompt, schema, options)
+
+    def text_window(self, text: str, campos: List[str]) -> str:
+        """Une las porciones del texto alrededor de las etiquetas de los campos faltantes."""
+        lowered = text.lower()
+        spans: List[Tuple[int, int]] = []
+        for campo in campos:
+            for label in self._labels.get(campo, []):
+                position = lowered.find(label)
+                if position != -1:
+                    spans.append((max(position - self.WINDOW_BEFORE, 0), position + len(label) + self.WINDOW_AFTER))
+        if not spans:
+            return text[:self.FALLBACK_CHARS]
+
+        # Se fusionan las ventanas superpuestas para no repetir texto
+        spans.sort()
+        merged = [spans[0]]
+        for start, end in spans[1:]:
+            if start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return "\n...\n".join(text[start:end] for start, end in merged)[:self.MAX_CHARS]
+
+    @classmethod
+    def apply(cls, comprobante: Dict[str, Any], content: Any, campos: List[str]) -> List[str]:
+        """Completa los campos pedidos con la respuesta del modelo y devuelve los que se llenaron."""
+        if not isinstance(content, dict):
+            return []
+        completados = []
+        for campo in campos:
+            value = content.get(campo)
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                value = str(value)
+            if isinstance(value, str) and value.strip() and value.strip().lower() != "null":
+                comprobante[campo] = value.strip()
+                completados.append(campo)
+        if completados and not comprobante.get("es_comprobante_valido"):
+            comprobante["es_comprobante_valido"] = not cls.missing_fields(comprobante)
+        return completados
+
+
+GAP_FILLER = OllamaGapFiller()
@@ -0,0 +1,143 @@
+# app/services/ollama_service.py
+import asyncio
+import json
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import httpx
+
+from app.core.config import get_settings
+from app.core.metrics import OLLAMA_REQUESTS_TOTAL, record_stage
+from app.utils.logging import logger
+
+# Función que indica si el cliente HTTP ya cortó la conexión (Request.is_disconnected)
+DisconnectCheck = Callable[[], Awaitable[bool]]
+
+
+class OllamaService:
+    """
+    Cliente asíncrono de Ollama compartido por toda la app: mantiene las conexiones abiertas entre requests,
+    limita la cantidad de generaciones simultáneas y corta las que exceden el timeout o cuyo cliente se fue.
+    """
+
+    # Cada cuánto se verifica si el cliente sigue conectado mientras el modelo genera
+    DISCONNECT_POLL_SECONDS = 0.5
+
+    def __init__(
+        self,
+        host: str,
+        model: str = "llama3.2:1b",
+        max_concurrency: int = 2,
+        timeout_seconds: float = 60.0,
+        options: Optional[Dict[str, Any]] = None,
+    ):
+        self.host = host
+        self.model = model
+        self.max_concurrency = max(max_concurrency, 1)
+        self.timeout_seconds = timeout_seconds
+        self.options = options or {
+            "num_predict": 600,     # Número máximo de tokens a generar
+            "temperature": 0.5,     # Controla la aleatoriedad de las respuestas
+            "top_p": 0.3            # Controla la diversidad del muestreo
+        }
+        from ollama import AsyncClient
+
+        # Una conexión keep-alive por generación en curso; el resto espera en el semáforo, no en el servidor
+        self._client = AsyncClient(
+            host=host,
+            timeout=httpx.Timeout(timeout_seconds, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency, max_keepalive_connections=self.max_concurrency
+            ),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._waiting = 0
+
+    @classmethod
+    def from_settings(cls) -> "OllamaService":
+        settings = get_settings()
+        return cls(
+            host=settings.OLLAMA_HOST,
+            model=settings.OLLAMA_MODEL,
+            max_concurrency=settings.OLLAMA_MAX_CONCURRENCY,
+            timeout_seconds=settings.OLLAMA_TIMEOUT_SECONDS,
+        )
+
+    @property
+    def queue_depth(self) -> int:
+        """Generaciones esperando un lugar libre en el semáforo."""
+        return self._waiting
+
+    async def generate_json(
+        self,
+        prompt: str,
+        schema: Optional[Dict[str, Any]] = None,
+        options: Optional[Dict[str, Any]] = None,
+        is_disconnected: Optional[DisconnectCheck] = None,
+    ) -> Dict[str, Any]:
+        """
+        Genera una respuesta con format JSON (o con el JSON schema indicado) y la devuelve ya parseada.
+
+        Returns:
+            Dict con "content" (el JSON de la respuesta), "model" y "time", o con "error" si falló
+        """
+        start_time = time.time()
+        try:
+            task = asyncio.ensure_future(self._generate(prompt, schema, {**self.options, **(options or {})}))
+            response = await self._watch(task, is_disconnected)
+            content = json.loads(response["response"])
+            record_stage("ollama", time.time() - start_time)
+            OLLAMA_REQUESTS_TOTAL.inc(result="ok")
+            return {
+                "content": content,
+                "model": self.model,
+                "time": round(time.time() - start_time, 2),
+            }
+        except asyncio.TimeoutError:
+            message = f"Ollama no respondió en {self.timeout_seconds} s"
+        except json.JSONDecodeError as e:
+            message = f"Ollama devolvió un JSON inválido: {str(e)}"
+        except Exception as e:
+            message = str(e) or type(e).__name__
+        logger.error(f"Error querying Ollama: {message}")
+        record_stage("ollama", time.time() - start_time)
+        OLLAMA_REQUESTS_TOTAL.inc(result="error")
+        return {
+            "error": message,
+            "model": self.model,
+            "time": round(time.time() - start_time, 2),
+        }
+
+    async def _generate(self, prompt: str, schema: Optional[Dict[str, Any]], options: Dict[str, Any]):
+        self._waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._waiting -= 1
+        try:
+            # El timeout corre desde que se obtiene el lugar: la espera en la cola no cuenta contra la generación
+            return await asyncio.wait_for(
+                self._client.generate(model=self.model, prompt=prompt, format=schema or "json", options=options),
+                self.timeout_seconds,
+            )
+        finally:
+            self._semaphore.release()
+
+    async def _watch(self, task: asyncio.Future, is_disconnected: Optional[DisconnectCheck]):
+        """Espera la generación y la cancela si el cliente HTTP se desconecta antes de que termine."""
+        try:
+            if is_disconnected is None:
+                return await task
+            while True:
+                done, _ = await asyncio.wait({task}, timeout=self.DISCONNECT_POLL_SECONDS)
+                if done:
+                    return task.result()
+                if await is_disconnected():
+                    raise ConnectionAbortedError("El cliente se desconectó, se cancela la generación")
+        finally:
+            # Timeout, desconexión o cancelación del request: la generación no sigue ocupando el semáforo
+            if not task.done():
+                task.cancel()
+
+    async def close(self) -> None:
+        await self._client.close()
@@ -1,56 +1,192 @@
 # app/services/qr_extractor.py
-from qreader import QReader
 import numpy as np
 from PIL import Image
-import io
-from pdf2image import convert_from_bytes
-from typing import Tuple, List, Optional
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, Tuple, List, Optional
+from ..core.metrics import QR_DETECTION_TOTAL, record_stage
+from ..utils.pdf_render import PageRenderCache
+from ..utils.upload_source import Content, open_content
+
+try:
+    from pyzbar.pyzbar import ZBarSymbol, decode as pyzbar_decode
+except ImportError:  # pyzbar necesita la librería nativa zbar; sin ella se usa cv2.QRCodeDetector
+    pyzbar_decode = None
+
+if TYPE_CHECKING:
+    from qreader import QReader
 
 class QRExtractor:
-    def __init__(self):
-        self.qreader = QReader()
+    """
+    Decodifica QR en cascada, de lo más barato a lo más caro:
 
-    def extract_from_image(self, image_bytes: bytes) -> Tuple[str, List[str]]:
-        diagnostic_messages = []
+    1. "fast": pyzbar sobre la imagen en grises reducida.
+    2. "roi": el decodificador clásico sobre recortes a resolución completa de la zona donde AFIP imprime el QR.
+    3. "qreader": el detector neuronal de QReader sobre la imagen completa.
+
+    Sin libzbar el decodificador clásico es cv2.QRCodeDetector, que no lee el QR de AFIP reducido a
+    FAST_MAX_SIDE (0 aciertos en el corpus de benchmarks, ~100 ms por intento): en ese caso se omite "fast".
+    `python -m benchmarks.bench_qr_tiers` mide cada nivel con cada decodificador disponible.
+
+    Las estadísticas de acierto y tiempo por nivel son del proceso y se informan en diagnostic_messages.
+    """
+
+    DECODERS = ("pyzbar", "opencv")
+    TIERS = {"pyzbar": ("fast", "roi", "qreader"), "opencv": ("roi", "qreader")}
+    # Lado mayor de la imagen reducida para el primer nivel (~3 px por módulo en un QR de AFIP a 200 DPI)
+    FAST_MAX_SIDE = 1400
+    # Recortes (y0, y1, x0, x1) relativos al alto/ancho: el QR de AFIP suele ir abajo a la izquierda
+    ROI_BOXES = ((0.55, 1.0, 0.0, 0.5), (0.5, 1.0, 0.0, 1.0))
+
+    def __init__(self, qreader: Optional["QReader"] = None, decoder: str = "auto"):
+        if decoder == "auto":
+            decoder = "pyzbar" if pyzbar_decode is not None else "opencv"
+        if decoder not in self.DECODERS:
+            raise ValueError(f"Unsupported QR decoder: {decoder}")
+        if decoder == "pyzbar" and pyzbar_decode is None:
+            raise ValueError("pyzbar is not available (missing zbar shared library)")
+        self.decoder = decoder
+        self.tiers = self.TIERS[decoder]
+        if qreader is None:
+            from qreader import QReader
+
+            qreader = QReader()
+        self.qreader = qreader
+        # cv2 se importa al crear el extractor (con los modelos), no al importar la app
+        import cv2
+
+        self._opencv_detector = cv2.QRCodeDetector()
+        self._stats = {tier: {"attempts": 0, "hits": 0, "time": 0.0} for tier in self.tiers}
+        self._stats_lock = threading.Lock()
+
+    def extract_from_image(self, image_bytes: Content) -> Tuple[str, List[str]]:
         try:
-            image = Image.open(io.BytesIO(image_bytes))
+            image = Image.open(open_content(image_bytes))
             image_np = np.array(image)
-            decoded_texts = self.qreader.detect_and_decode(image=image_np)
-            
-            decoded_texts = [text for text in decoded_texts if text]
-            
-            if decoded_texts:
-                diagnostic_messages.append("Código(s) QR extraído(s) exitosamente con QReader")
-                return "\n".join(decoded_texts), diagnostic_messages
-            else:
-                diagnostic_messages.append("No se encontraron códigos QR en la imagen")
-                return "", diagnostic_messages
+        except Exception as e:
+            return "", [f"Error procesando imagen para extraer QR: {str(e)}"]
+        return self.extract_from_array(image_np)
+
+    def extract_from_array(self, image_np: np.ndarray) -> Tuple[str, List[str]]:
+        diagnostic_messages = []
+        try:
+            gray = self._to_gray(image_np)
+            for tier in self.tiers:
+                start_time = time.perf_counter()
+                decoded_texts = self.decode_tier(tier, image_np, gray)
+                elapsed = time.perf_counter() - start_time
+                record_stage(f"qr_{tier}", elapsed)
+                elapsed_ms = elapsed * 1000
+                diagnostic_messages.append(self._record(tier, bool(decoded_texts), elapsed_ms))
+
+                if decoded_texts:
+                    diagnostic_messages.append(f"Código(s) QR extraído(s) exitosamente (nivel {tier})")
+                    return "\n".join(decoded_texts), diagnostic_messages
+
+            diagnostic_messages.append("No se encontraron códigos QR en la imagen")
+            return "", diagnostic_messages
         except Exception as e:
             diagnostic_messages.append(f"Error procesando imagen para extraer QR: {str(e)}")
             return "", diagnostic_messages
-        
 
-    def extract_from_pdf(self, pdf_bytes: bytes) -> Tuple[Optional[str], List[str]]:
+    def decode_tier(self, tier: str, image_np: np.ndarray, gray: Optional[np.ndarray] = None) -> List[str]:
+        """Un solo nivel de la cascada, sin estadísticas (lo usa también el benchmark de niveles)."""
+        gray = self._to_gray(image_np) if gray is None else gray
+        if tier == "fast":
+            return self._decode_classic(self._downscale(gray))
+        if tier == "roi":
+            return self._decode_roi(gray)
+        if tier == "qreader":
+            return [text for text in self.qreader.detect_and_decode(image=image_np) if text]
+        raise ValueError(f"Unknown QR tier: {tier}")
+
+    def get_stats(self) -> Dict[str, Dict[str, float]]:
+        with self._stats_lock:
+            return {tier: dict(values) for tier, values in self._stats.items()}
+
+    def _record(self, tier: str, hit: bool, elapsed_ms: float) -> str:
+        with self._stats_lock:
+            stats = self._stats[tier]
+            stats["attempts"] += 1
+            stats["hits"] += int(hit)
+            stats["time"] += elapsed_ms
+            hit_rate = stats["hits"] / stats["attempts"] * 100
+            attempts = stats["attempts"]
+        QR_DETECTION_TOTAL.inc(tier=tier, result="found" if hit else "not_found")
+        result = "acierto" if hit else "sin resultado"
+        return f"QR nivel {tier}: {result} en {elapsed_ms:.1f} ms (tasa de acierto {hit_rate:.0f}% en {attempts} intentos)"
+
+    @staticmethod
+    def _to_gray(image_np: np.ndarray) -> np.ndarray:
+        import cv2
+
+        if image_np.ndim == 3:
+            channels = image_np.shape[2]
+            if channels == 4:
+                return cv2.cvtColor(image_np, cv2.COLOR_RGBA2GRAY)
+            if channels == 3:
+                return cv2.cvtColor(image_np, cv2.COLOR_RGB2GRAY)
+            return image_np[:, :, 0]
+        if image_np.dtype == bool:
+            # Imágenes binarias (modo "1" de PIL)
+            return image_np.astype(np.uint8) * 255
+        return image_np.astype(np.uint8, copy=False)
+
+    def _downscale(self, gray: np.ndarray) -> np.ndarray:
+        height, width = gray.shape[:2]
+        scale = self.FAST_MAX_SIDE / max(height, width)
+        if scale >= 1:
+            return gray
+        import cv2
+
+        return cv2.resize(gray, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    def _decode_roi(self, gray: np.ndarray) -> List[str]:
+        height, width = gray.shape[:2]
+        for y0, y1, x0, x1 in self.ROI_BOXES:
+            crop = gray[int(height * y0):int(height * y1), int(width * x0):int(width * x1)]
+            decoded_texts = self._decode_classic(crop)
+            if decoded_texts:
+                return decoded_texts
+        return []
+
+    def _decode_classic(self, gray: np.ndarray) -> List[str]:
+        if self.decoder == "pyzbar":
+            return [
+                symbol.data.decode("utf-8", errors="replace")
+                for symbol in pyzbar_decode(gray, symbols=[ZBarSymbol.QRCODE])
+                if symbol.data
+            ]
+        text, _, _ = self._opencv_detector.detectAndDecode(gray)
+        return [text] if text else []
+
+    def extract_from_pdf(
+        self,
+        pdf_bytes: Content,
+        renderer: Optional[PageRenderCache] = None,
+        page_index: int = 0,
+    ) -> Tuple[Optional[str], List[str]]:
         diagnostic_messages = []
+        owns_renderer = renderer is None
+        renderer = renderer or PageRenderCache(pdf_bytes)
+        page_number = page_index + 1
         try:
-            # Convertir solo la primera página del PDF a imagen
-            images = convert_from_bytes(pdf_bytes, first_page=1, last_page=1)
-            diagnostic_messages.append(f"Convertida la primera página a imagen para buscar códigos QR")
+            # Si el OCR ya renderizó la página se reutiliza el mismo bitmap
+            image_np = renderer.get_page_array(page_index)
+            diagnostic_messages.append(f"Convertida la página {page_number} a imagen para buscar códigos QR")
+            
+            qr_content, qr_messages = self.extract_from_array(image_np)
+            diagnostic_messages.extend(qr_messages)
             
-            for i, image in enumerate(images):
-                image_buffer = io.BytesIO()
-                image.save(image_buffer, format="PNG")
-                image_buffer.seek(0)
-                
-                qr_content, qr_messages = self.extract_from_image(image_buffer.read())
-                diagnostic_messages.extend(qr_messages)
-                
-                if qr_content and qr_content.strip():
-                    diagnostic_messages.append(f"Código QR encontrado en la primera página")
-                    return qr_content, diagnostic_messages
+            if qr_content and qr_content.strip():
+                diagnostic_messages.append(f"Código QR encontrado en la página {page_number}")
+                return qr_content, diagnostic_messages
             
-            diagnostic_messages.append("No se encontraron códigos QR en la primera página del PDF")
+            diagnostic_messages.append(f"No se encontraron códigos QR en la página {page_number} del PDF")
             return None, diagnostic_messages
         except Exception as e:
             diagnostic_messages.append(f"Error al procesar el PDF para buscar QR: {str(e)}")
             return None, diagnostic_messages
+        finally:
+            if owns_renderer:
+                renderer.close()
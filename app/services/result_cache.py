@@ -0,0 +1,119 @@
+# app/services/result_cache.py
+import copy
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+from app.core.config import get_settings
+from app.utils.logging import logger
+from app.utils.upload_source import Content, content_buffer
+
+
+class ResultCache:
+    """
+    Cache de resultados direccionado por contenido.
+
+    La clave es el hash del archivo más los flags del request y la versión del pipeline. Tiene un nivel en
+    memoria (LRU con TTL) y un nivel opcional en SQLite compartido entre los workers de uvicorn.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: int = 3600, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.db_path = db_path
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if db_path:
+            self._db = self._open_db(db_path)
+
+    @classmethod
+    def from_settings(cls) -> "ResultCache":
+        settings = get_settings()
+        return cls(
+            max_entries=settings.RESULT_CACHE_SIZE,
+            ttl_seconds=settings.RESULT_CACHE_TTL_SECONDS,
+            db_path=settings.RESULT_CACHE_DB_PATH,
+        )
+
+    @staticmethod
+    def make_key(content: Content, pipeline_version: str, **flags: Any) -> str:
+        digest = hashlib.sha256(content_buffer(content)).hexdigest()
+        flags_part = ",".join(f"{name}={flags[name]}" for name in sorted(flags))
+        return f"{pipeline_version}:{digest}:{flags_part}"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._entries.move_to_end(key)
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        value = self._db_get(key, now)
+        if value is not None:
+            # Promover al nivel en memoria con una copia propia: quien llama modifica el valor devuelto
+            self._memory_set(key, copy.deepcopy(value), now)
+        return value
+
+    def set(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        self._memory_set(key, copy.deepcopy(value), now)
+        self._db_set(key, value, now)
+
+    def _memory_set(self, key: str, value: Dict[str, Any], stored_at: float) -> None:
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (stored_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _open_db(self, db_path: str) -> Optional[sqlite3.Connection]:
+        try:
+            db = sqlite3.connect(db_path, timeout=5, check_same_thread=False, isolation_level=None)
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, stored_at REAL NOT NULL, value TEXT NOT NULL)"
+            )
+            return db
+        except sqlite3.Error as e:
+            logger.error(f"Error abriendo cache de resultados en disco: {str(e)}")
+            return None
+
+    def _db_get(self, key: str, now: float) -> Optional[Dict[str, Any]]:
+        if self._db is None:
+            return None
+        try:
+            with self._lock:
+                row = self._db.execute("SELECT stored_at, value FROM results WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                if now - row[0] > self.ttl_seconds:
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    return None
+            return json.loads(row[1])
+        except sqlite3.Error as e:
+            logger.error(f"Error leyendo cache de resultados en disco: {str(e)}")
+            return None
+
+    def _db_set(self, key: str, value: Dict[str, Any], now: float) -> None:
+        if self._db is None:
+            return
+        try:
+            with self._lock:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, stored_at, value) VALUES (?, ?, ?)",
+                    (key, now, json.dumps(value)),
+                )
+                self._db.execute("DELETE FROM results WHERE stored_at < ?", (now - self.ttl_seconds,))
+        except sqlite3.Error as e:
+            logger.error(f"Error escribiendo cache de resultados en disco: {str(e)}")
@@ -1,52 +1,102 @@
-import io
-from typing import Tuple, List
-import pdfplumber
-from pdf2image import convert_from_bytes
-from ..utils.image_processing import enhance_text_recognition
+import time
+from typing import Tuple, List, Optional
+import numpy as np
+from ..core.config import get_settings
+from ..core.metrics import LAYOUT_TEMPLATE_TOTAL, TEXT_SOURCE_TOTAL, span
+from ..utils.image_processing import OcrStep, prepare_photo, recognize_text, run_ocr_ladder, to_gray
+from ..utils.ocr_backend import get_ocr_backend
+from ..utils.pdf_render import PageRenderCache
+from ..utils.pdf_text import PdfTextLayer
+from ..utils.upload_source import Content, open_content
+from ..models.comprobante import Comprobante
+from .comprobante_data_extractor import ComprobanteDataExtractor
+from .layout_templates import LayoutTemplate, LayoutTemplateStore, crop_bands, layout_signature, learn_bands
 from PIL import Image
 
 class TextExtractor:
-    def process_pdf(self, pdf_bytes: bytes) -> Tuple[str, List[str]]:
+    # Una página cuyo diseño no se pudo aprender no se vuelve a intentar hasta pasado este tiempo
+    LEARN_RETRY_SECONDS = 3600
+
+    def __init__(
+        self, pdf_text_backend: Optional[str] = None, layout_templates: Optional[LayoutTemplateStore] = None
+    ):
+        settings = get_settings()
+        self.text_layer = PdfTextLayer(pdf_text_backend or settings.PDF_TEXT_BACKEND)
+        if layout_templates is None and settings.LAYOUT_TEMPLATES:
+            layout_templates = LayoutTemplateStore.from_settings()
+        self.layout_templates = layout_templates
+
+    def process_pdf(
+        self,
+        pdf_bytes: Content,
+        renderer: Optional[PageRenderCache] = None,
+        allow_ocr: bool = True,
+        page_index: int = 0,
+        engine: Optional[str] = None,
+        use_templates: bool = True,
+    ) -> Tuple[str, List[str]]:
+        """
+        Extrae el texto de una página del PDF (por defecto la primera), con OCR como respaldo. engine elige el
+        motor de la capa de texto (pdfium, pdfplumber, markitdown o auto); por defecto PDF_TEXT_BACKEND.
+        Con use_templates=False una página escaneada se lee completa aunque su diseño tenga plantilla.
+        """
         diagnostic_messages = []
         extracted_text = []
-        
+        owns_renderer = renderer is None
+        renderer = renderer or PageRenderCache(pdf_bytes)
+        page_number = page_index + 1
+
         try:
-            with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-                # Procesar solo la primera página
-                first_page = pdf.pages[0]
-                text = first_page.extract_text(x_tolerance=3, y_tolerance=3)
+            with span("pdf_text_layer"):
+                text, layer_diagnostics = self.text_layer.extract(pdf_bytes, renderer, page_index, engine)
+                diagnostic_messages.extend(layer_diagnostics)
                 if text and text.strip():
                     extracted_text.append(text)
             
             if extracted_text:
-                diagnostic_messages.append("Texto extraído exitosamente con pdfplumber (solo primera página)")
+                TEXT_SOURCE_TOTAL.inc(source="text_layer")
+                diagnostic_messages.append(f"Texto extraído exitosamente de la capa de texto (página {page_number})")
                 return "\n".join(extracted_text), diagnostic_messages
                 
+            if not allow_ocr:
+                TEXT_SOURCE_TOTAL.inc(source="qr_only")
+                diagnostic_messages.append(f"Página {page_number} sin capa de texto; OCR omitido")
+                return "", diagnostic_messages
+
             # Fall back to OCR si no se extrajo texto
-            images = convert_from_bytes(pdf_bytes, first_page=1, last_page=1)  # Solo la primera página
-            diagnostic_messages.append(f"Convertida la primera página a imagen para OCR")
-            
-            for i, image in enumerate(images):
-                text = enhance_text_recognition(image)
-                if text and text.strip():
-                    extracted_text.append(f"--- Página {i+1} ---\n{text}")
+            image_np = renderer.get_page_array(page_index)
+            diagnostic_messages.append(f"Convertida la página {page_number} a imagen para OCR")
+
+            target_dpi = get_settings().OCR_TARGET_DPI
+            high_res = (lambda: renderer.get_page_array(page_index, target_dpi)) if target_dpi > renderer.dpi else None
+            TEXT_SOURCE_TOTAL.inc(source="ocr")
+            text = self._ocr_scanned_page(image_np, high_res, page_number, diagnostic_messages, use_templates)
+            if text and text.strip():
+                extracted_text.append(f"--- Página {page_number} ---\n{text}")
                     
             if extracted_text:
-                diagnostic_messages.append("Texto extraído exitosamente con OCR (solo primera página)")
+                diagnostic_messages.append(f"Texto extraído exitosamente con OCR (página {page_number})")
             else:
-                diagnostic_messages.append("OCR no pudo extraer texto de la primera página")
+                diagnostic_messages.append(f"OCR no pudo extraer texto de la página {page_number}")
                 
             return "\n".join(extracted_text), diagnostic_messages
             
         except Exception as e:
             diagnostic_messages.append(f"Error en proceso de extracción: {str(e)}")
             return "", diagnostic_messages
+        finally:
+            if owns_renderer:
+                renderer.close()
 
-    def process_image(self, image_bytes: bytes) -> Tuple[str, List[str]]:
+    def process_image(self, image_bytes: Content) -> Tuple[str, List[str]]:
         diagnostic_messages = []
         try:
-            image = Image.open(io.BytesIO(image_bytes))
-            text = enhance_text_recognition(image)
+            with span("image_decode"):
+                image = prepare_photo(Image.open(open_content(image_bytes)))
+            TEXT_SOURCE_TOTAL.inc(source="ocr")
+            with span("ocr"):
+                text, ocr_diagnostics = run_ocr_ladder(self._ocr_steps(image), self._is_valid_text)
+            diagnostic_messages.extend(ocr_diagnostics)
             
             if text and text.strip():
                 diagnostic_messages.append("Texto extraído exitosamente de la imagen usando OCR")
@@ -57,3 +107,139 @@ class TextExtractor:
         except Exception as e:
             diagnostic_messages.append(f"Error procesando imagen usando OCR: {str(e)}")
             return "", diagnostic_messages
+
+    def _ocr_scanned_page(
+        self,
+        image_np: np.ndarray,
+        high_res,
+        page_number: int,
+        diagnostic_messages: List[str],
+        use_templates: bool = True,
+    ) -> str:
+        """
+        OCR de una página escaneada. Si su diseño coincide con una plantilla aprendida solo se leen las franjas
+        de la plantilla, y el texto devuelto queda parcial; si eso no da un comprobante válido del emisor de la
+        plantilla, o no hay plantilla, se usa la escalera de OCR sobre la página completa y con el resultado se
+        aprende o se descarta la plantilla. Con use_templates=False la página se lee completa, pero se sigue
+        aprendiendo.
+        """
+        templates = self.layout_templates
+        if templates is None:
+            with span("ocr"):
+                text, ocr_diagnostics = run_ocr_ladder(self._ocr_steps(image_np, high_res), self._is_valid_text)
+            diagnostic_messages.extend(ocr_diagnostics)
+            return text
+
+        with span("layout_template"):
+            gray = to_gray(image_np)
+            signature = layout_signature(gray)
+            template = templates.find(signature)
+        tried = None
+        if use_templates and template is not None and template.bands:
+            tried = template
+            text, comprobante = self._ocr_bands(gray, tried)
+            if comprobante is not None and comprobante.cuit_emisor and comprobante.cuit_emisor != tried.cuit_emisor:
+                # El diseño se parece más al de otro emisor: se prueba la plantilla propia del emisor de la página
+                own = templates.find(signature, comprobante.cuit_emisor)
+                if own is not None and own.bands:
+                    tried = own
+                    text, comprobante = self._ocr_bands(gray, tried)
+            if comprobante is not None and comprobante.es_valido() and comprobante.cuit_emisor == tried.cuit_emisor:
+                templates.record_hit(tried)
+                LAYOUT_TEMPLATE_TOTAL.inc(result="hit")
+                diagnostic_messages.append(
+                    f"Plantilla del emisor {tried.cuit_emisor} aplicada en la página {page_number}: OCR de "
+                    f"{len(tried.bands)} franjas. El texto de la página es parcial: los campos fuera de esas "
+                    f"franjas no se leen"
+                )
+                return text
+            LAYOUT_TEMPLATE_TOTAL.inc(result="fallback")
+            diagnostic_messages.append(
+                f"La plantilla del emisor {tried.cuit_emisor} no dio un comprobante válido de ese emisor en la "
+                f"página {page_number}; se lee la página completa"
+            )
+        elif template is None:
+            LAYOUT_TEMPLATE_TOTAL.inc(result="miss")
+
+        with span("ocr"):
+            text, ocr_diagnostics = run_ocr_ladder(self._ocr_steps(image_np, high_res), self._is_valid_text)
+        diagnostic_messages.extend(ocr_diagnostics)
+        self._update_template(tried, gray, signature, text, page_number, diagnostic_messages)
+        return text
+
+    def _ocr_bands(self, gray: np.ndarray, template: LayoutTemplate) -> Tuple[str, Optional[Comprobante]]:
+        """OCR de las franjas de la plantilla y el comprobante que resulta (None si no hubo texto)."""
+        montage = crop_bands(gray, template.bands)
+        with span("ocr"):
+            text, _ = run_ocr_ladder(self._ocr_steps(montage), self._is_valid_text)
+        if not text.strip():
+            return text, None
+        return text, ComprobanteDataExtractor.extract_comprobante_data(text)
+
+    def _update_template(
+        self,
+        tried: Optional[LayoutTemplate],
+        gray: np.ndarray,
+        signature: np.ndarray,
+        text: str,
+        page_number: int,
+        diagnostic_messages: List[str],
+    ) -> None:
+        """tried es la plantilla que se aplicó en la página sin éxito, si hubo una."""
+        templates = self.layout_templates
+        comprobante = ComprobanteDataExtractor.extract_comprobante_data(text) if text.strip() else None
+        if comprobante is None or not comprobante.es_valido():
+            # Ni la página completa dio un comprobante: puede ser el escaneo y no la plantilla
+            if tried is not None and templates.record_failure(tried):
+                LAYOUT_TEMPLATE_TOTAL.inc(result="invalidated")
+            return
+
+        own = templates.find(signature, comprobante.cuit_emisor)
+        if own is not None:
+            if not own.bands and time.time() - own.created_at < self.LEARN_RETRY_SECONDS:
+                return
+            if own.bands and own is not tried:
+                # La plantilla del emisor no se usó en esta página (include_text): sigue vigente
+                return
+            if own is tried:
+                # La plantilla falló con un comprobante de su propio emisor: el diseño cambió
+                templates.invalidate(own)
+                LAYOUT_TEMPLATE_TOTAL.inc(result="invalidated")
+                diagnostic_messages.append(f"Plantilla del emisor {own.cuit_emisor} descartada")
+
+        # Aprender cuesta una pasada de OCR con cajas por línea; se hace una vez por emisor y diseño
+        with span("layout_template_learn"):
+            lines = get_ocr_backend().image_to_lines(Image.fromarray(gray))
+            bands, fields = learn_bands(lines, gray.shape[0])
+        if not set(comprobante.CAMPOS_REQUERIDOS) <= set(fields):
+            # Se guarda sin franjas para no repetir el intento con cada página de este diseño
+            bands = []
+        templates.learn(comprobante.cuit_emisor, signature, bands, fields)
+        if bands:
+            LAYOUT_TEMPLATE_TOTAL.inc(result="learned")
+            diagnostic_messages.append(
+                f"Plantilla aprendida para el emisor {comprobante.cuit_emisor} ({len(bands)} franjas)"
+            )
+
+    @staticmethod
+    def _ocr_steps(image, high_res=None) -> List[OcrStep]:
+        """
+        Etapas de OCR de menor a mayor costo: grises sin preprocesar, preprocesamiento completo, mayor
+        resolución (solo PDFs) y por último segmentación alternativa (--psm 4, columnas de distinto tamaño).
+        """
+        if not get_settings().OCR_LADDER:
+            return [("mejorado", lambda: recognize_text(image, enhance=True))]
+
+        steps: List[OcrStep] = [
+            ("rápido", lambda: recognize_text(image, enhance=False)),
+            ("mejorado", lambda: recognize_text(image, enhance=True)),
+        ]
+        largest = high_res or (lambda: image)
+        if high_res is not None:
+            steps.append(("alta resolución", lambda: recognize_text(high_res(), enhance=True)))
+        steps.append(("psm 4", lambda: recognize_text(largest(), enhance=True, psm=4)))
+        return steps
+
+    @staticmethod
+    def _is_valid_text(text: str) -> bool:
+        return bool(text.strip()) and ComprobanteDataExtractor.extract_comprobante_data(text).es_valido()
@@ -1,27 +1,80 @@
 # app/utils/image_processing.py
-import cv2
+import time
 import numpy as np
-from PIL import Image
-import pytesseract
+from PIL import Image, ImageOps
+from typing import Callable, List, Sequence, Tuple, Union
 from ..core.config import get_settings
+from ..core.metrics import span
+from .ocr_backend import OCR_PSM, get_ocr_backend
 
-settings = get_settings()
-pytesseract.pytesseract.tesseract_cmd = settings.TESSERACT_CMD
+# Un A4 mide 11.69 pulgadas en su lado mayor
+A4_LONG_SIDE_INCHES = 11.69
 
-def enhance_text_recognition(image: Image.Image) -> str:
-    img = np.array(image)
+# Una etapa de OCR: (nombre, función que devuelve el texto reconocido)
+OcrStep = Tuple[str, Callable[[], str]]
+
+def to_gray(image: Union[Image.Image, np.ndarray]) -> np.ndarray:
+    # Acepta el bitmap ya renderizado (numpy) para evitar copias y re-codificaciones
+    img = np.asarray(image)
     if len(img.shape) == 3:
-        img = cv2.cvtColor(img, cv2.COLOR_RGB2GRAY)
-    
+        # cv2 es pesado: se importa con la primera imagen, no al importar la app
+        import cv2
+
+        img = cv2.cvtColor(img, cv2.COLOR_RGBA2GRAY if img.shape[2] == 4 else cv2.COLOR_RGB2GRAY)
+    return img
+
+def _enhance(img: np.ndarray) -> np.ndarray:
+    import cv2
+
     img = cv2.adaptiveThreshold(
         img, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C,
         cv2.THRESH_BINARY, 11, 2
     )
     img = cv2.medianBlur(img, 3)
-    img = cv2.equalizeHist(img)
-    
-    processed_image = Image.fromarray(img)
-    return pytesseract.image_to_string(
-        processed_image,
-        config=r'--oem 3 --psm 6 -l spa'
-    )
+    return cv2.equalizeHist(img)
+
+def recognize_text(image: Union[Image.Image, np.ndarray], enhance: bool = True, psm: int = OCR_PSM) -> str:
+    """OCR de una imagen: en grises solamente (pasada barata) o con el preprocesamiento completo."""
+    with span("ocr_preprocess"):
+        img = to_gray(image)
+        if enhance:
+            img = _enhance(img)
+    with span("tesseract"):
+        return get_ocr_backend().image_to_string(Image.fromarray(img), psm=psm)
+
+def enhance_text_recognition(image: Union[Image.Image, np.ndarray]) -> str:
+    return recognize_text(image, enhance=True)
+
+def prepare_photo(image: Image.Image) -> Image.Image:
+    """
+    Aplica la orientación EXIF y reduce fotos muy grandes a la resolución objetivo de OCR
+    (suponiendo una hoja A4), sin agrandar nunca la imagen.
+    """
+    image = ImageOps.exif_transpose(image)
+    if image.mode not in ("RGB", "L"):
+        # Paletas, CMYK o canal alfa: el OCR trabaja sobre RGB o grises
+        image = image.convert("RGB")
+    max_side = int(A4_LONG_SIDE_INCHES * get_settings().OCR_TARGET_DPI)
+    if max(image.size) > max_side:
+        image = image.copy()
+        image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return image
+
+def run_ocr_ladder(steps: Sequence[OcrStep], is_good: Callable[[str], bool]) -> Tuple[str, List[str]]:
+    """
+    Ejecuta las etapas de OCR en orden, de la más barata a la más cara, y se detiene en la primera cuyo
+    texto cumple is_good. Si ninguna lo cumple devuelve el texto más largo obtenido.
+    """
+    diagnostic_messages = []
+    best_text = ""
+    for name, step in steps:
+        start_time = time.perf_counter()
+        text = step() or ""
+        elapsed_ms = (time.perf_counter() - start_time) * 1000
+        if is_good(text):
+            diagnostic_messages.append(f"OCR etapa '{name}': comprobante válido en {elapsed_ms:.0f} ms")
+            return text, diagnostic_messages
+        diagnostic_messages.append(f"OCR etapa '{name}': comprobante incompleto en {elapsed_ms:.0f} ms")
+        if len(text.strip()) > len(best_text.strip()):
+            best_text = text
+    return best_text, diagnostic_messages
@@ -1,9 +1,146 @@
 # app/utils/logging.py
+import atexit
+import contextvars
+import copy
+import json
 import logging
+import os
+import queue
+import sys
+import time
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from ..core.config import get_settings
 
-logger = logging.getLogger(__name__)
\ No newline at end of file
+logger = logging.getLogger(__name__)
+
+_request_id: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Atributos propios de cualquier LogRecord; el resto son los extra= de cada llamada
+_RECORD_ATTRS = frozenset(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(request_id)s - %(message)s"
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+def set_request_id(request_id: Optional[str]) -> contextvars.Token:
+    return _request_id.set(request_id)
+
+
+def reset_request_id(token: contextvars.Token) -> None:
+    _request_id.reset(token)
+
+
+def get_request_id() -> Optional[str]:
+    return _request_id.get()
+
+
+class JsonFormatter(logging.Formatter):
+    """Un objeto JSON por línea: hora, nivel, logger, mensaje, request_id y los campos pasados con extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        created = time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created))
+        entry = {
+            "time": f"{created}.{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _ContextQueueHandler(QueueHandler):
+    """
+    Encola el registro en lugar de escribirlo: el thread que loguea (el event loop o un worker de extracción)
+    no espera la escritura en stderr. El request_id se toma acá porque el contexto no llega al listener.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Como QueueHandler.prepare, pero el traceback queda en exc_text en lugar de pegado al mensaje
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        request_id = _request_id.get()
+        if request_id is not None and getattr(record, "request_id", None) is None:
+            record.request_id = request_id
+        return record
+
+
+def parse_levels(spec: str) -> Dict[str, int]:
+    """Interpreta "pdfminer=WARNING,PIL=INFO" como nivel por logger."""
+    levels: Dict[str, int] = {}
+    for item in spec.split(","):
+        if not item.strip():
+            continue
+        name, _, level = item.partition("=")
+        value = logging.getLevelName(level.strip().upper())
+        if not name.strip() or not isinstance(value, int):
+            raise ValueError(f"Invalid log level entry: {item.strip()}")
+        levels[name.strip()] = value
+    return levels
+
+
+def setup_logging(
+    level: Optional[str] = None, log_format: Optional[str] = None, library_levels: Optional[str] = None
+) -> None:
+    """
+    Configura el logging del proceso una sola vez: el root escribe a una cola y un QueueListener en un thread
+    propio formatea y escribe en stderr. Los valores que no se indican salen de la configuración.
+    """
+    global _listener, _queue_handler
+    if _listener is not None:
+        return
+    settings = get_settings()
+    level = level or settings.LOG_LEVEL
+    log_format = log_format or settings.LOG_FORMAT
+    if log_format not in ("json", "text"):
+        raise ValueError(f"Unsupported log format: {log_format}")
+    levels = parse_levels(settings.LOG_LIBRARY_LEVELS if library_levels is None else library_levels)
+
+    stream_handler = logging.StreamHandler(sys.stderr)
+    if log_format == "json":
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter(TEXT_FORMAT, defaults={"request_id": "-"}))
+    _queue_handler = _ContextQueueHandler(queue.SimpleQueue())
+    root = logging.getLogger()
+    root.handlers = [_queue_handler]
+    root.setLevel(level.upper())
+    for name, library_level in levels.items():
+        logging.getLogger(name).setLevel(library_level)
+
+    _listener = QueueListener(_queue_handler.queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=_restart_listener)
+
+
+def _restart_listener() -> None:
+    # El thread del listener no sobrevive al fork (workers de PreforkServer, pool de procesos): cada hijo
+    # arranca el suyo con una cola nueva, por si el padre estaba escribiendo en la anterior al hacer fork
+    global _listener
+    if _listener is None or _queue_handler is None:
+        return
+    _queue_handler.queue = queue.SimpleQueue()
+    _listener = QueueListener(_queue_handler.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def stop_logging() -> None:
+    """Escribe lo que quede en la cola y detiene el listener (antes de os._exit, que no corre atexit)."""
+    if _listener is not None and _listener._thread is not None:
+        _listener.stop()
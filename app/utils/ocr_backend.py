@@ -0,0 +1,144 @@
+# app/utils/ocr_backend.py
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from PIL import Image
+
+from ..core.config import get_settings
+from .logging import logger
+
+try:
+    import tesserocr
+except ImportError:  # tesserocr es opcional: sin él se usa pytesseract
+    tesserocr = None
+
+# Misma configuración que se usaba con pytesseract: --oem 3 --psm 6 -l spa
+OCR_LANG = "spa"
+OCR_OEM = 3
+OCR_PSM = 6
+
+
+class OcrLine(NamedTuple):
+    """Una línea reconocida y su caja en píxeles de la imagen."""
+    text: str
+    left: int
+    top: int
+    right: int
+    bottom: int
+
+
+class PytesseractBackend:
+    """Ejecuta el binario de tesseract en un subproceso por llamada (recarga el traineddata cada vez)."""
+
+    name = "pytesseract"
+
+    def __init__(self, tesseract_cmd: Optional[str] = None):
+        import pytesseract
+
+        self._pytesseract = pytesseract
+        if tesseract_cmd:
+            pytesseract.pytesseract.tesseract_cmd = tesseract_cmd
+
+    def image_to_string(self, image: Image.Image, psm: int = OCR_PSM) -> str:
+        return self._pytesseract.image_to_string(image, config=f"--oem {OCR_OEM} --psm {psm} -l {OCR_LANG}")
+
+    def image_to_lines(self, image: Image.Image, psm: int = OCR_PSM) -> List[OcrLine]:
+        data = self._pytesseract.image_to_data(
+            image, config=f"--oem {OCR_OEM} --psm {psm} -l {OCR_LANG}", output_type=self._pytesseract.Output.DICT
+        )
+        # La salida es por palabra: se agrupan por (bloque, párrafo, línea)
+        lines: Dict[Tuple[int, int, int], List[int]] = {}
+        for index, word in enumerate(data["text"]):
+            if word.strip():
+                key = (data["block_num"][index], data["par_num"][index], data["line_num"][index])
+                lines.setdefault(key, []).append(index)
+        return [
+            OcrLine(
+                " ".join(data["text"][index] for index in indexes),
+                min(data["left"][index] for index in indexes),
+                min(data["top"][index] for index in indexes),
+                max(data["left"][index] + data["width"][index] for index in indexes),
+                max(data["top"][index] + data["height"][index] for index in indexes),
+            )
+            for indexes in lines.values()
+        ]
+
+
+class TesserocrBackend:
+    """
+    Usa la API C++ de Tesseract en el mismo proceso a través de tesserocr. Cada thread mantiene su propio
+    handle (la API no es thread-safe), inicializado una única vez con el idioma y el modo de segmentación.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self, tessdata_path: Optional[str] = None):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr is not installed")
+        self.tessdata_path = tessdata_path
+        self._local = threading.local()
+        # Validar la instalación ahora en lugar de fallar en el primer request
+        self._get_api()
+
+    def _get_api(self):
+        api = getattr(self._local, "api", None)
+        if api is None:
+            kwargs = {"lang": OCR_LANG, "psm": tesserocr.PSM.SINGLE_BLOCK, "oem": tesserocr.OEM.DEFAULT}
+            if self.tessdata_path:
+                kwargs["path"] = self.tessdata_path
+            api = tesserocr.PyTessBaseAPI(**kwargs)
+            self._local.api = api
+        return api
+
+    def image_to_string(self, image: Image.Image, psm: int = OCR_PSM) -> str:
+        api = self._get_api()
+        api.SetPageSegMode(psm)
+        api.SetImage(image)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_lines(self, image: Image.Image, psm: int = OCR_PSM) -> List[OcrLine]:
+        api = self._get_api()
+        api.SetPageSegMode(psm)
+        api.SetImage(image)
+        try:
+            api.Recognize()
+            level = tesserocr.RIL.TEXTLINE
+            lines = []
+            for item in tesserocr.iterate_level(api.GetIterator(), level):
+                text = item.GetUTF8Text(level)
+                box = item.BoundingBox(level)
+                if text and text.strip() and box:
+                    lines.append(OcrLine(text.strip(), *box))
+            return lines
+        finally:
+            api.Clear()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_ocr_backend(name: str = "auto"):
+    """Crea el backend pedido; con "auto" usa tesserocr si está disponible y si no pytesseract."""
+    settings = get_settings()
+    if name in ("auto", "tesserocr"):
+        try:
+            return TesserocrBackend(settings.TESSDATA_PATH)
+        except Exception as e:
+            if name == "tesserocr":
+                raise
+            logger.info(f"tesserocr no disponible, se usa pytesseract: {str(e)}")
+    if name not in ("auto", "pytesseract"):
+        raise ValueError(f"Unsupported OCR backend: {name}")
+    return PytesseractBackend(settings.TESSERACT_CMD)
+
+
+def get_ocr_backend():
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            _backend = create_ocr_backend(get_settings().OCR_BACKEND)
+        return _backend
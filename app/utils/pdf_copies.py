@@ -0,0 +1,78 @@
+# app/utils/pdf_copies.py
+import hashlib
+from typing import Dict, List, NamedTuple, Optional
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+from .pdf_render import PageRenderCache
+
+# Leyendas que el facturador de AFIP imprime en cada copia del mismo comprobante
+COPY_LABELS = ("ORIGINAL", "DUPLICADO", "TRIPLICADO")
+
+
+class PageFingerprint(NamedTuple):
+    # None si la página no tiene ni capa de texto ni imágenes con qué compararla
+    digest: Optional[str]
+    label: Optional[str]
+
+
+class CopyGroup(NamedTuple):
+    """Una página a procesar y las páginas que son copias suyas (índices 0-based, incluida ella misma)."""
+    page: int
+    pages: List[int]
+    labels: List[str]
+
+
+def fingerprint_page(page: pdfium.PdfPage) -> PageFingerprint:
+    """
+    Huella de una página que ignora la leyenda de la copia: el texto de la capa de texto sin las líneas
+    ORIGINAL/DUPLICADO/TRIPLICADO y sin diferencias de espacios. Las páginas sin texto (escaneadas) se
+    comparan por los bytes de sus imágenes, así que solo coinciden si el escaneo es el mismo archivo.
+    """
+    textpage = page.get_textpage()
+    try:
+        text = textpage.get_text_range()
+    finally:
+        textpage.close()
+
+    label = None
+    lines = []
+    for line in text.splitlines():
+        line = " ".join(line.split())
+        if line in COPY_LABELS:
+            label = label or line
+        elif line:
+            lines.append(line)
+    digest = hashlib.sha256()
+    if lines:
+        digest.update(b"text:" + "\n".join(lines).encode("utf-8"))
+        return PageFingerprint(digest.hexdigest(), label)
+
+    images = 0
+    for image in page.get_objects(filter=[pdfium_c.FPDF_PAGEOBJ_IMAGE]):
+        # Datos sin decodificar: es solo leer el stream, no descomprimir la imagen
+        digest.update(b"image:" + image.get_data(decode_simple=False))
+        images += 1
+    return PageFingerprint(digest.hexdigest() if images else None, label)
+
+
+def group_copies(renderer: PageRenderCache, page_indexes: List[int]) -> List[CopyGroup]:
+    """
+    Agrupa las páginas con la misma huella, antes de renderizarlas o pasarlas por OCR. Cada grupo se
+    representa con su primera página; las páginas sin huella quedan en un grupo propio.
+    """
+    groups: List[CopyGroup] = []
+    by_digest: Dict[str, CopyGroup] = {}
+    for index in page_indexes:
+        fingerprint = renderer.read_page(index, fingerprint_page)
+        group = by_digest.get(fingerprint.digest) if fingerprint.digest else None
+        if group is None:
+            group = CopyGroup(index, [], [])
+            groups.append(group)
+            if fingerprint.digest:
+                by_digest[fingerprint.digest] = group
+        group.pages.append(index)
+        if fingerprint.label:
+            group.labels.append(fingerprint.label)
+    return groups
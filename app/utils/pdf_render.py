@@ -0,0 +1,146 @@
+# app/utils/pdf_render.py
+import io
+import threading
+from typing import Callable, Dict, List, Optional, Tuple, TypeVar
+
+import numpy as np
+import pypdfium2 as pdfium
+from PIL import Image
+
+from app.core.metrics import span
+from app.utils.upload_source import Content, UploadSource
+
+# PDFium no es thread-safe ni siquiera entre documentos distintos: todo acceso pasa por este lock
+PDFIUM_LOCK = threading.Lock()
+
+# Misma resolución que usaba pdf2image por defecto
+DEFAULT_DPI = 200
+
+T = TypeVar("T")
+
+
+class InvalidPdfError(ValueError):
+    """El contenido empieza como PDF pero PDFium no puede abrirlo (dañado, truncado o cifrado)."""
+
+
+class PageRenderCache:
+    """
+    Renderiza cada página de un PDF una sola vez por request con pypdfium2 (en proceso, sin pdftoppm)
+    y comparte el mismo arreglo numpy RGB entre la detección de QR y el OCR.
+    """
+
+    def __init__(self, pdf_bytes: Content, dpi: int = DEFAULT_DPI):
+        self.pdf_bytes = pdf_bytes
+        self.dpi = dpi
+        self._document: Optional[pdfium.PdfDocument] = None
+        self._pages: Dict[Tuple[int, int], np.ndarray] = {}
+
+    def _get_document(self) -> pdfium.PdfDocument:
+        if self._document is None:
+            try:
+                if isinstance(self.pdf_bytes, UploadSource):
+                    # PDFium lee el archivo bajo demanda a través del mmap, sin copiarlo a memoria
+                    self._document = pdfium.PdfDocument(self.pdf_bytes.open(), autoclose=True)
+                else:
+                    self._document = pdfium.PdfDocument(self.pdf_bytes)
+            except pdfium.PdfiumError as e:
+                # Un ValueError propio, y no HTTPException, para que cruce también el pool de procesos
+                raise InvalidPdfError(f"Invalid PDF document: {str(e)}") from e
+        return self._document
+
+    @property
+    def page_count(self) -> int:
+        with PDFIUM_LOCK:
+            return len(self._get_document())
+
+    def get_page_array(self, index: int = 0, dpi: Optional[int] = None) -> np.ndarray:
+        """
+        Devuelve la página como arreglo RGB uint8 (alto x ancho x 3). Solo se renderiza la primera vez
+        para cada resolución; por defecto se usa la del cache.
+        """
+        dpi = dpi or self.dpi
+        cached = self._pages.get((index, dpi))
+        if cached is not None:
+            return cached
+
+        with span("pdf_render"), PDFIUM_LOCK:
+            page = self._get_document()[index]
+            try:
+                bitmap = page.render(scale=dpi / 72, rev_byteorder=True)
+                image_np = bitmap.to_numpy()
+            finally:
+                page.close()
+
+        # Descartar el canal alfa si PDFium lo agregó
+        if image_np.ndim == 3 and image_np.shape[2] == 4:
+            image_np = image_np[:, :, :3]
+        image_np = np.ascontiguousarray(image_np)
+        self._pages[(index, dpi)] = image_np
+        return image_np
+
+    def read_page(self, index: int, reader: Callable[[pdfium.PdfPage], T]) -> T:
+        """Ejecuta reader sobre una página del documento ya abierto, bajo PDFIUM_LOCK."""
+        with PDFIUM_LOCK:
+            page = self._get_document()[index]
+            try:
+                return reader(page)
+            finally:
+                page.close()
+
+    def page_pdf(self, index: int) -> bytes:
+        """Un PDF nuevo con solo esa página, para las librerías que leen documentos enteros."""
+        with PDFIUM_LOCK:
+            single = pdfium.PdfDocument.new()
+            try:
+                single.import_pages(self._get_document(), [index])
+                buffer = io.BytesIO()
+                single.save(buffer)
+            finally:
+                single.close()
+        return buffer.getvalue()
+
+    def get_page_image(self, index: int = 0, dpi: Optional[int] = None) -> Image.Image:
+        return Image.fromarray(self.get_page_array(index, dpi))
+
+    def close(self) -> None:
+        self._pages.clear()
+        if self._document is not None:
+            with PDFIUM_LOCK:
+                self._document.close()
+            self._document = None
+
+
+def parse_page_ranges(spec: Optional[str]) -> List[Tuple[int, Optional[int]]]:
+    """
+    Interpreta un rango de páginas 1-based como "1", "1-3,5", "2-" o "all".
+    Devuelve pares (desde, hasta) donde hasta=None significa "hasta la última página".
+    """
+    if spec is None or spec.strip().lower() in ("", "all"):
+        return [(1, None)]
+
+    ranges: List[Tuple[int, Optional[int]]] = []
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        try:
+            first = int(start) if start.strip() else 1
+            last = (int(end) if end.strip() else None) if sep else first
+        except ValueError:
+            raise ValueError(f"Invalid page range: {part}")
+        if first < 1 or (last is not None and last < first):
+            raise ValueError(f"Invalid page range: {part}")
+        ranges.append((first, last))
+    if not ranges:
+        raise ValueError(f"Invalid page range: {spec}")
+    return ranges
+
+
+def resolve_pages(ranges: List[Tuple[int, Optional[int]]], page_count: int) -> List[int]:
+    """Convierte los rangos en índices 0-based ordenados y sin repetir, recortados al largo del documento."""
+    pages = set()
+    for first, last in ranges:
+        last = page_count if last is None else min(last, page_count)
+        pages.update(range(first - 1, last))
+    return sorted(pages)
@@ -0,0 +1,364 @@
+# app/utils/pdf_text.py
+import ctypes
+import io
+import importlib.util
+import math
+import re
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import pypdfium2.raw as pdfium_c
+
+from ..core.metrics import PDF_TEXT_BACKEND_TOTAL
+from .logging import logger
+from .pdf_render import PageRenderCache
+from .upload_source import Content, open_content
+
+# Mismas tolerancias que se usaban con page.extract_text(x_tolerance=3, y_tolerance=3)
+X_TOLERANCE = 3
+Y_TOLERANCE = 3
+
+# pdfplumber expande las ligaduras por defecto; el texto de PDFium se normaliza igual
+LIGATURES = {"ﬀ": "ff", "ﬃ": "ffi", "ﬄ": "ffl", "ﬁ": "fi", "ﬂ": "fl", "ﬆ": "st", "ﬅ": "st"}
+
+# PDFium marca con este carácter el guion de corte al final de una línea
+_PDFIUM_HYPHEN = "\x02"
+# Glifos sin mapeo a Unicode (fuentes sin ToUnicode)
+_UNMAPPED = {0, 0xFFFD, 0xFFFE}
+# Lo mismo en el texto de pdfminer (pdfplumber y MarkItDown)
+_CID = re.compile(r"\(cid:\d+\)")
+
+# Umbrales del control de calidad del texto de PDFium: si se superan se usa pdfplumber
+MAX_UNMAPPED_RATIO = 0.02
+MAX_ROTATED_RATIO = 0.05
+MAX_SINGLE_CHAR_LINE_RATIO = 0.5
+
+
+class PdfChar(NamedTuple):
+    text: str
+    x0: float
+    x1: float
+    top: float
+
+
+class PageChars(NamedTuple):
+    chars: List[PdfChar]
+    unmapped: int
+    rotated: int
+
+
+def read_pdfium_chars(page) -> PageChars:
+    """
+    Lee los caracteres de la capa de texto con la API en C de PDFium. La geometría sigue a pdfminer: top es
+    la línea base más el tamaño de fuente y el descenso de la fuente, para agrupar las líneas igual que
+    pdfplumber. Los espacios que PDFium genera entre palabras se conservan como separadores.
+    """
+    textpage = page.get_textpage()
+    try:
+        raw = textpage.raw
+        height = page.get_height()
+        box = pdfium_c.FS_RECTF()
+        origin_x, origin_y = ctypes.c_double(), ctypes.c_double()
+        descent = ctypes.c_float()
+        descents: Dict[int, float] = {}
+        chars: List[PdfChar] = []
+        unmapped = rotated = 0
+
+        for index in range(pdfium_c.FPDFText_CountChars(raw)):
+            code = pdfium_c.FPDFText_GetUnicode(raw, index)
+            text = chr(code) if code not in _UNMAPPED else ""
+            if text in ("\r", "\n"):
+                continue
+            generated = pdfium_c.FPDFText_IsGenerated(raw, index)
+            if not generated:
+                if not text or pdfium_c.FPDFText_HasUnicodeMapError(raw, index) == 1:
+                    unmapped += 1
+                angle = pdfium_c.FPDFText_GetCharAngle(raw, index)
+                if min(abs(angle), abs(angle - 2 * math.pi)) > 0.01:
+                    rotated += 1
+            if not text:
+                continue
+            if text == _PDFIUM_HYPHEN:
+                text = "-"
+
+            pdfium_c.FPDFText_GetLooseCharBox(raw, index, box)
+            pdfium_c.FPDFText_GetCharOrigin(raw, index, origin_x, origin_y)
+            size = pdfium_c.FPDFText_GetFontSize(raw, index)
+            text_object = pdfium_c.FPDFText_GetTextObject(raw, index)
+            font_descent = 0.0
+            if text_object:
+                font = pdfium_c.FPDFTextObj_GetFont(text_object)
+                key = ctypes.cast(font, ctypes.c_void_p).value or 0
+                if key not in descents:
+                    # El descenso se pide a tamaño 1 y se escala por el tamaño de cada carácter
+                    descents[key] = descent.value if pdfium_c.FPDFFont_GetDescent(font, 1.0, descent) else 0.0
+                font_descent = descents[key] * size
+            # x0 es el origen del glifo y no el borde de la caja: con itálicas o kerning la caja empieza antes
+            # que el espacio generado que la precede y el orden por x los invertiría
+            chars.append(PdfChar(text, origin_x.value, max(box.right, origin_x.value),
+                                 height - (origin_y.value + font_descent + size)))
+        return PageChars(chars, unmapped, rotated)
+    finally:
+        textpage.close()
+
+
+def _cluster(values: List[float], tolerance: float) -> Dict[float, int]:
+    """Agrupa valores ordenados en cadenas donde cada uno está a menos de tolerance del anterior."""
+    clusters: Dict[float, int] = {}
+    last: Optional[float] = None
+    cluster = -1
+    for value in sorted(set(values)):
+        if last is None or value > last + tolerance:
+            cluster += 1
+        clusters[value] = cluster
+        last = value
+    return clusters
+
+
+def chars_to_text(chars: List[PdfChar], x_tolerance: float = X_TOLERANCE, y_tolerance: float = Y_TOLERANCE) -> str:
+    """
+    Arma el texto como page.extract_text de pdfplumber: líneas agrupadas por top, caracteres ordenados por x,
+    palabras separadas por espacios o por huecos mayores a x_tolerance, una línea de texto por renglón.
+    """
+    if not chars:
+        return ""
+    line_of = _cluster([char.top for char in chars], y_tolerance)
+    lines: Dict[int, List[PdfChar]] = {}
+    for char in chars:
+        lines.setdefault(line_of[char.top], []).append(char)
+
+    words: List[Tuple[float, str]] = []
+    for line in (lines[key] for key in sorted(lines)):
+        current: List[PdfChar] = []
+        for char in sorted(line, key=lambda c: c.x0):
+            if char.text.isspace():
+                if current:
+                    words.append(_word(current))
+                current = []
+                continue
+            if current:
+                previous = current[-1]
+                if (char.x0 < previous.x0 or char.x0 > previous.x1 + x_tolerance
+                        or abs(char.top - previous.top) > y_tolerance):
+                    words.append(_word(current))
+                    current = []
+            current.append(char)
+        if current:
+            words.append(_word(current))
+
+    # Las palabras ya están en orden de lectura: se vuelven a agrupar en renglones por su top
+    row_of = _cluster([top for top, _ in words], y_tolerance)
+    rows: List[List[str]] = []
+    previous_row = None
+    for top, text in words:
+        if row_of[top] != previous_row:
+            rows.append([])
+            previous_row = row_of[top]
+        rows[-1].append(text)
+    return "\n".join(" ".join(row) for row in rows)
+
+
+def _word(chars: List[PdfChar]) -> Tuple[float, str]:
+    return min(char.top for char in chars), "".join(LIGATURES.get(char.text, char.text) for char in chars)
+
+
+def layout_issue(page_chars: PageChars, text: str) -> Optional[str]:
+    """Motivo por el que el texto de PDFium no es confiable, o None si pasa el control."""
+    chars = [char for char in page_chars.chars if not char.text.isspace()]
+    total = len(chars) + page_chars.unmapped
+    if not total:
+        return None
+    if page_chars.unmapped / total > MAX_UNMAPPED_RATIO:
+        return f"{page_chars.unmapped} caracteres sin Unicode"
+    if page_chars.rotated / total > MAX_ROTATED_RATIO:
+        return f"{page_chars.rotated} caracteres rotados"
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) >= 5 and sum(len(line.strip()) == 1 for line in lines) / len(lines) > MAX_SINGLE_CHAR_LINE_RATIO:
+        return "texto vertical o caracteres sueltos"
+    return None
+
+
+class PdfiumTextBackend:
+    """Capa de texto con la API de PDFium (C), sobre el mismo documento que usa el render de la página."""
+
+    name = "pdfium"
+
+    def extract(self, pdf_bytes: Content, renderer: PageRenderCache, page_index: int) -> Tuple[str, Optional[str]]:
+        page_chars = renderer.read_page(page_index, read_pdfium_chars)
+        text = chars_to_text(page_chars.chars)
+        return text, layout_issue(page_chars, text)
+
+
+class PdfplumberTextBackend:
+    """Capa de texto con pdfplumber: análisis de layout de pdfminer en Python puro, más lento."""
+
+    name = "pdfplumber"
+
+    def extract(self, pdf_bytes: Content, renderer: PageRenderCache, page_index: int) -> Tuple[str, Optional[str]]:
+        # pdfplumber (y pdfminer) se importa recién cuando hace falta, no al iniciar la app
+        import pdfplumber
+
+        with pdfplumber.open(open_content(pdf_bytes)) as pdf:
+            text = pdf.pages[page_index].extract_text(x_tolerance=X_TOLERANCE, y_tolerance=Y_TOLERANCE)
+        text = text or ""
+        return text, cid_issue(text)
+
+
+class MarkItDownTextBackend:
+    """
+    Capa de texto con MarkItDown (pdfminer por debajo). Cada página se convierte por separado, como un PDF de
+    una sola página: al convertir el documento entero, markitdown 0.1.8 une las páginas con "\n\n" en lugar de
+    "\f" cuando encuentra tablas o formularios, y el texto ya no se puede repartir por página. El conversor se
+    crea una sola vez por proceso.
+    """
+
+    name = "markitdown"
+
+    def __init__(self):
+        self._converter = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def available() -> bool:
+        return importlib.util.find_spec("markitdown") is not None
+
+    def _get_converter(self):
+        with self._lock:
+            if self._converter is None:
+                # markitdown es opcional y pesado: se importa con el primer documento que lo usa
+                from markitdown import MarkItDown
+
+                self._converter = MarkItDown()
+            return self._converter
+
+    def extract(self, pdf_bytes: Content, renderer: PageRenderCache, page_index: int) -> Tuple[str, Optional[str]]:
+        page_pdf = io.BytesIO(renderer.page_pdf(page_index))
+        result = self._get_converter().convert_stream(page_pdf, file_extension=".pdf")
+        text = (result.text_content or "").replace("\f", "").strip()
+        return text, cid_issue(text)
+
+
+def cid_issue(text: str) -> Optional[str]:
+    """pdfminer escribe "(cid:N)" por cada glifo sin Unicode; muchos indican una fuente sin ToUnicode."""
+    unmapped = _CID.findall(text)
+    if not unmapped:
+        return None
+    glyphs = len(text) - sum(len(token) - 1 for token in unmapped)
+    if len(unmapped) / max(glyphs, 1) > MAX_UNMAPPED_RATIO:
+        return f"{len(unmapped)} caracteres sin Unicode"
+    return None
+
+
+class EngineSelector:
+    """
+    Orden en que el modo auto prueba los motores, según lo medido en este proceso: primero el de menor costo
+    esperado por página útil (segundos promedio / tasa de éxito). Ambos valores son promedios móviles que
+    arrancan en DEFAULT_SECONDS y en éxito total, así que sin mediciones el orden es pdfium, pdfplumber,
+    markitdown, y un motor que empieza a fallar en los documentos que llegan pasa atrás. Cada EXPLORE_EVERY
+    páginas va primero el motor medido hace más tiempo, para que uno relegado pueda recuperarse.
+    """
+
+    DEFAULT_SECONDS = {"pdfium": 0.01, "pdfplumber": 0.08, "markitdown": 0.2}
+    # Peso de cada medición en el promedio móvil
+    DECAY = 0.05
+    # Piso de la tasa de éxito: un motor que falló muchas veces sigue pudiendo volver adelante
+    MIN_SUCCESS_RATE = 0.05
+    EXPLORE_EVERY = 50
+
+    def __init__(self, engines: Tuple[str, ...]):
+        self._seconds = {engine: self.DEFAULT_SECONDS[engine] for engine in engines}
+        self._success = {engine: 1.0 for engine in engines}
+        self._last_measured = {engine: 0 for engine in engines}
+        self._calls = 0
+        self._lock = threading.Lock()
+
+    def record(self, engine: str, seconds: float, success: bool) -> None:
+        with self._lock:
+            self._seconds[engine] += self.DECAY * (seconds - self._seconds[engine])
+            self._success[engine] += self.DECAY * (float(success) - self._success[engine])
+            self._last_measured[engine] = self._calls
+
+    def expected_cost(self, engine: str) -> float:
+        return self._seconds[engine] / max(self._success[engine], self.MIN_SUCCESS_RATE)
+
+    def order(self) -> List[str]:
+        with self._lock:
+            self._calls += 1
+            engines = sorted(self._seconds, key=self.expected_cost)
+            if self._calls % self.EXPLORE_EVERY == 0:
+                stale = min(engines, key=self._last_measured.__getitem__)
+                engines.remove(stale)
+                engines.insert(0, stale)
+            return engines
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                engine: {"seconds": round(self._seconds[engine], 4), "success_rate": round(self._success[engine], 3)}
+                for engine in self._seconds
+            }
+
+
+class PdfTextLayer:
+    """
+    Extrae la capa de texto de una página con el motor pedido. Con "auto" prueba los motores en el orden de
+    EngineSelector y pasa al siguiente solo si el texto no pasa el control de calidad (glifos sin Unicode,
+    texto rotado o vertical) o el motor falla. Una página sin texto no se reintenta: va al OCR.
+    """
+
+    ENGINES = ("auto", "pdfium", "pdfplumber", "markitdown")
+
+    def __init__(self, engine: str = "auto"):
+        self.validate(engine)
+        self.engine = engine
+        self._backends = {"pdfium": PdfiumTextBackend(), "pdfplumber": PdfplumberTextBackend()}
+        if MarkItDownTextBackend.available():
+            self._backends["markitdown"] = MarkItDownTextBackend()
+        self.selector = EngineSelector(tuple(self._backends))
+
+    @classmethod
+    def validate(cls, engine: str) -> None:
+        if engine not in cls.ENGINES:
+            raise ValueError(f"Unsupported PDF text engine: {engine}")
+
+    def preload(self) -> None:
+        """Crea el conversor de MarkItDown, que si no se crea con el primer documento que lo usa."""
+        backend = self._backends.get("markitdown")
+        if backend is not None:
+            backend._get_converter()
+
+    def ensure_available(self, engine: str) -> None:
+        self.validate(engine)
+        if engine != "auto" and engine not in self._backends:
+            raise ValueError(f"PDF text engine {engine} is not installed")
+
+    def extract(
+        self, pdf_bytes: Content, renderer: PageRenderCache, page_index: int, engine: Optional[str] = None
+    ) -> Tuple[str, List[str]]:
+        """Devuelve el texto y los mensajes de diagnóstico sobre qué motor se usó."""
+        engine = engine or self.engine
+        self.ensure_available(engine)
+        engines = self.selector.order() if engine == "auto" else [engine]
+
+        page_number = page_index + 1
+        diagnostics: List[str] = []
+        text = ""
+        for position, name in enumerate(engines):
+            start = time.perf_counter()
+            try:
+                text, issue = self._backends[name].extract(pdf_bytes, renderer, page_index)
+            except Exception as e:
+                if len(engines) == 1:
+                    raise
+                text, issue = "", f"error: {str(e)}"
+            self.selector.record(name, time.perf_counter() - start, issue is None)
+            last = position == len(engines) - 1
+            if issue is not None:
+                logger.info(f"Texto de {name} descartado en la página {page_number}: {issue}")
+                message = f"Texto de {name} con problemas en la página {page_number} ({issue})"
+                diagnostics.append(message if last else f"{message}, se usa {engines[position + 1]}")
+            if issue is None or last:
+                PDF_TEXT_BACKEND_TOTAL.inc(backend=f"{name}_fallback" if position else name)
+                return text, diagnostics
+        return text, diagnostics
@@ -0,0 +1,152 @@
+# app/utils/upload_source.py
+import io
+import mmap
+from typing import BinaryIO, Optional, Union
+
+from fastapi import HTTPException, UploadFile
+
+# Firmas de los formatos aceptados: (prefijo, offset, content-type)
+MAGIC_SIGNATURES = (
+    (b"%PDF-", 0, "application/pdf"),
+    (b"\x89PNG\r\n\x1a\n", 0, "image/png"),
+    (b"\xff\xd8\xff", 0, "image/jpeg"),
+    (b"GIF87a", 0, "image/gif"),
+    (b"GIF89a", 0, "image/gif"),
+    (b"II*\x00", 0, "image/tiff"),
+    (b"MM\x00*", 0, "image/tiff"),
+    (b"BM", 0, "image/bmp"),
+    (b"WEBP", 8, "image/webp"),
+    (b"PK\x03\x04", 0, "application/zip"),
+)
+
+# Hasta este tamaño el upload se copia a bytes: es el límite hasta el que Starlette lo mantiene en memoria
+INLINE_MAX_BYTES = 1024 * 1024
+
+
+def sniff_content_type(head: bytes) -> Optional[str]:
+    """Detecta el tipo real del archivo por sus primeros bytes, sin confiar en content_type ni en la extensión."""
+    # Algunos generadores agregan basura antes del encabezado %PDF- (el estándar tolera hasta 1024 bytes)
+    if b"%PDF-" in head[:1024]:
+        return "application/pdf"
+    for signature, offset, content_type in MAGIC_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return content_type
+    return None
+
+
+class BufferReader(io.RawIOBase):
+    """Lector de solo lectura sobre un buffer (bytes o mmap) que no copia más que lo que se pide en cada read."""
+
+    def __init__(self, buffer):
+        self._view = memoryview(buffer).cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self._position
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            self._position = offset
+        elif whence == io.SEEK_CUR:
+            self._position += offset
+        else:
+            self._position = len(self._view) + offset
+        return self._position
+
+    def readinto(self, target) -> int:
+        chunk = self._view[self._position:self._position + len(target)]
+        size = len(chunk)
+        target[:size] = chunk
+        self._position += size
+        return size
+
+    def close(self) -> None:
+        if not self.closed:
+            self._view.release()
+        super().close()
+
+
+class UploadSource:
+    """
+    Contenido de un archivo subido sin copiarlo a bytes: los uploads de más de INLINE_MAX_BYTES, que Starlette
+    ya volcó a un archivo temporal, se leen a través de un mmap; los más chicos, o un archivo sin descriptor,
+    se copian a bytes.
+    """
+
+    def __init__(self, buffer: Union[bytes, mmap.mmap]):
+        self._buffer = buffer
+
+    @classmethod
+    async def from_upload(cls, file: UploadFile, max_bytes: int) -> "UploadSource":
+        if file.size is not None and file.size > max_bytes:
+            raise HTTPException(status_code=413, detail=f"File exceeds the maximum size of {max_bytes} bytes")
+
+        spool = file.file
+        size = spool.seek(0, io.SEEK_END)
+        if size == 0:
+            return cls(b"")
+        if size > INLINE_MAX_BYTES:
+            try:
+                # Un SpooledTemporaryFile de este tamaño ya está en disco: fileno() no lo vuelve a escribir
+                fileno = spool.fileno()
+            except (AttributeError, io.UnsupportedOperation):
+                fileno = None
+            if fileno is not None:
+                spool.flush()
+                return cls(mmap.mmap(fileno, 0, access=mmap.ACCESS_READ))
+        await file.seek(0)
+        return cls(await file.read())
+
+    def __len__(self) -> int:
+        return len(self._buffer)
+
+    @property
+    def buffer(self):
+        return self._buffer
+
+    def head(self, size: int = 1024) -> bytes:
+        return bytes(self._buffer[:size])
+
+    def open(self) -> BinaryIO:
+        return io.BufferedReader(BufferReader(self._buffer))
+
+    def to_bytes(self) -> bytes:
+        return self._buffer if isinstance(self._buffer, bytes) else self._buffer[:]
+
+    def close(self) -> None:
+        if isinstance(self._buffer, mmap.mmap):
+            try:
+                self._buffer.close()
+            except BufferError:
+                # Todavía hay lectores abiertos; el mmap se libera cuando el GC los recolecte
+                pass
+
+
+# Los extractores aceptan tanto bytes como un UploadSource
+Content = Union[bytes, UploadSource]
+
+
+def open_content(content: Content) -> BinaryIO:
+    """Abre el contenido como archivo de solo lectura. BytesIO comparte el objeto bytes sin copiarlo."""
+    if isinstance(content, UploadSource):
+        return content.open()
+    return io.BytesIO(content)
+
+
+def close_sources(sources) -> None:
+    for source in sources:
+        source.close()
+
+
+def content_buffer(content: Content):
+    return content.buffer if isinstance(content, UploadSource) else content
+
+
+def content_head(content: Content, size: int = 1024) -> bytes:
+    return content.head(size) if isinstance(content, UploadSource) else content[:size]
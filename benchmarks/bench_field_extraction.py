@@ -0,0 +1,111 @@
+# benchmarks/bench_field_extraction.py
+"""
+Control del motor de reglas de ComprobanteDataExtractor contra los re.search originales.
+
+Verifica primero que ambos produzcan los mismos campos y luego compara el tiempo sobre textos de varias copias.
+El motor aplica un re.search por regla igual que antes (solo compila la tabla una vez): los tiempos deben
+quedar a la par, la comparación sirve para detectar una regla que se vuelva más lenta.
+
+    python -m benchmarks.bench_field_extraction
+"""
+import re
+import time
+from typing import Dict, Optional
+
+from app.services.field_extraction import FIELD_ENGINE
+
+SAMPLE_COPY = """{copia}
+FACTURA
+C
+COD. 011
+Razón Social: ESTUDIO CONTABLE PEREZ
+Punto de Venta: 00003 Comp. Nro: 00000123
+Fecha de Emisión: 05/03/2024
+Domicilio Comercial: Av. Siempre Viva 742 - Rosario, Santa Fe
+CUIT: 20123456789
+Ingresos Brutos: 20123456789
+Condición frente al IVA: Responsable Monotributo
+Fecha de Inicio de Actividades: 01/01/2015
+Período Facturado Desde: 01/02/2024 Hasta: 29/02/2024 Fecha de Vto. para el pago: 05/03/2024
+CUIT: 30712345678 Apellido y Nombre / Razón Social: COMERCIAL DEL LITORAL SA
+Condición frente al IVA: IVA Responsable Inscripto Domicilio: San Martín 1234 - Santa Fe
+Condición de venta: Contado
+Código Producto / Servicio Cantidad U. Medida Precio Unit. % Bonif Imp. Bonif. Subtotal
+1 Honorarios profesionales "CONTADOR PUBLICO - MP 12345" 1,00 unidades 150000,00 0,00 0,00 150000,00
+Subtotal: $ 150000,00
+Importe Otros Tributos: $ 0,00
+Importe Total: $ 150000,00
+CAE N°: 74123456789012
+Fecha de Vto. de CAE: 15/03/2024
+{relleno}
+"""
+
+
+def build_text(copies: int, filler_lines: int) -> str:
+    labels = ["ORIGINAL", "DUPLICADO", "TRIPLICADO"]
+    blocks = []
+    for i in range(copies):
+        relleno = "\n".join(f"Línea de detalle {i}-{j} sin datos fiscales relevantes" for j in range(filler_lines))
+        blocks.append(SAMPLE_COPY.format(copia=labels[i % 3], relleno=relleno))
+    return "\n\n".join(blocks)
+
+
+def legacy_extract(text_content: str) -> Dict[str, Optional[str]]:
+    """Implementación original con ~25 re.search sin compilar, conservada solo para comparar."""
+    def group(match, index=1, strip=False):
+        if not match:
+            return None
+        return match.group(index).strip() if strip else match.group(index)
+
+    periodo = re.search(r"Período Facturado Desde:\s*(\d{2}/\d{2}/\d{4})\s*Hasta:\s*(\d{2}/\d{2}/\d{4})", text_content)
+    return {
+        "punto_venta": group(re.search(r"Punto de Venta:\s*(\d+)", text_content)),
+        "numero_comprobante": group(re.search(r"Comp\.? Nro:\s*(\d+)", text_content)),
+        "fecha_emision": group(re.search(r"Fecha de Emisión:\s*(\d{2}/\d{2}/\d{4})", text_content)),
+        "importe_total": group(re.search(r"Importe Total:\s*\$?\s*([\d.,]+)", text_content)),
+        "periodo_facturado_desde": group(periodo, 1),
+        "periodo_facturado_hasta": group(periodo, 2),
+        "cuit_emisor": group(re.search(r"CUIT:\s*(\d{11})", text_content)),
+        "razon_social_emisor": group(re.search(r"Razón Social:\s*(.+?)(?=\n|Fecha de Emisión)", text_content, re.DOTALL), strip=True),
+        "domicilio_comercial_emisor": group(re.search(r"Domicilio Comercial:\s*(.+?)(?=\n|CUIT)", text_content, re.DOTALL), strip=True),
+        "condicion_iva_emisor": group(re.search(r"Condición frente al IVA:\s*(.+?)(?=\n|Fecha de Inicio de Actividades)", text_content, re.DOTALL), strip=True),
+        "cuit_receptor": group(re.search(r"CUIT:\s*(\d{11})\s*Apellido y Nombre / Razón Social:", text_content)),
+        "razon_social_receptor": group(re.search(r"Apellido y Nombre / Razón Social:\s*(.+?)(?=\n|Condición frente al IVA)", text_content, re.DOTALL), strip=True),
+        "domicilio_comercial_receptor": group(re.search(r"Apellido y Nombre / Razón Social:.+?Domicilio:\s*(.+?)(?=\n|$)", text_content, re.DOTALL), strip=True),
+        "condicion_iva_receptor": group(re.search(r"Apellido y Nombre / Razón Social:.+?Condición frente al IVA:\s*(.+?)(?=\n|Domicilio)", text_content, re.DOTALL), strip=True),
+        "subtotal": group(re.search(r"Subtotal:\s*\$?\s*([\d.,]+)", text_content)),
+        "bonificacion_porcentaje": group(re.search(r"Bonif:\s*%(\d+)", text_content)),
+        "bonificacion_importe": group(re.search(r"Importe Bonif:\s*\$?\s*([\d.,]+)", text_content)),
+        "subtotal_con_bonificacion": group(re.search(r"Subtotal c/Bonif\.?:\s*\$?\s*([\d.,]+)", text_content)),
+        "importe_otros_tributos": group(re.search(r"Importe Otros Tributos:\s*\$?\s*([\d.,]+)", text_content)),
+        "profesion_oficio": group(re.search(r"\"(.+? - MP \d+)\"", text_content)),
+        "cae_numero": group(re.search(r"CAE N°:\s*(\d+)", text_content)),
+        "cae_fecha_vencimiento": group(re.search(r"Fecha de Vto\. de CAE:\s*(\d{2}/\d{2}/\d{4})", text_content)),
+    }
+
+
+def timeit(fn, text: str, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(text)
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main() -> None:
+    cases = [("1 copia", build_text(1, 0)), ("3 copias", build_text(3, 40)), ("30 copias", build_text(30, 200))]
+    # Un texto sin datos fiscales obliga a recorrerlo completo para cada campo
+    cases.append(("sin coincidencias", "\n".join(f"texto OCR irrelevante línea {i}" for i in range(20000))))
+
+    for name, text in cases:
+        legacy = legacy_extract(text)
+        engine = FIELD_ENGINE.extract(text)
+        assert legacy == engine, f"Resultados distintos en '{name}': {legacy} != {engine}"
+
+        repeat = 200 if len(text) < 100_000 else 20
+        legacy_ms = timeit(legacy_extract, text, repeat)
+        engine_ms = timeit(FIELD_ENGINE.extract, text, repeat)
+        print(f"{name:>18} ({len(text):>8} chars): legacy {legacy_ms:8.3f} ms | motor {engine_ms:8.3f} ms | x{legacy_ms / engine_ms:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+# benchmarks/bench_ocr_backends.py
+"""
+Compara el costo por imagen de los backends de OCR (tesserocr en proceso contra pytesseract por subproceso).
+
+    python -m benchmarks.bench_ocr_backends [repeticiones]
+"""
+import sys
+import time
+
+from PIL import Image, ImageDraw
+
+from app.utils.ocr_backend import create_ocr_backend
+
+LINES = [
+    "Punto de Venta: 00003 Comp. Nro: 00000123",
+    "Fecha de Emisión: 05/03/2024",
+    "CUIT: 20123456789",
+    "Razón Social: ESTUDIO CONTABLE PEREZ",
+    "Importe Total: $ 150000,00",
+    "CAE N°: 74123456789012",
+]
+
+
+def build_image() -> Image.Image:
+    image = Image.new("L", (1654, 600), color=255)
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(LINES):
+        draw.text((60, 60 + i * 80), line, fill=0)
+    return image
+
+
+def main() -> None:
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    image = build_image()
+
+    for name in ("pytesseract", "tesserocr"):
+        # La primera llamada incluye la carga del traineddata
+        start = time.perf_counter()
+        try:
+            backend = create_ocr_backend(name)
+            backend.image_to_string(image)
+        except Exception as e:
+            print(f"{name:>12}: no disponible ({e})")
+            continue
+        first_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        for _ in range(repeat):
+            backend.image_to_string(image)
+        mean_ms = (time.perf_counter() - start) / repeat * 1000
+        print(f"{name:>12}: primera llamada {first_ms:8.1f} ms | promedio {mean_ms:8.1f} ms ({repeat} repeticiones)")
+
+
+if __name__ == "__main__":
+    main()
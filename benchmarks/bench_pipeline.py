@@ -0,0 +1,249 @@
+# benchmarks/bench_pipeline.py
+"""
+Benchmark reproducible del pipeline completo sobre el corpus sintético de benchmarks.corpus.
+
+Mide cada etapa del FileProcessor (QR, texto, campos y process_content) y el endpoint /upload/ a través de
+un cliente ASGI en proceso (sin red ni uvicorn). Reporta throughput, percentiles de latencia, RSS máximo y
+la exactitud de los campos contra los valores generados, para detectar mejoras de velocidad que pierden datos.
+
+    python -m benchmarks.bench_pipeline [--per-kind 5] [--seed 1234] [--concurrency 4] [--json resultados.json]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# El endpoint necesita la configuración de la app; para el benchmark bastan credenciales de prueba
+os.environ.setdefault("USER", "bench")
+os.environ.setdefault("PASSWORD", "bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+
+from benchmarks.corpus import KINDS, CorpusItem, generate_corpus  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    """RSS máximo del proceso hasta el momento."""
+    try:
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux lo informa en KB, macOS en bytes
+        return peak / 1024 / 1024 if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        import psutil
+
+        info = psutil.Process().memory_info()
+        return getattr(info, "peak_wset", info.rss) / 1024 / 1024
+
+
+def percentile(values: List[float], p: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(int(round(p / 100 * (len(ordered) - 1))), len(ordered) - 1)
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], wall_time: float) -> Dict[str, Any]:
+    return {
+        "stage": name,
+        "count": len(latencies),
+        "throughput_per_s": round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1),
+        "p90_ms": round(percentile(latencies, 90) * 1000, 1),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def time_each(items: List[CorpusItem], fn: Callable[[CorpusItem], Any], repeat: int) -> Tuple[List[float], float]:
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for item in items:
+            item_start = time.perf_counter()
+            fn(item)
+            latencies.append(time.perf_counter() - item_start)
+    return latencies, time.perf_counter() - start
+
+
+class AccuracyReport:
+    """Compara los campos extraídos con los generados, por tipo de archivo y por campo."""
+
+    def __init__(self):
+        self.fields: Dict[str, Dict[str, List[int]]] = defaultdict(lambda: defaultdict(lambda: [0, 0]))
+        self.items: Dict[str, List[int]] = defaultdict(lambda: [0, 0])
+        self.misses: List[Dict[str, Any]] = []
+
+    def add(self, item: CorpusItem, comprobante: Optional[Dict[str, Any]]) -> None:
+        comprobante = comprobante or {}
+        all_ok = True
+        for field, expected in item.expected.items():
+            ok = comprobante.get(field) == expected
+            self.fields[item.kind][field][0] += int(ok)
+            self.fields[item.kind][field][1] += 1
+            if not ok:
+                all_ok = False
+                self.misses.append({
+                    "file": item.name, "field": field, "expected": expected, "got": comprobante.get(field),
+                })
+        self.items[item.kind][0] += int(all_ok)
+        self.items[item.kind][1] += 1
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            kind: {
+                "items_ok": f"{ok}/{total}",
+                "fields": {field: round(hits / count, 3) for field, (hits, count) in self.fields[kind].items()},
+            }
+            for kind, (ok, total) in self.items.items()
+        }
+
+
+def bench_stages(items: List[CorpusItem], repeat: int) -> Dict[str, Any]:
+    from app.core.registry import get_registry
+
+    registry = get_registry()
+    registry.warm_up()
+    processor = registry.file_processor
+    text_extractor = registry.text_extractor
+    qr_extractor = processor.qr_extractor
+    data_extractor = registry.comprobante_data_extractor
+
+    results = []
+    accuracy: Dict[str, AccuracyReport] = {}
+    by_kind = defaultdict(list)
+    for item in items:
+        by_kind[item.kind].append(item)
+
+    for kind, kind_items in by_kind.items():
+        is_pdf = kind.endswith("_pdf")
+        texts: Dict[str, str] = {}
+
+        def qr(item):
+            return qr_extractor.extract_from_pdf(item.content) if is_pdf else qr_extractor.extract_from_image(item.content)
+
+        def text(item):
+            extracted, _ = (text_extractor.process_pdf(item.content) if is_pdf
+                            else text_extractor.process_image(item.content))
+            texts[item.name] = extracted
+
+        def fields(item):
+            data_extractor.extract_comprobante_data(texts.get(item.name, ""))
+
+        report = accuracy.setdefault("process_content", AccuracyReport())
+
+        def full(item):
+            result = processor.process_content(item.content, item.name, item.content_type, True, item.pages, True)
+            report.add(item, result["comprobante"])
+
+        for stage, fn in (("qr", qr), ("text", text), ("fields", fields), ("process_content", full)):
+            # process_content se mide una sola vez por archivo para no duplicar la exactitud
+            latencies, wall_time = time_each(kind_items, fn, 1 if stage == "process_content" else repeat)
+            results.append({"kind": kind, **summarize(stage, latencies, wall_time)})
+
+    return {"stages": results, "accuracy": {name: report.as_dict() for name, report in accuracy.items()},
+            "misses": {name: report.misses for name, report in accuracy.items()}}
+
+
+async def bench_endpoint(items: List[CorpusItem], concurrency: int, use_cache: bool) -> Dict[str, Any]:
+    import httpx
+
+    from app.core.registry import get_registry
+    from app.core.security import get_current_user
+    from main import app
+
+    registry = get_registry()
+    await asyncio.to_thread(registry.warm_up)
+    if not use_cache:
+        registry.file_processor.result_cache = None
+    app.dependency_overrides[get_current_user] = lambda: "bench"
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    statuses: Dict[int, int] = defaultdict(int)
+    report = AccuracyReport()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        async def upload(item: CorpusItem) -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.post(
+                    "/upload/",
+                    params={"pages": item.pages},
+                    files={"file": (item.name, item.content, item.content_type)},
+                )
+                latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+            report.add(item, response.json().get("comprobante") if response.status_code == 200 else None)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(upload(item) for item in items))
+        wall_time = time.perf_counter() - start
+
+    app.dependency_overrides.pop(get_current_user, None)
+    registry.shutdown()
+    return {
+        "endpoint": {**summarize("upload", latencies, wall_time), "concurrency": concurrency,
+                     "status_codes": dict(statuses)},
+        "accuracy": report.as_dict(),
+        "misses": report.misses,
+    }
+
+
+def print_table(rows: List[Dict[str, Any]]) -> None:
+    columns = ("kind", "stage", "count", "throughput_per_s", "p50_ms", "p90_ms", "p99_ms", "max_ms", "peak_rss_mb")
+    print(" | ".join(f"{column:>16}" for column in columns))
+    for row in rows:
+        print(" | ".join(f"{str(row.get(column, '')):>16}" for column in columns))
+
+
+def print_accuracy(title: str, accuracy: Dict[str, Any]) -> None:
+    print(f"\nExactitud de campos ({title})")
+    for kind, values in accuracy.items():
+        fields = ", ".join(f"{field} {ratio:.0%}" for field, ratio in values["fields"].items())
+        print(f"  {kind:>14}: comprobantes completos {values['items_ok']} | {fields}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--per-kind", type=int, default=5, help="archivos por tipo")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--kinds", default=",".join(KINDS), help="tipos a incluir, separados por coma")
+    parser.add_argument("--repeat", type=int, default=1, help="repeticiones de las etapas aisladas")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests simultáneos contra /upload/")
+    parser.add_argument("--cache", action="store_true", help="mantener la cache de resultados activa")
+    parser.add_argument("--skip-stages", action="store_true")
+    parser.add_argument("--skip-endpoint", action="store_true")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    items = generate_corpus(args.per_kind, args.seed, kinds=tuple(args.kinds.split(",")))
+    print(f"Corpus: {len(items)} archivos generados en {time.perf_counter() - start:.1f} s (semilla {args.seed})\n")
+
+    output: Dict[str, Any] = {"per_kind": args.per_kind, "seed": args.seed}
+    if not args.skip_stages:
+        output["stages"] = bench_stages(items, args.repeat)
+        print_table(output["stages"]["stages"])
+        print_accuracy("process_content", output["stages"]["accuracy"]["process_content"])
+    if not args.skip_endpoint:
+        output["endpoint"] = asyncio.run(bench_endpoint(items, args.concurrency, args.cache))
+        print()
+        print_table([{"kind": "all", **output["endpoint"]["endpoint"]}])
+        print(f"status: {output['endpoint']['endpoint']['status_codes']}")
+        print_accuracy("/upload/", output["endpoint"]["accuracy"])
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
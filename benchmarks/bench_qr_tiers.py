@@ -0,0 +1,78 @@
+# benchmarks/bench_qr_tiers.py
+"""
+Mide cada nivel de la cascada de QR por separado (no en cascada), con cada decodificador clásico disponible,
+sobre los comprobantes con QR del corpus sintético: aciertos y tiempo promedio por tipo de archivo.
+
+    python -m benchmarks.bench_qr_tiers [--per-kind N] [--seed S] [--qreader]
+
+Con --qreader se mide también el nivel de QReader (carga el modelo).
+"""
+import argparse
+import io
+import time
+from collections import defaultdict
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from app.services.qr_extractor import QRExtractor
+from app.utils.pdf_render import PageRenderCache
+from benchmarks.corpus import CorpusItem, generate_corpus
+
+
+def page_array(item: CorpusItem) -> np.ndarray:
+    """La imagen que recibe el extractor de QR: la página renderizada o la foto con la orientación EXIF."""
+    if item.content_type == "application/pdf":
+        renderer = PageRenderCache(item.content)
+        try:
+            return renderer.get_page_array(0)
+        finally:
+            renderer.close()
+    return np.array(ImageOps.exif_transpose(Image.open(io.BytesIO(item.content))).convert("RGB"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--per-kind", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--qreader", action="store_true", help="medir también el nivel de QReader")
+    args = parser.parse_args()
+
+    items = [item for item in generate_corpus(args.per_kind, args.seed) if item.spec.with_qr]
+    images = [(item.kind, page_array(item)) for item in items]
+    qreader = None
+    if args.qreader:
+        from qreader import QReader
+
+        qreader = QReader()
+
+    for decoder in QRExtractor.DECODERS:
+        try:
+            # Sin --qreader se pasa un objeto cualquiera: el nivel qreader no se mide
+            extractor = QRExtractor(qreader=qreader or object(), decoder=decoder)
+        except ValueError as e:
+            print(f"{decoder}: no disponible ({e})")
+            continue
+        tiers = [tier for tier in QRExtractor.TIERS["pyzbar"] if tier != "qreader" or qreader is not None]
+        results: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        hits: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        for kind, image_np in images:
+            gray = extractor._to_gray(image_np)
+            for tier in tiers:
+                start = time.perf_counter()
+                found = bool(extractor.decode_tier(tier, image_np, gray))
+                results[kind][tier].append(time.perf_counter() - start)
+                hits[kind][tier] += int(found)
+
+        print(f"\n{decoder} (cascada: {', '.join(extractor.tiers)})")
+        for kind in results:
+            cells = []
+            for tier in tiers:
+                times = results[kind][tier]
+                cells.append(f"{tier} {hits[kind][tier]}/{len(times)} {sum(times) / len(times) * 1000:6.1f} ms")
+            print(f"  {kind:>14}: " + " | ".join(cells))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,239 @@
+# benchmarks/bench_startup.py
+"""
+Tiempo de importación de la app y memoria por worker al servir con varios procesos.
+
+1. Importa main en un proceso nuevo y reporta los segundos, el RSS y qué dependencias pesadas quedaron
+   cargadas, junto con los paquetes que más tardan según -X importtime.
+2. Levanta main.py con SERVER_WORKERS=N, con y sin SERVER_PRELOAD, y mide RSS, PSS y USS de cada proceso
+   cuando los workers están listos y después de procesar archivos del corpus sintético. PSS reparte las
+   páginas compartidas entre los procesos que las usan, así que su suma es la memoria que ocupa el servicio.
+
+    python -m benchmarks.bench_startup [--workers 4] [--requests 16] [--json resultados.json]
+"""
+import argparse
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import httpx
+import psutil
+
+from benchmarks.corpus import generate_corpus
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("torch", "ultralytics", "qreader", "pdfplumber", "pytesseract", "ollama", "cv2", "pypdfium2")
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import main
+seconds = time.perf_counter() - start
+import psutil
+print(json.dumps({{
+    "seconds": seconds,
+    "rss_mb": psutil.Process().memory_info().rss / 2 ** 20,
+    "loaded": [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def _env(**extra: str) -> Dict[str, str]:
+    env = dict(os.environ)
+    # La app necesita credenciales; para medir alcanzan unas de prueba
+    env.setdefault("USER", "bench")
+    env.setdefault("PASSWORD", "bench")
+    env.setdefault("SECRET_KEY", "bench")
+    env.update(extra)
+    return env
+
+
+def measure_import(runs: int) -> Dict[str, Any]:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_PROBE], cwd=ROOT, env=_env(), capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+
+    # -X importtime: "import time: self [us] | cumulative | paquete", indentado según el anidamiento
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"], cwd=ROOT, env=_env(), capture_output=True,
+        text=True, check=True,
+    ).stderr
+    packages = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        if cumulative.strip().isdigit() and "." not in name.strip():
+            packages[name.strip()] = max(packages.get(name.strip(), 0), int(cumulative))
+    slowest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:10]
+
+    return {
+        "seconds_median": round(statistics.median(sample["seconds"] for sample in samples), 3),
+        "rss_mb": round(samples[-1]["rss_mb"], 1),
+        "heavy_modules_loaded": samples[-1]["loaded"],
+        "slowest_packages_ms": {name: round(micros / 1000, 1) for name, micros in slowest},
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def memory_snapshot(master: psutil.Process) -> Dict[str, Any]:
+    processes = []
+    for role, proc in [("master", master)] + [("worker", child) for child in master.children(recursive=True)]:
+        try:
+            info = proc.memory_full_info()
+        except psutil.Error:
+            continue
+        processes.append({
+            "role": role,
+            "pid": proc.pid,
+            "rss_mb": round(info.rss / 2 ** 20, 1),
+            # PSS solo existe en Linux
+            "pss_mb": round(getattr(info, "pss", info.rss) / 2 ** 20, 1),
+            "uss_mb": round(info.uss / 2 ** 20, 1),
+        })
+    return {
+        "processes": processes,
+        "total_pss_mb": round(sum(proc["pss_mb"] for proc in processes), 1),
+        "total_rss_mb": round(sum(proc["rss_mb"] for proc in processes), 1),
+    }
+
+
+def _wait_until_ready(base_url: str, master: psutil.Process, workers: int, timeout: float) -> float:
+    """Espera a que /ready responda 200 y a que la memoria de todos los workers deje de crecer."""
+    start = time.perf_counter()
+    deadline = start + timeout
+    previous: Optional[List[int]] = None
+    stable = 0
+    while time.perf_counter() < deadline:
+        time.sleep(0.5)
+        children = master.children()
+        try:
+            # Conexión nueva en cada intento para que responda cualquiera de los workers
+            ready = httpx.get(f"{base_url}/ready", timeout=5).status_code == 200
+        except httpx.HTTPError:
+            ready = False
+        rss = [child.memory_info().rss for child in children]
+        if ready and len(children) >= workers and previous is not None and len(previous) == len(rss):
+            stable = stable + 1 if all(abs(a - b) < 2 ** 20 for a, b in zip(previous, rss)) else 0
+            if stable >= 4:
+                return time.perf_counter() - start
+        previous = rss
+    raise TimeoutError(f"Los workers no quedaron listos en {timeout} s")
+
+
+def _drive_requests(base_url: str, workers: int, requests: int) -> Dict[int, int]:
+    items = generate_corpus(per_kind=max(requests // 2, 1), kinds=("text_pdf", "scanned_pdf"))[:requests]
+    token = httpx.post(
+        f"{base_url}/login", data={"username": os.environ.get("USER", "bench"),
+                                   "password": os.environ.get("PASSWORD", "bench")},
+    ).json()["access_token"]
+
+    def upload(item) -> int:
+        # Requests simultáneos y sin keep-alive para que se repartan entre los workers
+        response = httpx.post(
+            f"{base_url}/upload/", headers={"Authorization": f"Bearer {token}"},
+            files={"file": (item.name, item.content, item.content_type)}, timeout=300,
+        )
+        return response.status_code
+
+    statuses: Dict[int, int] = {}
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for status in pool.map(upload, items):
+            statuses[status] = statuses.get(status, 0) + 1
+    return statuses
+
+
+def measure_serving(workers: int, preload: bool, requests: int, timeout: float) -> Dict[str, Any]:
+    port = _free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    env = _env(
+        SERVER_HOST="127.0.0.1", SERVER_PORT=str(port), SERVER_WORKERS=str(workers),
+        SERVER_PRELOAD=str(preload).lower(), RESULT_CACHE_SIZE="0",
+    )
+    server = subprocess.Popen(
+        [sys.executable, "main.py"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    master = psutil.Process(server.pid)
+    try:
+        time_to_ready = _wait_until_ready(base_url, master, workers, timeout)
+        result = {
+            "workers": workers,
+            "preload": preload,
+            "time_to_ready_s": round(time_to_ready, 1),
+            "idle": memory_snapshot(master),
+        }
+        if requests:
+            result["status_codes"] = _drive_requests(base_url, workers, requests)
+            result["after_requests"] = memory_snapshot(master)
+        return result
+    finally:
+        server.send_signal(signal.SIGTERM)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def print_serving(result: Dict[str, Any]) -> None:
+    print(f"\nSERVER_WORKERS={result['workers']} SERVER_PRELOAD={result['preload']}: "
+          f"listo en {result['time_to_ready_s']} s")
+    for phase in ("idle", "after_requests"):
+        if phase not in result:
+            continue
+        snapshot = result[phase]
+        workers = [proc for proc in snapshot["processes"] if proc["role"] == "worker"]
+        print(f"  {phase:>14}: PSS total {snapshot['total_pss_mb']} MB | RSS total {snapshot['total_rss_mb']} MB")
+        for proc in snapshot["processes"]:
+            print(f"  {proc['role']:>14}: RSS {proc['rss_mb']:>7} MB | PSS {proc['pss_mb']:>7} MB | "
+                  f"USS {proc['uss_mb']:>7} MB")
+        if workers:
+            print(f"  {'media worker':>14}: USS {statistics.mean(proc['uss_mb'] for proc in workers):.1f} MB")
+    if "status_codes" in result:
+        print(f"  status: {result['status_codes']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--requests", type=int, default=16, help="archivos a procesar antes de medir de nuevo")
+    parser.add_argument("--import-runs", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=300.0, help="segundos máximos para que carguen los workers")
+    parser.add_argument("--skip-serving", action="store_true")
+    parser.add_argument("--json", help="guardar los resultados en este archivo")
+    args = parser.parse_args()
+
+    output: Dict[str, Any] = {"import": measure_import(args.import_runs)}
+    imports = output["import"]
+    print(f"import main: {imports['seconds_median']} s, RSS {imports['rss_mb']} MB, "
+          f"dependencias pesadas cargadas: {imports['heavy_modules_loaded'] or 'ninguna'}")
+    print("  " + ", ".join(f"{name} {ms} ms" for name, ms in imports["slowest_packages_ms"].items()))
+
+    if not args.skip_serving:
+        output["serving"] = []
+        for preload in (False, True):
+            result = measure_serving(args.workers, preload, args.requests, args.timeout)
+            output["serving"].append(result)
+            print_serving(result)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(output, f, ensure_ascii=False, indent=2)
+        print(f"\nResultados guardados en {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,385 @@
+# benchmarks/corpus.py
+"""
+Generador offline de un corpus sintético de comprobantes AFIP con valores conocidos.
+
+Tipos de archivo generados:
+    text_pdf       PDF con capa de texto (una copia)
+    scanned_pdf    PDF rasterizado con ruido, rotación leve y compresión JPEG (sin capa de texto)
+    photo_jpeg     foto de celular: perspectiva, iluminación despareja, desenfoque y orientación EXIF
+    multicopy_pdf  PDF con capa de texto y una página por copia (ORIGINAL, DUPLICADO, TRIPLICADO)
+
+Todo es determinístico a partir de la semilla. Para escribir el corpus a disco:
+
+    python -m benchmarks.corpus carpeta_destino [por_tipo] [semilla]
+"""
+import base64
+import io
+import json
+import random
+import sys
+import zlib
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+KINDS = ("text_pdf", "scanned_pdf", "photo_jpeg", "multicopy_pdf")
+COPY_LABELS = ("ORIGINAL", "DUPLICADO", "TRIPLICADO")
+
+A4_POINTS = (595, 842)
+RENDER_DPI = 200
+
+EMISORES = (
+    "ESTUDIO CONTABLE PEREZ", "FERRETERIA LOS ANDES SRL", "DISTRIBUIDORA DEL SUR SA", "GOMEZ MARIA LAURA",
+    "CONSULTORA PAMPA SRL", "LABORATORIO RIO DE LA PLATA SA", "MARTINEZ JUAN CARLOS", "AGRO SERVICIOS NORTE SRL",
+)
+RECEPTORES = (
+    "COMERCIAL DEL LITORAL SA", "TRANSPORTES CUYO SRL", "RODRIGUEZ ANA BELEN", "SUPERMERCADOS CENTRO SA",
+    "CLINICA SAN JOSE SRL", "FERNANDEZ PABLO", "CONSTRUCTORA PATAGONIA SA", "LOPEZ SOFIA",
+)
+CALLES = ("Av. Siempre Viva", "San Martín", "Belgrano", "Av. Pellegrini", "Mitre", "Córdoba", "Rivadavia")
+CIUDADES = ("Rosario, Santa Fe", "Córdoba, Córdoba", "Mendoza, Mendoza", "Santa Fe, Santa Fe", "CABA")
+CONCEPTOS = ("Honorarios profesionales", "Servicio de mantenimiento", "Materiales de construcción", "Flete")
+
+
+@dataclass
+class InvoiceSpec:
+    """Valores de un comprobante generado; expected() devuelve lo que debería extraer el pipeline."""
+    punto_venta: int
+    numero: int
+    fecha: date
+    importe: float
+    cuit_emisor: str
+    razon_social_emisor: str
+    domicilio_emisor: str
+    cuit_receptor: str
+    razon_social_receptor: str
+    domicilio_receptor: str
+    concepto: str
+    cae: str
+    copies: int = 1
+    with_qr: bool = True
+
+    @property
+    def importe_text(self) -> str:
+        return f"{self.importe:.2f}".replace(".", ",")
+
+    def expected(self) -> Dict[str, str]:
+        return {
+            "punto_venta": f"{self.punto_venta:05d}",
+            "numero_comprobante": f"{self.numero:08d}",
+            "fecha_emision": self.fecha.strftime("%d/%m/%Y"),
+            "importe_total": self.importe_text,
+            "cuit_emisor": self.cuit_emisor,
+            "razon_social_emisor": self.razon_social_emisor,
+            "cuit_receptor": self.cuit_receptor,
+            "cae_numero": self.cae,
+        }
+
+    def qr_url(self) -> str:
+        payload = {
+            "ver": 1,
+            "fecha": self.fecha.isoformat(),
+            "cuit": int(self.cuit_emisor),
+            "ptoVta": self.punto_venta,
+            "tipoCmp": 11,
+            "nroCmp": self.numero,
+            "importe": self.importe,
+            "moneda": "PES",
+            "ctz": 1,
+            "tipoDocRec": 80,
+            "nroDocRec": int(self.cuit_receptor),
+            "tipoCodAut": "E",
+            "codAut": int(self.cae),
+        }
+        encoded = base64.b64encode(json.dumps(payload, separators=(",", ":")).encode()).decode()
+        return f"https://www.afip.gob.ar/fe/qr/?p={encoded}"
+
+    def lines(self, copia: str) -> List[str]:
+        """Texto de una copia con el mismo orden de etiquetas que imprime el facturador de AFIP."""
+        desde = self.fecha.replace(day=1)
+        return [
+            copia,
+            "FACTURA",
+            "C",
+            "COD. 011",
+            f"Razón Social: {self.razon_social_emisor}",
+            f"Punto de Venta: {self.punto_venta:05d} Comp. Nro: {self.numero:08d}",
+            f"Fecha de Emisión: {self.fecha.strftime('%d/%m/%Y')}",
+            f"Domicilio Comercial: {self.domicilio_emisor}",
+            f"CUIT: {self.cuit_emisor}",
+            f"Ingresos Brutos: {self.cuit_emisor}",
+            "Condición frente al IVA: Responsable Monotributo",
+            "Fecha de Inicio de Actividades: 01/01/2015",
+            f"Período Facturado Desde: {desde.strftime('%d/%m/%Y')} Hasta: {self.fecha.strftime('%d/%m/%Y')} "
+            f"Fecha de Vto. para el pago: {self.fecha.strftime('%d/%m/%Y')}",
+            f"CUIT: {self.cuit_receptor} Apellido y Nombre / Razón Social: {self.razon_social_receptor}",
+            f"Condición frente al IVA: IVA Responsable Inscripto Domicilio: {self.domicilio_receptor}",
+            "Condición de venta: Contado",
+            "Código Producto / Servicio Cantidad U. Medida Precio Unit. % Bonif Imp. Bonif. Subtotal",
+            f"1 {self.concepto} 1,00 unidades {self.importe_text} 0,00 0,00 {self.importe_text}",
+            f"Subtotal: $ {self.importe_text}",
+            "Importe Otros Tributos: $ 0,00",
+            f"Importe Total: $ {self.importe_text}",
+            f"CAE N°: {self.cae}",
+            f"Fecha de Vto. de CAE: {(self.fecha + timedelta(days=10)).strftime('%d/%m/%Y')}",
+        ]
+
+
+@dataclass
+class CorpusItem:
+    name: str
+    kind: str
+    content: bytes
+    content_type: str
+    spec: InvoiceSpec
+    # Parámetros de /upload/ con los que se espera obtener todos los campos
+    pages: str = "1"
+    expected: Dict[str, object] = field(default_factory=dict)
+
+
+def _cuit(rng: random.Random, prefix: int) -> str:
+    """CUIT con dígito verificador válido (módulo 11)."""
+    digits = f"{prefix:02d}{rng.randint(10_000_000, 45_000_000):08d}"
+    weights = (5, 4, 3, 2, 7, 6, 5, 4, 3, 2)
+    check = 11 - sum(int(d) * w for d, w in zip(digits, weights)) % 11
+    if check == 10:
+        return _cuit(rng, prefix)
+    return digits + str(0 if check == 11 else check)
+
+
+def random_invoice(rng: random.Random, copies: int = 1, with_qr: bool = True) -> InvoiceSpec:
+    return InvoiceSpec(
+        punto_venta=rng.randint(1, 99),
+        numero=rng.randint(1, 99_999),
+        fecha=date(2023, 1, 1) + timedelta(days=rng.randint(0, 900)),
+        importe=rng.randint(1_000_00, 2_500_000_00) / 100,
+        cuit_emisor=_cuit(rng, rng.choice((20, 27, 30))),
+        razon_social_emisor=rng.choice(EMISORES),
+        domicilio_emisor=f"{rng.choice(CALLES)} {rng.randint(100, 5000)} - {rng.choice(CIUDADES)}",
+        cuit_receptor=_cuit(rng, rng.choice((20, 27, 30, 33))),
+        razon_social_receptor=rng.choice(RECEPTORES),
+        domicilio_receptor=f"{rng.choice(CALLES)} {rng.randint(100, 5000)} - {rng.choice(CIUDADES)}",
+        concepto=rng.choice(CONCEPTOS),
+        cae=str(rng.randint(10**13, 10**14 - 1)),
+        copies=copies,
+        with_qr=with_qr,
+    )
+
+
+def qr_matrix(text: str, module_px: int) -> np.ndarray:
+    """QR en escala de grises (0 negro, 255 blanco) con zona de silencio, usando el encoder de OpenCV."""
+    matrix = cv2.QRCodeEncoder.create().encode(text)
+    matrix = cv2.copyMakeBorder(matrix, 4, 4, 4, 4, cv2.BORDER_CONSTANT, value=255)
+    return cv2.resize(matrix, None, fx=module_px, fy=module_px, interpolation=cv2.INTER_NEAREST)
+
+
+# --- PDF con capa de texto --------------------------------------------------------------------------------
+
+def _pdf_string(text: str) -> bytes:
+    raw = text.encode("cp1252", errors="replace")
+    return b"(" + raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def text_pdf(pages: List[Tuple[List[str], Optional[str]]]) -> bytes:
+    """
+    Escribe un PDF mínimo con Helvetica (WinAnsiEncoding) y, si se indica, el QR como imagen en la esquina
+    inferior izquierda. Se evita depender de una librería de generación de PDF solo para los benchmarks.
+    """
+    objects: List[bytes] = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog = add(b"")  # se completa al final
+    pages_obj = add(b"")
+    font = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    page_ids = []
+    for lines, qr_text in pages:
+        content = [b"BT /F1 9 Tf 13 TL 40 800 Td"]
+        for line in lines:
+            content.append(_pdf_string(line) + b" Tj T*")
+        content.append(b"ET")
+        resources = b"/Font << /F1 %d 0 R >>" % font
+        if qr_text:
+            matrix = qr_matrix(qr_text, 1)
+            data = zlib.compress(matrix.tobytes())
+            image = add(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n" % (
+                    matrix.shape[1], matrix.shape[0], len(data)
+                ) + data + b"\nendstream"
+            )
+            resources += b" /XObject << /Im1 %d 0 R >>" % image
+            content.append(b"q 110 0 0 110 40 40 cm /Im1 Do Q")
+        stream = b"\n".join(content)
+        contents = add(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 %d %d] /Resources << %s >> /Contents %d 0 R >>" % (
+                pages_obj, A4_POINTS[0], A4_POINTS[1], resources, contents
+            )
+        ))
+
+    objects[catalog - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_obj
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_obj - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog, xref))
+    return out.getvalue()
+
+
+# --- Páginas rasterizadas -----------------------------------------------------------------------------------
+
+def render_page(lines: List[str], qr_text: Optional[str], dpi: int = RENDER_DPI) -> Image.Image:
+    """La misma página que text_pdf, dibujada como imagen en escala de grises a la resolución indicada."""
+    scale = dpi / 72
+    width, height = int(A4_POINTS[0] * scale), int(A4_POINTS[1] * scale)
+    image = Image.new("L", (width, height), color=255)
+    draw = ImageDraw.Draw(image)
+    font = ImageFont.load_default(size=int(9 * scale))
+    y = 42 * scale
+    for line in lines:
+        draw.text((40 * scale, y), line, fill=0, font=font)
+        y += 13 * scale
+    if qr_text:
+        qr = qr_matrix(qr_text, 1)
+        side = int(110 * scale)
+        qr_image = Image.fromarray(qr).resize((side, side), Image.NEAREST)
+        image.paste(qr_image, (int(40 * scale), height - int(40 * scale) - side))
+    return image
+
+
+def _add_noise(image: np.ndarray, rng: np.random.Generator, sigma: float) -> np.ndarray:
+    noisy = image.astype(np.float32) + rng.normal(0, sigma, image.shape)
+    return np.clip(noisy, 0, 255).astype(np.uint8)
+
+
+def scan(image: Image.Image, rng: random.Random) -> Image.Image:
+    """Simula un escaneo: rotación leve, desenfoque, ruido y un fondo levemente gris."""
+    angle = rng.uniform(-1.5, 1.5)
+    image = image.rotate(angle, resample=Image.BILINEAR, expand=False, fillcolor=255)
+    image = image.filter(ImageFilter.GaussianBlur(radius=0.4))
+    array = np.asarray(image).astype(np.float32) * 0.92 + 8
+    array = _add_noise(array, np.random.default_rng(rng.randint(0, 2**32 - 1)), sigma=4)
+    return Image.fromarray(array)
+
+
+def photograph(image: Image.Image, rng: random.Random) -> Image.Image:
+    """Simula una foto de celular: perspectiva, iluminación despareja, desenfoque, ruido y color."""
+    array = np.asarray(image.convert("RGB"))
+    height, width = array.shape[:2]
+    margin = 0.06
+    src = np.float32([[0, 0], [width, 0], [width, height], [0, height]])
+    jitter = lambda: rng.uniform(0, margin)  # noqa: E731
+    dst = np.float32([
+        [width * jitter(), height * jitter()],
+        [width * (1 - jitter()), height * jitter()],
+        [width * (1 - jitter()), height * (1 - jitter())],
+        [width * jitter(), height * (1 - jitter())],
+    ])
+    warped = cv2.warpPerspective(
+        array, cv2.getPerspectiveTransform(src, dst), (width, height), borderValue=(90, 80, 70)
+    )
+
+    # Iluminación: gradiente diagonal con tinte cálido
+    gradient = np.linspace(0.75, 1.05, width, dtype=np.float32)[None, :] * np.linspace(
+        0.9, 1.0, height, dtype=np.float32
+    )[:, None]
+    lit = warped.astype(np.float32) * gradient[:, :, None] * np.float32([1.0, 0.97, 0.9])
+    lit = cv2.GaussianBlur(lit, (0, 0), 0.8)
+    noisy = _add_noise(lit, np.random.default_rng(rng.randint(0, 2**32 - 1)), sigma=5)
+    return Image.fromarray(noisy)
+
+
+def photo_jpeg(image: Image.Image, rng: random.Random) -> bytes:
+    """Guarda la foto como JPEG rotado con orientación EXIF 6, como la entrega un celular en vertical."""
+    photo = photograph(image, rng).rotate(90, expand=True)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    out = io.BytesIO()
+    photo.save(out, format="JPEG", quality=72, exif=exif)
+    return out.getvalue()
+
+
+def raster_pdf(images: List[Image.Image], dpi: int = RENDER_DPI) -> bytes:
+    out = io.BytesIO()
+    images[0].save(out, format="PDF", save_all=True, append_images=images[1:], resolution=dpi, quality=85)
+    return out.getvalue()
+
+
+# --- Corpus ---------------------------------------------------------------------------------------------------
+
+def build_item(kind: str, index: int, rng: random.Random) -> CorpusItem:
+    if kind == "multicopy_pdf":
+        spec = random_invoice(rng, copies=rng.choice((2, 3)), with_qr=True)
+    else:
+        # La mitad de los comprobantes lleva QR: se ejercitan tanto el atajo del QR como el OCR
+        spec = random_invoice(rng, with_qr=index % 2 == 0)
+    qr_text = spec.qr_url() if spec.with_qr else None
+    name = f"{kind}_{index:03d}"
+    expected: Dict[str, object] = dict(spec.expected())
+
+    if kind == "text_pdf":
+        return CorpusItem(f"{name}.pdf", kind, text_pdf([(spec.lines("ORIGINAL"), qr_text)]), "application/pdf",
+                          spec, expected=expected)
+    if kind == "scanned_pdf":
+        page = scan(render_page(spec.lines("ORIGINAL"), qr_text), rng)
+        return CorpusItem(f"{name}.pdf", kind, raster_pdf([page]), "application/pdf", spec, expected=expected)
+    if kind == "photo_jpeg":
+        content = photo_jpeg(render_page(spec.lines("ORIGINAL"), qr_text), rng)
+        return CorpusItem(f"{name}.jpg", kind, content, "image/jpeg", spec, expected=expected)
+    if kind == "multicopy_pdf":
+        pages = [(spec.lines(COPY_LABELS[copy]), qr_text) for copy in range(spec.copies)]
+        expected["cantidad_copias"] = spec.copies
+        return CorpusItem(f"{name}.pdf", kind, text_pdf(pages), "application/pdf", spec, pages="all",
+                          expected=expected)
+    raise ValueError(f"Tipo de archivo desconocido: {kind}")
+
+
+def generate_corpus(per_kind: int = 5, seed: int = 1234, kinds=KINDS) -> List[CorpusItem]:
+    rng = random.Random(seed)
+    return [build_item(kind, index, rng) for kind in kinds for index in range(per_kind)]
+
+
+def write_corpus(directory: str, per_kind: int = 5, seed: int = 1234) -> List[CorpusItem]:
+    """Escribe los archivos y un manifest.json con los valores esperados de cada uno."""
+    target = Path(directory)
+    target.mkdir(parents=True, exist_ok=True)
+    items = generate_corpus(per_kind, seed)
+    manifest = []
+    for item in items:
+        (target / item.name).write_bytes(item.content)
+        manifest.append({
+            "name": item.name, "kind": item.kind, "content_type": item.content_type,
+            "pages": item.pages, "expected": item.expected,
+        })
+    (target / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2), encoding="utf-8")
+    return items
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    written = write_corpus(
+        sys.argv[1],
+        per_kind=int(sys.argv[2]) if len(sys.argv) > 2 else 5,
+        seed=int(sys.argv[3]) if len(sys.argv) > 3 else 1234,
+    )
+    print(f"{len(written)} archivos escritos en {sys.argv[1]}")
@@ -1,10 +1,30 @@
 # main.py
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.api.routes import router
-import uvicorn
+from app.core.config import get_settings
+from app.core.middleware import GZipMiddleware, MaxBodySizeMiddleware, RequestLogMiddleware, ServerTimingMiddleware
+from app.core.registry import get_registry
+from app.core.server import serve
+from app.services.job_manager import get_job_manager
+from app.utils.logging import setup_logging
 
-app = FastAPI(title="File Upload API")
+setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Los modelos se cargan en segundo plano; /ready responde 503 hasta que terminen
+    warmup = asyncio.create_task(asyncio.to_thread(get_registry().warm_up))
+    get_job_manager().start()
+    yield
+    await get_job_manager().stop()
+    warmup.cancel()
+    await get_registry().aclose()
+    get_registry().shutdown()
+
+app = FastAPI(title="File Upload API", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,6 +34,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(
+    MaxBodySizeMiddleware,
+    max_bytes=get_settings().MAX_UPLOAD_BYTES,
+    path_limits={"/upload/batch": get_settings().MAX_BATCH_UPLOAD_BYTES},
+)
+
+# Las respuestas grandes (el texto extraído, varios comprobantes) se comprimen si el cliente lo acepta
+if get_settings().GZIP_MIN_SIZE > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=get_settings().GZIP_MIN_SIZE)
+
+# Dentro de ServerTimingMiddleware para poder leer las etapas de su traza
+app.add_middleware(RequestLogMiddleware, sample_rate=get_settings().LOG_SUCCESS_SAMPLE_RATE)
+
+# Último en agregarse: envuelve a todos los demás y mide el request completo
+app.add_middleware(ServerTimingMiddleware)
+
 app.include_router(router)
 
 @app.get("/")
@@ -21,4 +57,12 @@ async def root():
     return {"message": "File Upload API is running"}
 
 if __name__ == "__main__":
-    uvicorn.run(app, host="0.0.0.0", port=8000, log_level="debug")
\ No newline at end of file
+    settings = get_settings()
+    serve(
+        app,
+        host=settings.SERVER_HOST,
+        port=settings.SERVER_PORT,
+        workers=settings.SERVER_WORKERS,
+        preload=settings.SERVER_PRELOAD,
+        log_level=settings.LOG_LEVEL.lower(),
+    )
\ No newline at end of file